@@ -0,0 +1,11 @@
+"""
+Benchmark scripts for the transaction service.
+
+Each script is run as a module from the repository root, for example
+``python -m benchmarks.indexes --rows 2000000``. They use the database
+configured by ``DJANGO_SETTINGS_MODULE`` (``transaction_service.settings``
+by default) but always seed and query a throwaway test database, created
+and dropped the same way the test runner does. Use
+``DJANGO_SETTINGS_MODULE=transaction_service.bench_settings`` to run them
+on SQLite without any database server.
+"""
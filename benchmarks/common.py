@@ -0,0 +1,113 @@
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal
+
+import django
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transaction_service.settings')
+    django.setup()
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """Create the test database for the duration of the block"""
+    from django.test.utils import (
+        setup_databases, setup_test_environment, teardown_databases,
+        teardown_test_environment,
+    )
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        if not keepdb:
+            teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+def seed_forest(rows, root_ratio=0.01, deleted_ratio=0.1, type_weights=(80, 15, 5),
+                chunk_size=50000, seed=0):
+    """
+    Insert ``rows`` transactions forming random trees: each row is a root
+    with probability ``root_ratio``, otherwise the child of a uniformly
+    chosen earlier row. Types are skewed according to ``type_weights``.
+    Returns the ids of the roots.
+    """
+    from transactions.ingest import BulkIngestion
+    from transactions.models import TransactionType
+
+    rng = random.Random(seed)
+    types = [choice for choice, label in TransactionType.choices]
+    ingestion = BulkIngestion(chunk_size=5000)
+    ids, positions, roots = [], [], []
+    batch = []
+    for i in range(rows):
+        pk = uuid.UUID(int=rng.getrandbits(128), version=4)
+        if not ids or rng.random() < root_ratio:
+            parent_id, depth, root_id = None, 0, pk
+            roots.append(pk)
+        else:
+            index = rng.randrange(len(ids))
+            parent_id = ids[index]
+            depth, root_id = positions[index][0] + 1, positions[index][1]
+        ids.append(pk)
+        positions.append((depth, root_id))
+        batch.append({
+            'id': pk,
+            'parent_id': parent_id,
+            'type': rng.choices(types, weights=type_weights)[0],
+            'amount': Decimal(rng.randrange(1, 100000)) / 100,
+            'depth': depth,
+            'root_id': root_id,
+            'is_deleted': rng.random() < deleted_ratio,
+        })
+        if len(batch) == chunk_size:
+            ingestion.insert(batch)
+            batch = []
+    if batch:
+        ingestion.insert(batch)
+    return roots
+
+
+def measure(func, repeat=20, warmup=2):
+    """Call ``func`` repeatedly and return latency statistics in milliseconds"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'runs': repeat,
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'max_ms': round(timings[-1], 3),
+    }
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def write_report(report, path=None):
+    """Print ``report`` as JSON, or write it to ``path``"""
+    payload = json.dumps(report, indent=2, default=str)
+    if path:
+        with open(path, 'w') as output:
+            output.write(payload + '\n')
+    else:
+        print(payload)
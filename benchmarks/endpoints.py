@@ -0,0 +1,205 @@
+"""
+Latency and throughput of every endpoint over a few data shapes.
+
+    DJANGO_SETTINGS_MODULE=transaction_service.bench_settings \
+        python -m benchmarks.endpoints --output endpoints.json
+    python -m benchmarks.endpoints --compare endpoints.json
+
+Each shape is seeded into an empty throwaway database and its endpoints
+are driven in process through the Django test client, so the numbers
+include routing, middleware and rendering but no network:
+
+- ``wide``: many roots with many children each
+- ``deep-<n>``: a single chain ``n`` levels deep, for every ``--depths``
+- ``skewed``: random trees whose types are heavily skewed
+
+Reads are timed with the read-through cache cleared before every call
+unless ``--warm-cache`` is given. The JSON report carries the commit it
+was produced from; ``--compare`` runs the suite again and lists the
+endpoints whose median latency regressed by more than ``--threshold``.
+``transaction_service.bench_settings`` runs everything on SQLite.
+"""
+import argparse
+import json
+import subprocess
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, measure, seed_forest, setup, write_report
+
+
+def seed_wide(roots, children):
+    """``roots`` roots with ``children`` children each; returns the root ids"""
+    from transactions.ingest import BulkIngestion
+    from transactions.models import uuid7
+
+    rows, root_ids = [], []
+    for i in range(roots):
+        root = uuid7()
+        root_ids.append(root)
+        rows.append({'id': root, 'parent_id': None, 'type': 'shopping', 'amount': Decimal(i % 100 + 1),
+                     'depth': 0, 'root_id': root})
+        rows.extend(
+            {'id': uuid7(), 'parent_id': root, 'type': 'fuel', 'amount': Decimal(j % 50 + 1),
+             'depth': 1, 'root_id': root}
+            for j in range(children)
+        )
+    BulkIngestion(chunk_size=5000).insert(rows)
+    return root_ids
+
+
+def seed_chain(depth):
+    """a single chain of ``depth`` rows; returns its root and leaf ids"""
+    from transactions.ingest import BulkIngestion
+    from transactions.models import uuid7
+
+    ids = [uuid7() for _ in range(depth)]
+    BulkIngestion(chunk_size=5000).insert([
+        {'id': pk, 'parent_id': ids[level - 1] if level else None, 'type': 'shopping',
+         'amount': Decimal(1), 'depth': level, 'root_id': ids[0]}
+        for level, pk in enumerate(ids)
+    ])
+    return ids[0], ids[-1]
+
+
+def read_endpoints(root, leaf, types):
+    from django.urls import reverse
+
+    endpoints = {
+        'list first page': ('get', reverse('transaction-list-post'), {'page_size': 100}),
+        'detail': ('get', reverse('transaction-detail', kwargs={'pk': leaf}), None),
+        'stats': ('get', reverse('transaction-stats', kwargs={'pk': root}), None),
+        'sum': ('get', reverse('transaction-sum', kwargs={'pk': root}), None),
+        'ancestors first page': ('get', reverse('transaction-ancestors', kwargs={'pk': leaf}), None),
+        'descendants first page': ('get', reverse('transaction-descendants', kwargs={'pk': root}), None),
+        'analytics by day': ('get', reverse('transaction-analytics'), {'bucket': 'day'}),
+    }
+    for type in types:
+        endpoints[f'type {type}'] = ('get', reverse('transaction-type', kwargs={'type': type}), None)
+    return endpoints
+
+
+def write_endpoints(root, leaf):
+    from django.urls import reverse
+
+    amounts = iter(range(1, 10 ** 9))
+    return {
+        'create': lambda: ('post', reverse('transaction-list-post'),
+                           {'parent_id': str(leaf), 'type': 'fuel', 'amount': 1}),
+        # moves the totals of every ancestor of the leaf
+        'update leaf amount': lambda: ('put', reverse('transaction-detail', kwargs={'pk': leaf}),
+                                       {'type': 'shopping', 'amount': next(amounts) % 100 + 1}),
+        'bulk create 100': lambda: ('post', reverse('transaction-bulk'),
+                                    [{'parent_id': str(root), 'type': 'fuel', 'amount': 1}] * 100),
+    }
+
+
+def time_shape(root, leaf, types, repeat, warm_cache):
+    """latency of every endpoint against the seeded shape, plus the recursive CTE sum"""
+    from django.test import Client
+    from transactions import cache
+    from transactions.models import Transactions
+
+    client = Client()
+
+    def call(method, uri, data):
+        if method == 'get':
+            response = client.get(uri, data)
+        else:
+            response = getattr(client, method)(uri, data=data, content_type='application/json')
+        assert response.status_code < 300, (uri, response.status_code, response.content[:200])
+
+    def timed(func):
+        timings = measure(func, repeat=repeat)
+        timings['requests_per_second'] = round(1000 / timings['mean_ms'], 1) if timings['mean_ms'] else None
+        return timings
+
+    report = {}
+    for name, (method, uri, data) in read_endpoints(root, leaf, types).items():
+        def read(method=method, uri=uri, data=data):
+            if not warm_cache:
+                cache.clear()
+            call(method, uri, data)
+        report[name] = timed(read)
+    report['recursive sum (CTE)'] = timed(lambda: Transactions.objects.subtree_sums([root]))
+    # writes last, they change the shape
+    for name, build in write_endpoints(root, leaf).items():
+        report[name] = timed(lambda build=build: call(*build()))
+    return report
+
+
+def run_shapes(args):
+    from django.core.management import call_command
+    from transactions.models import Transactions
+
+    shapes = {'wide': lambda: seed_wide(args.roots, args.children)}
+    for depth in args.depths:
+        shapes[f'deep-{depth}'] = lambda depth=depth: seed_chain(depth)
+    shapes['skewed'] = lambda: seed_forest(args.rows, type_weights=(97, 2.5, 0.5))
+
+    report = {}
+    for name, seed in shapes.items():
+        call_command('flush', interactive=False, verbosity=0)
+        seeded = seed()
+        if isinstance(seeded, tuple):
+            root, leaf = seeded
+        else:
+            root = seeded[0]
+            leaf = Transactions.objects.filter(root_id=root).order_by('-depth').values_list('id', flat=True).first()
+        report[name] = time_shape(root, leaf, ('shopping', 'house_hold'), args.repeat, args.warm_cache)
+    return report
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(baseline, report, threshold):
+    """(shape, endpoint, old p50, new p50) whose median grew by more than ``threshold``"""
+    found = []
+    for shape, endpoints in report['shapes'].items():
+        for endpoint, timings in endpoints.items():
+            old = baseline['shapes'].get(shape, {}).get(endpoint)
+            if old and old['p50_ms'] and timings['p50_ms'] > old['p50_ms'] * (1 + threshold):
+                found.append((shape, endpoint, old['p50_ms'], timings['p50_ms']))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--roots', type=int, default=100, help="Roots of the wide shape.")
+    parser.add_argument('--children', type=int, default=1000, help="Children per root of the wide shape.")
+    parser.add_argument('--depths', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--rows', type=int, default=100000, help="Rows of the skewed shape.")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--warm-cache', action='store_true', help="Keep the read-through cache between calls.")
+    parser.add_argument('--compare', help="Baseline report to check for regressions.")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Tolerated relative p50 increase.")
+    parser.add_argument('--output', help="Write the JSON report to this file.")
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+
+    with benchmark_database():
+        shapes = run_shapes(args)
+    report = {
+        'commit': commit(), 'vendor': connection.vendor, 'repeat': args.repeat,
+        'warm_cache': args.warm_cache, 'shapes': shapes,
+    }
+    write_report(report, args.output)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            found = regressions(json.load(baseline_file), report, args.threshold)
+        for shape, endpoint, old, new in found:
+            print(f"regression: {shape} / {endpoint}: p50 {old}ms -> {new}ms")
+        if found:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Seed a few million transactions and compare the EXPLAIN plans and
+latencies of the main access paths before and after the indexes added in
+migration 0007 (live rows by type, children by parent).
+
+    python -m benchmarks.indexes --rows 2000000 --output indexes.json
+
+"Before" drops those indexes and restores the plain foreign key index on
+parent_id that preceded them; "after" recreates them.
+"""
+import argparse
+
+from benchmarks.common import benchmark_database, measure, seed_forest, setup, write_report
+
+
+def access_paths(roots):
+    from transactions.models import Transactions
+
+    root = roots[0]
+    parent = Transactions.objects.filter(parent_id=root).values_list('id', flat=True).first() or root
+    return {
+        'live ids by type': lambda: Transactions.objects.filter(
+            type='house_hold', is_deleted=False
+        ).values_list('id', flat=True),
+        'live children': lambda: Transactions.objects.filter(
+            parent_id=parent, is_deleted=False
+        ).values_list('id', flat=True),
+        'descendants': lambda: Transactions.objects.descendants(root).values_list('id', flat=True),
+        'first list page': lambda: Transactions.objects.order_by('created_on', 'id')[:100],
+    }
+
+
+def explain(queryset):
+    from django.db import connection
+
+    options = {'analyze': True} if connection.vendor == 'postgresql' else {}
+    return queryset.explain(**options).splitlines()
+
+
+def run(paths, repeat):
+    return {
+        name: {
+            'plan': explain(build()),
+            'latency': measure(lambda: list(build()), repeat=repeat),
+        }
+        for name, build in paths.items()
+    }
+
+
+def swap_indexes(drop):
+    """Drop (``drop``) or restore the indexes under test"""
+    from django.db import connection, models
+    from transactions.models import Transactions
+
+    added = [
+        index for index in Transactions._meta.indexes
+        if index.name in ('transactions_live_type_idx', 'transactions_parent_idx')
+    ]
+    previous = models.Index(fields=['parent_id'], name='bench_parent_fk_idx')
+    with connection.schema_editor() as editor:
+        for index in added:
+            (editor.remove_index if drop else editor.add_index)(Transactions, index)
+        (editor.add_index if drop else editor.remove_index)(Transactions, previous)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--keepdb', action='store_true', help="Reuse a previously seeded database.")
+    parser.add_argument('--output', help="Write the JSON report to this file.")
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+    from transactions.models import Transactions
+
+    with benchmark_database(keepdb=args.keepdb):
+        if not (args.keepdb and Transactions.objects.exists()):
+            seed_forest(args.rows)
+        roots = list(Transactions.objects.filter(parent_id=None).values_list('id', flat=True)[:1])
+        paths = access_paths(roots)
+        swap_indexes(drop=True)
+        try:
+            if connection.vendor == 'postgresql':
+                connection.cursor().execute('analyze transactions_transactions')
+            before = run(paths, args.repeat)
+        finally:
+            swap_indexes(drop=False)
+        if connection.vendor == 'postgresql':
+            connection.cursor().execute('analyze transactions_transactions')
+        after = run(paths, args.repeat)
+
+    write_report({
+        'vendor': connection.vendor,
+        'rows': args.rows,
+        'before': before,
+        'after': after,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
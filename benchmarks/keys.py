@@ -0,0 +1,125 @@
+"""
+Compare primary key layouts: the former 36 character text keys with
+random UUIDs against native UUID keys with random (v4) and time-ordered
+(v7) values.
+
+    python -m benchmarks.keys --rows 500000 --output keys.json
+
+For each layout a scratch copy of the transactions hierarchy is built in
+the throwaway test database. The report gives insert throughput, the
+latency of the recursive subtree sum over the parent join, and the size
+of the primary key index where the backend exposes it.
+"""
+import argparse
+import random
+import time
+import uuid
+
+from benchmarks.common import benchmark_database, measure, setup, write_report
+
+LAYOUTS = {
+    'text + uuid4': ('varchar(36)', uuid.uuid4, str),
+    'uuid + uuid4': ('uuid', uuid.uuid4, None),
+    'uuid + uuid7': ('uuid', None, None),
+}
+
+SUBTREE_SUM_SQL = """
+with recursive cte as (
+    select id from {table} where id = %s
+    union all
+    select t.id from {table} t join cte on t.parent_id = cte.id
+)
+select sum(t.amount) from cte join {table} t on t.id = cte.id
+"""
+
+
+def create_table(cursor, table, key_type):
+    cursor.execute(f"drop table if exists {table}")
+    cursor.execute(
+        f"create table {table} (id {key_type} primary key, "
+        f"parent_id {key_type} null references {table} (id), amount numeric(20, 2) not null)"
+    )
+    cursor.execute(f"create index {table}_parent on {table} (parent_id)")
+
+
+def index_size(cursor, table):
+    from django.db import connection
+
+    if connection.vendor != 'postgresql':
+        return None
+    cursor.execute(f"select pg_relation_size('{table}_pkey')")
+    return cursor.fetchone()[0]
+
+
+def run_layout(name, rows, batch, repeat, seed):
+    from django.db import connection, transaction
+    from transactions.models import uuid7
+
+    key_type, generate, adapt = LAYOUTS[name]
+    generate = generate or uuid7
+    field_adapt = adapt or (lambda value: value if connection.features.has_native_uuid_field else value.hex)
+    if not connection.features.has_native_uuid_field:
+        key_type = 'char(32)' if key_type == 'uuid' else key_type
+    table = 'bench_keys_' + name.replace(' + ', '_').replace('uuid', 'u').replace('text', 't')
+    rng = random.Random(seed)
+
+    with connection.cursor() as cursor:
+        create_table(cursor, table, key_type)
+        ids = []
+        start = time.perf_counter()
+        for offset in range(0, rows, batch):
+            values = []
+            for i in range(offset, min(rows, offset + batch)):
+                pk = generate()
+                parent = rng.choice(ids) if ids and rng.random() > 0.01 else None
+                ids.append(pk)
+                values.append((
+                    field_adapt(pk),
+                    None if parent is None else field_adapt(parent),
+                    rng.randrange(1, 100000) / 100,
+                ))
+            with transaction.atomic():
+                cursor.executemany(
+                    f"insert into {table} (id, parent_id, amount) values (%s, %s, %s)", values
+                )
+        elapsed = time.perf_counter() - start
+        if connection.vendor == 'postgresql':
+            cursor.execute(f"analyze {table}")
+
+        root = field_adapt(ids[0])
+        sql = SUBTREE_SUM_SQL.format(table=table)
+
+        def subtree_sum():
+            cursor.execute(sql, [root])
+            cursor.fetchone()
+
+        result = {
+            'inserts_per_second': round(rows / elapsed),
+            'subtree_sum': measure(subtree_sum, repeat=repeat),
+            'pk_index_bytes': index_size(cursor, table),
+        }
+        cursor.execute(f"drop table {table}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--batch', type=int, default=1000, help="Rows per INSERT round trip.")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', help="Write the JSON report to this file.")
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+
+    with benchmark_database():
+        report = {
+            name: run_layout(name, args.rows, args.batch, args.repeat, seed=0)
+            for name in LAYOUTS
+        }
+    write_report({'vendor': connection.vendor, 'rows': args.rows, 'layouts': report}, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Load test the read endpoints under WSGI and ASGI deployments.
+
+    python -m benchmarks.loadtest --seed 100000 --concurrency 256 --duration 30 --output load.json
+
+Three deployments of the configured settings are started one after the
+other and driven with the same request mix of list, detail, type and sum
+reads:
+
+- ``wsgi``: gunicorn with threaded workers serving the DRF views
+- ``asgi-sync``: uvicorn serving the same DRF views through Django's
+  sync-to-async adapter
+- ``asgi-async``: uvicorn serving the async views under ``async/``
+
+Requires uvicorn and gunicorn. The servers share the database of the
+settings, so unlike the other benchmarks this one does not use a
+throwaway test database: ``--seed`` inserts rows into the configured one.
+The report gives requests per second, latency percentiles and status
+counts per deployment.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from benchmarks.common import percentile, seed_forest, setup, write_report
+
+DEPLOYMENTS = {
+    'wsgi': ('gunicorn', False),
+    'asgi-sync': ('uvicorn', False),
+    'asgi-async': ('uvicorn', True),
+}
+
+
+def server_command(server, port, workers, threads):
+    if server == 'gunicorn':
+        return [
+            sys.executable, '-m', 'gunicorn', 'transaction_service.wsgi:application',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+            '--worker-class', 'gthread', '--log-level', 'warning',
+        ]
+    return [
+        sys.executable, '-m', 'uvicorn', 'transaction_service.asgi:application',
+        '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+        '--no-access-log', '--log-level', 'warning',
+    ]
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server did not listen on port {port} within {timeout}s")
+
+
+def request_paths(use_async):
+    """request mix: one of each read endpoint, on the sync or async routes"""
+    from django.urls import reverse
+    from transactions.models import Transactions
+
+    sample = Transactions.objects.filter(parent_id=None).values_list('id', 'type').first()
+    if sample is None:
+        raise SystemExit("the database is empty, seed it with --seed")
+    pk, type = sample
+    prefix = 'async-' if use_async else ''
+    return [
+        reverse(prefix + ('transaction-list' if use_async else 'transaction-list-post')) + '?page_size=100',
+        reverse(prefix + 'transaction-detail', kwargs={'pk': pk}),
+        reverse(prefix + 'transaction-type', kwargs={'type': type}),
+        reverse(prefix + 'transaction-sum', kwargs={'pk': pk}),
+    ]
+
+
+async def read_response(reader):
+    """status and keep-alive flag of one HTTP/1.1 response, body discarded"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return int(status_line.split()[1]), headers.get('connection') != 'close'
+
+
+async def run_client(port, paths, offset, deadline, latencies, statuses):
+    connection = None
+    i = offset
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection('127.0.0.1', port)
+            reader, writer = connection
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n'.encode())
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            statuses['error'] += 1
+            connection = None
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[status] += 1
+        if not keep_alive:
+            connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def drive(port, paths, concurrency, duration):
+    latencies, statuses = [], Counter()
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        run_client(port, paths, offset, deadline, latencies, statuses)
+        for offset in range(concurrency)
+    ))
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / duration, 1),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
+
+
+def run_deployment(name, args):
+    server, use_async = DEPLOYMENTS[name]
+    paths = request_paths(use_async)
+    # the settings share the transactions cache between several workers
+    process = subprocess.Popen(
+        server_command(server, args.port, args.workers, args.threads),
+        env=dict(os.environ, WEB_CONCURRENCY=str(args.workers)),
+    )
+    try:
+        wait_for_port(args.port, process)
+        # warm the workers and the cache before measuring
+        asyncio.run(drive(args.port, paths, args.concurrency, min(args.duration, 3)))
+        return asyncio.run(drive(args.port, paths, args.concurrency, args.duration))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seed', type=int, default=0, help="Insert this many rows first.")
+    parser.add_argument('--deployments', nargs='+', choices=list(DEPLOYMENTS), default=list(DEPLOYMENTS))
+    parser.add_argument('--concurrency', type=int, default=256, help="Concurrent keep-alive connections.")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds of load per deployment.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads', type=int, default=8, help="Threads per gunicorn worker.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--output', help="Write the JSON report to this file.")
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+
+    if args.seed:
+        seed_forest(args.seed)
+    connection.close()
+    report = {name: run_deployment(name, args) for name in args.deployments}
+    write_report({
+        'vendor': connection.vendor, 'concurrency': args.concurrency, 'duration': args.duration,
+        'workers': args.workers, 'deployments': report,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Compare rendering transaction lists through the DRF serializers against the
+values_list() rows encoded by TransactionJSONRenderer.
+
+    python -m benchmarks.rendering --rows 100000 --page-size 1000 --output rendering.json
+
+Both paths render the same page of the seeded forest and are checked to
+produce identical bytes first. The report gives rows per second with and
+without the query, so the encoding cost is visible on its own.
+"""
+import argparse
+
+from benchmarks.common import benchmark_database, measure, seed_forest, setup, write_report
+
+
+def rows_per_second(timings, rows):
+    return round(rows / (timings['p50_ms'] / 1000)) if timings['p50_ms'] else None
+
+
+def run(page_size, repeat):
+    from rest_framework.renderers import JSONRenderer
+    from transactions.models import Transactions
+    from transactions.renderers import TransactionJSONRenderer, TransactionRows
+    from transactions.serializers import TransactionGetSerializer
+    from transactions.views import TRANSACTION_READ_FIELDS
+
+    queryset = Transactions.objects.order_by('created_on', 'id')[:page_size]
+    instances = list(queryset.only(*TRANSACTION_READ_FIELDS))
+    rows = list(queryset.values_list(*TRANSACTION_READ_FIELDS))
+
+    def serializer_render(objects):
+        return JSONRenderer().render({'next': None, 'results': TransactionGetSerializer(objects, many=True).data})
+
+    def fast_render(tuples):
+        return TransactionJSONRenderer().render({'next': None, 'results': TransactionRows(tuples)})
+
+    assert serializer_render(instances) == fast_render(rows), "outputs differ"
+
+    paths = {
+        'serializer': (
+            lambda: serializer_render(instances),
+            lambda: serializer_render(list(queryset.only(*TRANSACTION_READ_FIELDS))),
+        ),
+        'values_list': (
+            lambda: fast_render(rows),
+            lambda: fast_render(list(queryset.values_list(*TRANSACTION_READ_FIELDS))),
+        ),
+    }
+    report = {}
+    for name, (render_only, with_query) in paths.items():
+        render_timings = measure(render_only, repeat=repeat)
+        query_timings = measure(with_query, repeat=repeat)
+        report[name] = {
+            'render': render_timings,
+            'render_rows_per_second': rows_per_second(render_timings, len(rows)),
+            'query_and_render': query_timings,
+            'query_and_render_rows_per_second': rows_per_second(query_timings, len(rows)),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help="Write the JSON report to this file.")
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+
+    with benchmark_database():
+        seed_forest(args.rows)
+        report = run(args.page_size, args.repeat)
+    write_report({
+        'vendor': connection.vendor, 'rows': args.rows, 'page_size': args.page_size, 'paths': report,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
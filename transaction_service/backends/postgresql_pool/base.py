@@ -0,0 +1,143 @@
+"""
+PostgreSQL backend keeping its connections in a process-wide pool.
+
+Selected with the ENGINE ``transaction_service.backends.postgresql_pool``
+and a ``POOL`` entry in the database settings::
+
+    'POOL': {'SIZE': 20, 'TIMEOUT': 5}
+
+Closing a connection, which Django does at the end of every request when
+``CONN_MAX_AGE`` is 0, hands it back to the pool instead. A request waits
+at most ``TIMEOUT`` seconds for one of the ``SIZE`` connections to be
+free. Connections handed back inside a transaction or broken are
+discarded; with ``CONN_HEALTH_CHECKS`` idle ones are pinged before reuse.
+"""
+import collections
+import threading
+from functools import partial
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+Database = base.Database
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Bounded set of open connections shared by the threads of a process"""
+
+    def __init__(self, size, timeout):
+        self.size, self.timeout = size, timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = collections.deque()
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._counters = {'created': 0, 'reused': 0, 'discarded': 0, 'timeouts': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _take_idle(self):
+        with self._lock:
+            return self._idle.pop() if self._idle else None
+
+    @staticmethod
+    def is_usable(connection, check):
+        if connection.closed:
+            return False
+        if not check:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Database.Error:
+            return False
+        return True
+
+    def acquire(self, connect, check=False):
+        """an idle connection that passes ``check``, or a new one from ``connect()``"""
+        if not self._slots.acquire(timeout=self.timeout):
+            self._count('timeouts')
+            raise Database.OperationalError(
+                f"no pooled database connection became free within {self.timeout}s"
+            )
+        try:
+            connection = self._take_idle()
+            while connection is not None and not self.is_usable(connection, check):
+                self.discard(connection)
+                connection = self._take_idle()
+            if connection is None:
+                connection = connect()
+                self._count('created')
+            else:
+                self._count('reused')
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+        return connection
+
+    def release(self, connection):
+        """hand ``connection`` back, keeping it only if it is idle and open"""
+        try:
+            if connection.closed or connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                self.discard(connection)
+            else:
+                with self._lock:
+                    self._idle.append(connection)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def discard(self, connection):
+        self._count('discarded')
+        try:
+            connection.close()
+        except Database.Error:
+            pass
+
+    def close_idle(self):
+        """close every idle connection, e.g. before dropping the database"""
+        while (connection := self._take_idle()) is not None:
+            connection.close()
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._counters, size=self.size, timeout=self.timeout,
+                in_use=self._in_use, idle=len(self._idle),
+            )
+
+
+def get_pool(key, options):
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(int(options.get('SIZE', 10)), float(options.get('TIMEOUT', 30)))
+        return _pools[key]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def pool(self):
+        settings = self.settings_dict
+        # test and maintenance databases get pools of their own
+        key = (self.alias, settings['NAME'], settings['HOST'], settings['PORT'], settings['USER'])
+        return get_pool(key, settings.get('POOL', {}))
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire(
+            partial(super().get_new_connection, conn_params), check=self.settings_dict['CONN_HEALTH_CHECKS'],
+        )
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
@@ -0,0 +1,14 @@
+from .settings import *
+
+# benchmarks run on SQLite without any external service; the benchmark
+# scripts create and drop the test database themselves
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'bench.sqlite3',
+    }
+}
+TRANSACTIONS_READ_REPLICAS = []
+
+# deep chains make some requests slow on purpose
+TRANSACTIONS_SLOW_REQUEST_SECONDS = float('inf')
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -46,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so the latency covers the whole stack
+    'transactions.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,10 +89,96 @@ DATABASES = {
         'USER': os.getenv("DB_USER"), 
         'PASSWORD': os.getenv("DB_PASSWORD"), 
         'HOST': os.getenv("DB_HOST"), 
-        'PORT': os.getenv("DB_PORT")
+        'PORT': os.getenv("DB_PORT"),
+        # keep connections open across requests instead of reconnecting for
+        # each one, and ping them before reuse after an idle period
+        'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        'CONN_HEALTH_CHECKS': os.getenv("DB_CONN_HEALTH_CHECKS", "true").lower() in ("true", "1", "yes"),
     }
 }
 
+# Process-wide connection pool, enabled with a non-zero DB_POOL_SIZE.
+# Connections go back to the pool at the end of every request, so
+# persistence is left to the pool.
+if int(os.getenv("DB_POOL_SIZE", 0)):
+    DATABASES['default'].update({
+        'ENGINE': 'transaction_service.backends.postgresql_pool',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'SIZE': int(os.getenv("DB_POOL_SIZE")),
+            'TIMEOUT': float(os.getenv("DB_POOL_TIMEOUT", 5)),
+        },
+    })
+
+# Read replicas as a comma separated list of host[:port]; the list, type
+# and sum endpoints read from them, see transactions.routers
+TRANSACTIONS_READ_REPLICAS = []
+for number, address in enumerate(filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(","))):
+    host, _, port = address.strip().partition(":")
+    DATABASES[f'replica_{number}'] = dict(
+        DATABASES['default'], HOST=host, PORT=port or DATABASES['default']['PORT'],
+        TEST={'MIRROR': 'default'},
+    )
+    TRANSACTIONS_READ_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['transactions.routers.ReadReplicaRouter']
+
+# Seconds the response to a request with an Idempotency-Key is replayed
+# to its retries
+TRANSACTIONS_IDEMPOTENCY_TTL = 24 * 60 * 60
+
+# Requests taking longer are logged with their SQL by transactions.metrics
+TRANSACTIONS_SLOW_REQUEST_SECONDS = 1.0
+
+# Seconds a value read from a replica may stay in the read-through cache;
+# it can trail the primary by the replication lag
+TRANSACTIONS_REPLICA_CACHE_TIMEOUT = 5
+
+# Seconds the changes feed holds back recent modifications, covering the
+# time between modified_on being stamped and the write committing
+TRANSACTIONS_CHANGES_SETTLE_SECONDS = 5
+
+# SQLite file journaling single creates for the drain_journal worker; the
+# write-behind path is off without it. POST transaction/ requests sending
+# "Prefer: respond-async" are queued, or all of them with WRITE_BEHIND.
+# The worker invalidates cached reads from its own process, so the
+# "transactions" cache must then be shared (see CACHES)
+TRANSACTIONS_JOURNAL_PATH = os.getenv("TRANSACTIONS_JOURNAL_PATH") or None
+TRANSACTIONS_WRITE_BEHIND = os.getenv("TRANSACTIONS_WRITE_BEHIND", "false").lower() in ("true", "1", "yes")
+
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # read-through cache of transaction reads; LocMemCache evicts in LRU order
+    'transactions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'transactions',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+TRANSACTIONS_CACHE_ALIAS = 'transactions'
+
+# Worker processes serving requests; gunicorn and uvicorn read the same
+# variable. An invalidation only reaches the cache of the process making
+# it, so with several processes, or the drain_journal worker, the cache
+# above is replaced by files shared by all of them (checked at startup)
+TRANSACTIONS_WEB_PROCESSES = int(os.getenv("WEB_CONCURRENCY", 1))
+
+if TRANSACTIONS_WEB_PROCESSES > 1 or TRANSACTIONS_JOURNAL_PATH:
+    CACHES['transactions'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv("TRANSACTIONS_CACHE_DIR") or os.path.join(tempfile.gettempdir(), 'transactions-cache'),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
 
 
 # Password validation
@@ -132,3 +221,23 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'transactions.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+    # encodes values_list() rows without serializer instances; the output
+    # matches rest_framework.renderers.JSONRenderer byte for byte
+    'DEFAULT_RENDERER_CLASSES': [
+        'transactions.renderers.TransactionJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Rows fetched per round trip when streaming a full transaction export
+TRANSACTIONS_EXPORT_CHUNK_SIZE = 2000
+
+# Rows per INSERT when creating transactions in bulk
+TRANSACTIONS_BULK_CHUNK_SIZE = 1000
+
+# Rows per UPDATE of bulk and subtree updates
+TRANSACTIONS_BULK_UPDATE_BATCH_SIZE = 1000
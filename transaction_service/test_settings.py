@@ -1,3 +1,7 @@
 from .settings import *
 
-DATABASES['default']['NAME'] = 'pytest_db'
\ No newline at end of file
+DATABASES['default']['NAME'] = 'pytest_db'
+
+# idle pooled connections would keep the test database from being dropped
+DATABASES['default'].pop('POOL', None)
+DATABASES['default']['ENGINE'] = 'django.db.backends.postgresql_psycopg2'
@@ -15,8 +15,10 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from transactions.views import Metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('transaction_service/', include('transactions.urls'))
+    path('transaction_service/', include('transactions.urls')),
+    path('metrics', Metrics.as_view(), name='metrics'),
 ]
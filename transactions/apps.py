@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class TransactionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'transactions'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from transactions import checks  # noqa: F401 registers the system checks
+        from transactions.metrics import install_query_recorder
+
+        connection_created.connect(install_query_recorder, dispatch_uid='transactions.metrics')
@@ -0,0 +1,140 @@
+"""
+Async versions of the read endpoints, for deployments under ASGI.
+
+DRF's ``APIView`` only runs synchronously, so these are plain Django
+views rendering with the same serializers, renderer, cache and validators
+as their counterparts in ``transactions.views``; their JSON bodies are the
+same bytes. Queries go through Django's async ORM interface, which runs
+them off the event loop.
+"""
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from transactions import cache, conditional
+from transactions.models import Transactions
+from transactions.pagination import KeysetPagination
+from transactions.renderers import TransactionIdRows, TransactionJSONRenderer
+from transactions.routers import replica_reads
+from transactions.serializers import TransactionGetSerializer, TransactionTypeRequestSerializer
+from transactions.views import TRANSACTION_READ_FIELDS, TransactionListQuery, cache_key
+
+
+class AsyncReadView(View):
+    """
+    Base async view rendering JSON and reporting errors like DRF does.
+    """
+    renderer_class = TransactionJSONRenderer
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return self.render({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return self.render(data, status=exc.status_code)
+
+    def render(self, data, status=status.HTTP_200_OK):
+        return HttpResponse(
+            self.renderer_class().render(data), status=status,
+            content_type=self.renderer_class.media_type,
+        )
+
+    def conditional_render(self, request, etag, modified_on, data):
+        not_modified = conditional.evaluate(request, etag, modified_on)
+        if not_modified is not None:
+            return not_modified
+        return conditional.set_validators(self.render(data), etag, modified_on)
+
+
+class AsyncTransactionList(AsyncReadView):
+    """
+    List transactions one page at a time, with the filters of the
+    synchronous list.
+    """
+    pagination_class = KeysetPagination
+
+    @replica_reads
+    async def get(self, request, format=None):
+        if 'export' in request.GET:
+            # StreamingHttpResponse cannot consume an async iterator here
+            return self.render(
+                {"export": ["Exports are served by the synchronous list endpoint."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        query = TransactionListQuery(request.GET)
+        validators = await query.avalidators()
+        etag = conditional.entity_tag(request, request.get_full_path(), validators['modified_on'])
+        not_modified = conditional.evaluate(request, etag, validators['modified_on'])
+        if not_modified is not None:
+            return not_modified
+        paginator = self.pagination_class()
+        paginator.ordering = query.ordering
+        page = await paginator.apaginate_queryset(
+            query.queryset.values_list(*query.columns, named=True), Request(request), view=self
+        )
+        response = self.render(paginator.get_paginated_response(query.rows_class(page)).data)
+        return conditional.set_validators(response, etag, validators['modified_on'])
+
+
+class AsyncTransactionDetail(AsyncReadView):
+    """
+    Retrieve Transaction instance.
+    """
+    async def load(self, pk):
+        try:
+            transaction_object = await Transactions.objects.with_id(pk).only(
+                *TRANSACTION_READ_FIELDS, 'modified_on'
+            ).aget()
+        except Transactions.DoesNotExist:
+            return None
+        return dict(TransactionGetSerializer(transaction_object).data), transaction_object.modified_on
+
+    async def get(self, request, pk, format=None):
+        key = cache_key(pk)
+        entry = key and await cache.aget_or_load('detail', key, lambda: self.load(key))
+        if entry is None:
+            raise Http404
+        response, modified_on = entry
+        etag = conditional.entity_tag(request, key, modified_on)
+        return self.conditional_render(request, etag, modified_on, response)
+
+
+class AsyncTransactionTypeView(AsyncReadView):
+    """
+    List the ids of the live transactions of a type.
+    """
+    async def load(self, type):
+        types = [
+            row async for row in Transactions.objects.filter(type = type).values_list(
+                'id', 'modified_on'
+            ).aiterator()
+        ]
+        modified_on = max((row[1] for row in types), default=None)
+        return TransactionIdRows(types), modified_on
+
+    @replica_reads
+    async def get(self, request, type, format=None):
+        serializer = TransactionTypeRequestSerializer(data={"type":type})
+        if not serializer.is_valid():
+            return self.render(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        response, modified_on = await cache.aget_or_load('type', type, lambda: self.load(type))
+        etag = conditional.entity_tag(request, type, modified_on, *(row[0] for row in response.rows))
+        return self.conditional_render(request, etag, modified_on, response)
+
+
+class AsyncTransactionSum(AsyncReadView):
+    """
+    Retrieve the sum of the amounts of a transaction and its descendants.
+    """
+    @replica_reads
+    async def get(self, request, pk, format=None):
+        key = cache_key(pk)
+        amount = key and await cache.aget_or_load(
+            'sum', key,
+            lambda: Transactions.objects.filter(pk=key).values_list('subtree_amount', flat=True).afirst(),
+        )
+        return self.render({"sum": amount if amount is not None else 0})
@@ -0,0 +1,119 @@
+"""
+Read-through cache for transaction details, type listings and subtree sums.
+
+Entries live in the Django cache named by ``TRANSACTIONS_CACHE_ALIAS`` (an
+in-process LRU ``LocMemCache`` by default; any cache backend can be
+plugged in through ``CACHES``). Every cached key has a generation token;
+a value is only served if it was stored under the current generation.
+Invalidating a key replaces its generation, so a reader that loaded the
+database before a write can never serve its result after that write,
+even if it stores it afterwards. Values loaded from a read replica can
+trail the primary by the replication lag, so they are only kept for
+``TRANSACTIONS_REPLICA_CACHE_TIMEOUT`` seconds.
+"""
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from transactions import routers
+
+KINDS = ('detail', 'type', 'sum')
+
+_counters_lock = threading.Lock()
+_counters = {kind: {'hits': 0, 'misses': 0} for kind in KINDS}
+
+
+def get_cache():
+    return caches[getattr(settings, 'TRANSACTIONS_CACHE_ALIAS', 'transactions')]
+
+
+def _keys(kind, key):
+    return f'transactions:{kind}:{key}:generation', f'transactions:{kind}:{key}'
+
+
+def _timeout():
+    """keyword arguments of cache.set for the value just loaded"""
+    if routers.current_read_alias() is None:
+        return {}
+    return {'timeout': getattr(settings, 'TRANSACTIONS_REPLICA_CACHE_TIMEOUT', 5)}
+
+
+def _count(kind, outcome):
+    with _counters_lock:
+        _counters[kind][outcome] += 1
+
+
+def get_or_load(kind, key, loader):
+    """
+    Return the cached value of ``key``, or call ``loader`` and cache its
+    result. ``None`` results (missing rows) are never cached.
+    """
+    cache = get_cache()
+    generation_key, value_key = _keys(kind, key)
+    found = cache.get_many([generation_key, value_key])
+    generation = found.get(generation_key)
+    if generation is None:
+        cache.add(generation_key, uuid.uuid4().hex, timeout=None)
+        generation = cache.get(generation_key)
+    entry = found.get(value_key)
+    if entry is not None and entry[0] == generation:
+        _count(kind, 'hits')
+        return entry[1]
+    _count(kind, 'misses')
+    value = loader()
+    if value is not None:
+        cache.set(value_key, (generation, value), **_timeout())
+    return value
+
+
+async def aget_or_load(kind, key, loader):
+    """``get_or_load`` for async views; ``loader`` is a coroutine function"""
+    cache = get_cache()
+    generation_key, value_key = _keys(kind, key)
+    found = await cache.aget_many([generation_key, value_key])
+    generation = found.get(generation_key)
+    if generation is None:
+        await cache.aadd(generation_key, uuid.uuid4().hex, timeout=None)
+        generation = await cache.aget(generation_key)
+    entry = found.get(value_key)
+    if entry is not None and entry[0] == generation:
+        _count(kind, 'hits')
+        return entry[1]
+    _count(kind, 'misses')
+    value = await loader()
+    if value is not None:
+        await cache.aset(value_key, (generation, value), **_timeout())
+    return value
+
+
+def invalidate(details=(), types=(), sums=()):
+    """
+    Expire the given keys now and again once the surrounding transaction
+    commits, so readers racing the commit cannot keep the old value.
+    """
+    keys = [
+        _keys(kind, key)[0]
+        for kind, group in (('detail', details), ('type', types), ('sum', sums))
+        for key in set(group)
+    ]
+    if not keys:
+        return
+
+    def expire():
+        get_cache().set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+
+    expire()
+    transaction.on_commit(expire)
+
+
+def clear():
+    get_cache().clear()
+
+
+def stats():
+    """Hit and miss counters of this process, per kind of entry"""
+    with _counters_lock:
+        return {kind: dict(counts) for kind, counts in _counters.items()}
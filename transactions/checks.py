@@ -0,0 +1,53 @@
+"""
+System checks run at startup and by ``manage.py check``.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# backends whose entries are only visible to the process holding them
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def process_local_alias():
+    """the alias of the transactions cache when its backend is process-local"""
+    alias = getattr(settings, 'TRANSACTIONS_CACHE_ALIAS', 'transactions')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    return alias if backend in PROCESS_LOCAL_CACHES else None
+
+
+@register(Tags.caches)
+def check_journal_cache(app_configs, **kwargs):
+    """
+    the drain_journal worker invalidates cached reads from its own process;
+    with a process-local cache the web workers would serve stale sums, type
+    listings and details until the entries time out
+    """
+    alias = process_local_alias()
+    if not getattr(settings, 'TRANSACTIONS_JOURNAL_PATH', None) or alias is None:
+        return []
+    return [Error(
+        f'The "{alias}" cache is local to each process, but TRANSACTIONS_JOURNAL_PATH is set.',
+        hint=f'Point CACHES["{alias}"] at a shared backend (memcached, redis, database, files) or '
+             'DummyCache, so invalidations from drain_journal reach the web workers.',
+        obj='TRANSACTIONS_JOURNAL_PATH',
+        id='transactions.E001',
+    )]
+
+
+@register(Tags.caches)
+def check_web_processes_cache(app_configs, **kwargs):
+    """
+    a write invalidates the cache of the process serving it only; the other
+    web processes would serve stale reads until the entries time out
+    """
+    processes = getattr(settings, 'TRANSACTIONS_WEB_PROCESSES', 1)
+    alias = process_local_alias()
+    if processes <= 1 or alias is None:
+        return []
+    return [Error(
+        f'The "{alias}" cache is local to each process, but {processes} web processes serve requests.',
+        hint=f'Point CACHES["{alias}"] at a shared backend (memcached, redis, database, files) or '
+             'DummyCache, so every process sees the invalidations of the others.',
+        obj='TRANSACTIONS_WEB_PROCESSES',
+        id='transactions.E002',
+    )]
@@ -0,0 +1,46 @@
+"""
+Validators for conditional requests.
+
+Views compute an entity tag and a last modification time from
+``modified_on`` before rendering anything, so a request whose validators
+still match is answered with 304 (or 412 for failed ``If-Match`` /
+``If-Unmodified-Since`` preconditions) without serializing the body.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def entity_tag(request, *parts):
+    """
+    Strong entity tag of ``parts`` for the representation negotiated for
+    ``request``; the JSON and browsable API bodies differ, so do their tags.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    payload = '|'.join(str(part) for part in (getattr(renderer, 'format', ''), *parts))
+    return quote_etag(hashlib.sha1(payload.encode()).hexdigest())
+
+
+def timestamp(modified_on):
+    return int(modified_on.timestamp()) if modified_on is not None else None
+
+
+def evaluate(request, etag, modified_on):
+    """
+    The 304 or 412 response for ``request``, or None when the view has to
+    produce the full response.
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp(modified_on)
+    )
+    if response is not None:
+        set_validators(response, etag, modified_on)
+    return response
+
+
+def set_validators(response, etag, modified_on):
+    response.headers['ETag'] = etag
+    if modified_on is not None:
+        response.headers['Last-Modified'] = http_date(timestamp(modified_on))
+    return response
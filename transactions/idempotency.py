@@ -0,0 +1,109 @@
+"""
+Safe retries of POST, PUT and PATCH requests carrying an ``Idempotency-Key``.
+
+The first request with a key claims it with a row under a unique
+constraint and runs in one transaction with that row. Its response is
+stored in the row before the commit. Retries with the same key get the
+stored response back, without any validation or write, and with
+``Idempotent-Replayed: true``. A retry arriving while the first request
+is still running waits on the unique index rather than on a lock of its
+own. A key reused for a different request is refused with 422. Keys
+expire after ``TRANSACTIONS_IDEMPOTENCY_TTL`` seconds and are deleted by
+the ``purge_idempotency_keys`` command.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from transactions.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+# response headers replayed along with the body
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Location')
+
+
+class IdempotencyKeyMismatch(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used with a different request.'
+    default_code = 'idempotency_key_mismatch'
+
+
+class Replay(Exception):
+    """carries the stored response of an already processed request"""
+    def __init__(self, response):
+        self.response = response
+
+
+def fingerprint(request):
+    digest = hashlib.sha256()
+    for part in (request.method, request.get_full_path(), request.body):
+        digest.update(part if isinstance(part, bytes) else part.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def stored_response(stored):
+    response = HttpResponse(bytes(stored.body), status=stored.status_code)
+    for name, value in stored.headers.items():
+        response[name] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+class IdempotentMixin:
+    """
+    ``APIView`` mixin replaying the stored response of POST, PUT and PATCH
+    requests retried with the same ``Idempotency-Key``.
+    """
+    idempotent_methods = ('POST', 'PUT', 'PATCH')
+
+    def dispatch(self, request, *args, **kwargs):
+        self.idempotency_key = None
+        if request.method in self.idempotent_methods and HEADER in request.headers:
+            with transaction.atomic():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        key = request.headers.get(HEADER)
+        if key is None or request.method not in self.idempotent_methods:
+            return
+        if not 0 < len(key) <= IdempotencyKey._meta.get_field('key').max_length:
+            raise ValidationError({HEADER: ['Must be between 1 and 255 characters.']})
+        request_fingerprint = fingerprint(request._request)
+        ttl = timedelta(seconds=getattr(settings, 'TRANSACTIONS_IDEMPOTENCY_TTL', 86400))
+        stored = IdempotencyKey.objects.reserve(key, request_fingerprint, ttl)
+        if stored is None:
+            self.idempotency_key = key
+        elif stored.fingerprint != request_fingerprint:
+            raise IdempotencyKeyMismatch()
+        else:
+            raise Replay(stored_response(stored))
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Replay):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.idempotency_key is None:
+            return response
+        if response.status_code >= 500 or response.streaming:
+            # let the client retry for real
+            IdempotencyKey.objects.filter(key=self.idempotency_key).delete()
+            return response
+        if hasattr(response, 'render'):
+            response.render()
+        IdempotencyKey.objects.filter(key=self.idempotency_key).update(
+            status_code=response.status_code,
+            headers={name: response[name] for name in STORED_HEADERS if response.has_header(name)},
+            body=response.content,
+        )
+        return response
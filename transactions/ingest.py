@@ -0,0 +1,186 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from transactions import cache
+from transactions.models import TransactionArchive, TransactionRollup, Transactions, chunked
+from transactions.serializers import TransactionBulkItemSerializer
+
+
+class BulkIngestion:
+    """
+    Validate and insert a batch of transactions with a fixed number of
+    queries: one lookup for every referenced parent and client supplied id,
+    chunked bulk INSERTs, and one pass over the ancestors of the batch to
+    maintain the subtree aggregates.
+
+    An item may use as parent any existing transaction or any valid item
+    defined earlier in the same batch.
+    """
+    missing_parent_message = 'Invalid pk "{pk}" - object does not exist.'
+    invalid_parent_message = 'Parent "{pk}" is invalid in this batch.'
+    duplicate_id_message = 'Transaction with id "{pk}" already exists.'
+
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size or getattr(settings, 'TRANSACTIONS_BULK_CHUNK_SIZE', 1000)
+
+    def validate(self, items):
+        """
+        Return one ``(data, errors)`` pair per item; ``data`` carries the
+        assigned id and hierarchy position of valid items. Run it in the
+        transaction inserting the items: the referenced rows stay locked
+        until the insert commits, so a parent cannot be archived or moved
+        in between.
+        """
+        # ids of archived rows are taken too, but they cannot be parents
+        objects = Transactions.all_objects
+        item_serializer = TransactionBulkItemSerializer()
+        validated = []
+        for item in items:
+            try:
+                validated.append((item_serializer.run_validation(item), None))
+            except ValidationError as exc:
+                validated.append((None, exc.detail))
+
+        referenced, supplied = set(), set()
+        for data, errors in validated:
+            if data is None:
+                continue
+            if data.get('id'):
+                supplied.add(objects.to_id(data['id']))
+            data['id'] = objects.to_id(data.get('id') or Transactions._meta.pk.get_default())
+            data['parent_id'] = objects.to_id(data.get('parent_id'))
+            referenced.update(pk for pk in (data['id'], data['parent_id']) if pk is not None)
+        # the parents and their ancestors, which insert() adds to, stay
+        # locked until the batch commits
+        size = connection.features.max_query_params or len(referenced) or 1
+        objects.lock_ancestors(referenced, batch_size=size)
+        existing = {}
+        for chunk in chunked(referenced, size):
+            for row in objects.filter(pk__in=chunk).values('id', 'depth', 'root_id', 'is_deleted'):
+                existing[objects.to_id(row['id'])] = row
+        # archived ids stay taken, generated ones cannot collide with them
+        archived = set()
+        for chunk in chunked(supplied, connection.features.max_query_params or len(supplied) or 1):
+            archived.update(TransactionArchive.objects.filter(pk__in=chunk).values_list('id', flat=True))
+
+        results = []
+        batch, rejected = {}, set()
+        # children of items that failed field validation are reported as such
+        for (data, errors), item in zip(validated, items):
+            if errors and isinstance(item, dict) and item.get('id'):
+                try:
+                    rejected.add(objects.to_id(item['id']))
+                except (DjangoValidationError, ValueError, TypeError):
+                    pass
+        for data, errors in validated:
+            if data is not None:
+                pk, parent_id = data['id'], data['parent_id']
+                if pk in existing or pk in archived or pk in batch or pk in rejected:
+                    errors = {'id': [self.duplicate_id_message.format(pk=pk)]}
+                elif parent_id is None:
+                    data['depth'], data['root_id'] = 0, pk
+                elif parent_id in batch:
+                    parent = batch[parent_id]
+                    data['depth'], data['root_id'] = parent['depth'] + 1, parent['root_id']
+                elif parent_id in existing and not existing[parent_id]['is_deleted']:
+                    parent = existing[parent_id]
+                    data['depth'], data['root_id'] = parent['depth'] + 1, objects.to_id(parent['root_id'])
+                elif parent_id in rejected:
+                    errors = {'parent_id': [self.invalid_parent_message.format(pk=parent_id)]}
+                else:
+                    errors = {'parent_id': [self.missing_parent_message.format(pk=parent_id)]}
+                if errors:
+                    rejected.add(pk)
+                    data = None
+                else:
+                    batch[pk] = data
+            results.append((data, errors))
+        return results
+
+    def insert(self, rows):
+        """
+        Insert validated rows and maintain the aggregates of their ancestors.
+        Rows may carry ``is_deleted`` to load archived history.
+        """
+        subtree = {
+            row['id']: [Decimal(0), 0] if row.get('is_deleted') else [row['amount'], 1]
+            for row in rows
+        }
+        external = {}
+        # children come after their parents, so walking backwards folds every
+        # in-batch subtree into its top-most row before it is attached
+        for row in reversed(rows):
+            amount, count = subtree[row['id']]
+            parent_id = row['parent_id']
+            if parent_id in subtree:
+                subtree[parent_id][0] += amount
+                subtree[parent_id][1] += count
+            elif parent_id is not None:
+                delta = external.setdefault(parent_id, [Decimal(0), 0])
+                delta[0] += amount
+                delta[1] += count
+
+        with transaction.atomic():
+            created = Transactions.objects.bulk_create(
+                [
+                    Transactions(
+                        id=row['id'],
+                        parent_id_id=row['parent_id'],
+                        type=row['type'],
+                        amount=row['amount'],
+                        is_deleted=row.get('is_deleted', False),
+                        root_id_id=row['root_id'],
+                        depth=row['depth'],
+                        subtree_amount=subtree[row['id']][0],
+                        subtree_count=subtree[row['id']][1],
+                    )
+                    for row in rows
+                ],
+                batch_size=self.chunk_size,
+            )
+            changed_sums = Transactions.all_objects.add_to_subtrees_many(
+                {pk: tuple(delta) for pk, delta in external.items()},
+                batch_size=self.chunk_size,
+            )
+            TransactionRollup.objects.add(
+                (obj.created_on, obj.type, obj.amount, 1) for obj in created if not obj.is_deleted
+            )
+            cache.invalidate(types={row['type'] for row in rows}, sums=changed_sums)
+
+    def ingest(self, items, atomic=True):
+        """
+        Validate and insert ``items``. With ``atomic`` nothing is inserted
+        unless every item is valid; otherwise the valid items are inserted
+        and the invalid ones reported.
+
+        Returns the per item results and the number of inserted rows.
+        """
+        with transaction.atomic():
+            validated = self.validate(items)
+            failed = any(errors for data, errors in validated)
+            rows = [data for data, errors in validated if data is not None]
+            if rows and not (atomic and failed):
+                try:
+                    self.insert(rows)
+                except IntegrityError:
+                    # an id inserted by a concurrent batch after validate()
+                    # read; validating again reports it as a duplicate
+                    validated = self.validate(items)
+                    failed = any(errors for data, errors in validated)
+                    rows = [data for data, errors in validated if data is not None]
+                    if rows and not (atomic and failed):
+                        self.insert(rows)
+        created = 0 if atomic and failed else len(rows)
+        results = []
+        for data, errors in validated:
+            if errors:
+                results.append({'errors': errors})
+            elif created:
+                results.append({'id': str(data['id'])})
+            else:
+                results.append({})
+        return results, created
@@ -0,0 +1,226 @@
+"""
+Write-behind ingestion of single transactions.
+
+With ``TRANSACTIONS_JOURNAL_PATH`` set, ``POST transaction/`` requests that
+send ``Prefer: respond-async``, or all of them with
+``TRANSACTIONS_WRITE_BEHIND``, are validated field by field, given their id
+and appended to a local SQLite journal, then answered with 202. The
+``drain_journal`` worker moves the queued entries into the database in
+group commits of up to N rows, or whatever arrived within T milliseconds,
+through ``BulkIngestion``. Parents are checked there, for the whole batch
+at once, and entries that fail are kept with their errors.
+
+Ids are assigned before the entry is journaled. The worker claims a
+batch in the journal before inserting it and marks it committed after
+the database commit. A claimed entry whose id exists was inserted by a
+run that crashed before marking it; any other entry whose id exists
+fails as a duplicate. A worker that crashes anywhere in between
+therefore neither loses nor duplicates a transaction when it restarts.
+Run a single worker per journal.
+"""
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+
+from transactions.ingest import BulkIngestion
+from transactions.models import Transactions
+
+QUEUED, CLAIMED, COMMITTED, FAILED = 'queued', 'claimed', 'committed', 'failed'
+
+SCHEMA = """
+create table if not exists journal (
+    seq integer primary key autoincrement,
+    id text not null unique,
+    payload text not null,
+    state text not null,
+    errors text,
+    enqueued_at real not null,
+    processed_at real
+)
+"""
+
+
+class DuplicateEntry(Exception):
+    """an entry with the same id is in the journal"""
+
+
+@dataclass
+class Entry:
+    seq: int
+    id: str
+    item: dict
+    state: str
+    enqueued_at: float
+
+
+class Journal:
+    """Durable FIFO of transactions to insert, in one SQLite file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('pragma journal_mode=wal')
+            # an acknowledged entry must survive a power loss
+            connection.execute('pragma synchronous=full')
+            connection.execute(SCHEMA)
+            connection.execute('create index if not exists journal_state on journal (state, seq)')
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def append(self, item):
+        """
+        journal the serialized ``item``, which carries its assigned ``id``;
+        raises ``DuplicateEntry`` when that id is journaled already
+        """
+        try:
+            self.connection().execute(
+                'insert into journal (id, payload, state, enqueued_at) values (?, ?, ?, ?)',
+                (item['id'], json.dumps(item), QUEUED, time.time()),
+            )
+        except sqlite3.IntegrityError:
+            raise DuplicateEntry(item['id'])
+
+    def queued(self, limit):
+        """oldest entries not processed yet, claimed or not"""
+        rows = self.connection().execute(
+            'select seq, id, payload, state, enqueued_at from journal where state in (?, ?) order by seq limit ?',
+            (QUEUED, CLAIMED, limit),
+        ).fetchall()
+        return [Entry(seq, pk, json.loads(payload), state, enqueued_at) for seq, pk, payload, state, enqueued_at in rows]
+
+    def claim(self, ids):
+        """record that the entries ``ids`` are about to be inserted"""
+        self.mark([(pk, CLAIMED, None) for pk in ids])
+
+    def mark(self, outcomes):
+        """record ``(id, state, errors)`` outcomes in one journal transaction"""
+        connection = self.connection()
+        now = time.time()
+        connection.execute('begin immediate')
+        try:
+            connection.executemany(
+                'update journal set state = ?, errors = ?, processed_at = ? where id = ?',
+                [(state, errors and json.dumps(errors), now, pk) for pk, state, errors in outcomes],
+            )
+        except BaseException:
+            connection.execute('rollback')
+            raise
+        connection.execute('commit')
+
+    def status(self, pk):
+        row = self.connection().execute('select state, errors from journal where id = ?', (pk,)).fetchone()
+        if row is None:
+            return None
+        # claiming is internal to the worker
+        return {'state': QUEUED if row[0] == CLAIMED else row[0], 'errors': row[1] and json.loads(row[1])}
+
+    def prune(self, before):
+        """forget the entries committed before the ``before`` timestamp"""
+        return self.connection().execute(
+            'delete from journal where state = ? and processed_at < ?', (COMMITTED, before),
+        ).rowcount
+
+    def counts(self):
+        return dict(self.connection().execute('select state, count(*) from journal group by state').fetchall())
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal():
+    """journal of ``TRANSACTIONS_JOURNAL_PATH``, or None when write-behind is off"""
+    path = getattr(settings, 'TRANSACTIONS_JOURNAL_PATH', None)
+    if not path:
+        return None
+    with _journals_lock:
+        if path not in _journals:
+            _journals[path] = Journal(path)
+        return _journals[path]
+
+
+def write_behind(request):
+    """whether the POST ``request`` goes through the journal"""
+    if get_journal() is None:
+        return False
+    if getattr(settings, 'TRANSACTIONS_WRITE_BEHIND', False):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '').lower()
+
+
+def inserted_by(item, parent_id, type, amount):
+    """whether a row with the id of the journaled ``item`` holds its values"""
+    objects = Transactions.all_objects
+    return (objects.to_id(item.get('parent_id')), item['type'], Decimal(item['amount'])) \
+        == (objects.to_id(parent_id), type, amount)
+
+
+def drain(journal, batch_size, ingestion=None):
+    """
+    Insert the oldest ``batch_size`` queued entries in one database
+    transaction and record their outcome. Returns the number of entries
+    processed.
+    """
+    entries = journal.queued(batch_size)
+    if not entries:
+        return 0
+    claimed = {entry.id: entry.item for entry in entries if entry.state == CLAIMED}
+    # inserted by a run that crashed before marking them, provided the row
+    # holds what the entry asked for
+    done = {
+        str(pk) for pk, parent_id, type, amount in Transactions.all_objects.filter(pk__in=claimed).values_list(
+            'id', 'parent_id', 'type', 'amount')
+        if inserted_by(claimed[str(pk)], parent_id, type, amount)
+    }
+    pending = [entry for entry in entries if entry.id not in done]
+    outcomes = [(pk, COMMITTED, None) for pk in done]
+    if pending:
+        # ids taken by someone else are reported by BulkIngestion as duplicates
+        journal.claim([entry.id for entry in pending])
+        results, created = (ingestion or BulkIngestion()).ingest([entry.item for entry in pending], atomic=False)
+        for entry, result in zip(pending, results):
+            if 'errors' in result:
+                outcomes.append((entry.id, FAILED, result['errors']))
+            else:
+                outcomes.append((entry.id, COMMITTED, None))
+    journal.mark(outcomes)
+    return len(entries)
+
+
+def run(journal, batch_size, max_wait, stop, poll=0.01, retain=None, prune_interval=60):
+    """
+    Drain ``journal`` until ``stop`` is set, committing a batch once it
+    holds ``batch_size`` entries or its oldest one waited ``max_wait``
+    seconds. With ``retain``, entries committed more than that many
+    seconds ago are pruned every ``prune_interval`` seconds.
+    """
+    pruned_at = None
+    while not stop.is_set():
+        if retain is not None and (pruned_at is None or time.monotonic() - pruned_at >= prune_interval):
+            journal.prune(time.time() - retain)
+            pruned_at = time.monotonic()
+        entries = journal.queued(batch_size)
+        if not entries:
+            stop.wait(poll)
+            continue
+        waited = time.time() - entries[0].enqueued_at
+        if len(entries) < batch_size and waited < max_wait:
+            stop.wait(min(poll, max_wait - waited))
+            continue
+        drain(journal, batch_size)
@@ -0,0 +1,87 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from transactions.models import TransactionArchive, Transactions
+
+ARCHIVED_FIELDS = ('id', 'parent_id_id', 'root_id_id', 'depth', 'type', 'amount', 'created_on', 'modified_on')
+
+
+class Command(BaseCommand):
+    help = (
+        "Move soft-deleted transactions without children out of the hot "
+        "table into the archive table, in bounded batches. Subtrees are "
+        "peeled from the leaves up; the command can be interrupted and run "
+        "again at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=30,
+            help="Only archive rows deleted at least this many days ago.",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Rows moved per transaction.",
+        )
+        parser.add_argument(
+            '--max-batches', type=int, default=None,
+            help="Stop after this many batches; the next run resumes.",
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help="Seconds to pause between batches, to leave room for writers.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        archived = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            moved = self.archive_batch(cutoff, options['batch_size'])
+            if not moved:
+                break
+            archived += moved
+            batches += 1
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} transactions in {batches} batches"))
+
+    def candidates(self, cutoff):
+        """deleted rows past the cutoff that no other row hangs below"""
+        objects = Transactions.all_objects
+        return objects.filter(is_deleted=True, modified_on__lt=cutoff).filter(
+            ~Exists(objects.filter(parent_id=OuterRef('pk')))
+        ).order_by('modified_on', 'id')
+
+    def archive_batch(self, cutoff, batch_size):
+        """
+        Copy one batch to the archive and delete it from the hot table in a
+        single transaction, so a crash leaves either both or neither. An id
+        already in the archive fails the batch: the hot row is kept rather
+        than deleted without a copy.
+        """
+        skip_locked = connection.features.has_select_for_update_skip_locked
+        with transaction.atomic():
+            rows = list(self.candidates(cutoff).select_for_update(skip_locked=skip_locked).values_list(
+                *ARCHIVED_FIELDS
+            )[:batch_size])
+            if not rows:
+                return 0
+            try:
+                with transaction.atomic():
+                    TransactionArchive.objects.bulk_create([
+                        TransactionArchive(
+                            id=pk, parent_id=parent_id, root_id=root_id, depth=depth, type=type,
+                            amount=amount, created_on=created_on, modified_on=modified_on,
+                        )
+                        for pk, parent_id, root_id, depth, type, amount, created_on, modified_on in rows
+                    ])
+            except IntegrityError:
+                taken = TransactionArchive.objects.filter(pk__in=[row[0] for row in rows]).values_list('id', flat=True)
+                raise CommandError(f"Already archived, left in place: {', '.join(str(pk) for pk in taken)}")
+            Transactions.all_objects.filter(pk__in=[row[0] for row in rows], is_deleted=True).delete()
+        return len(rows)
@@ -0,0 +1,60 @@
+import logging
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from transactions import journal
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the transactions queued in the write-behind journal into the "
+        "database, in group commits of --batch-size rows or --max-wait-ms."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows per database transaction.")
+        parser.add_argument(
+            '--max-wait-ms', type=float, default=50,
+            help="Commit a partial batch once its oldest entry waited this long.",
+        )
+        parser.add_argument('--once', action='store_true', help="Drain what is queued now, then exit.")
+        parser.add_argument(
+            '--retain', type=float, default=24 * 60 * 60,
+            help="Seconds committed entries stay in the journal for the status endpoint.",
+        )
+        parser.add_argument(
+            '--prune-interval', type=float, default=60,
+            help="Seconds between prunes of the committed entries while the worker runs.",
+        )
+
+    def handle(self, *args, **options):
+        queue = journal.get_journal()
+        if queue is None:
+            raise CommandError("TRANSACTIONS_JOURNAL_PATH is not set")
+        if options['once']:
+            drained = 0
+            while processed := journal.drain(queue, options['batch_size']):
+                drained += processed
+            self.stdout.write(self.style.SUCCESS(f"Drained {drained} queued transactions"))
+        else:
+            stop = threading.Event()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *args: stop.set())
+            while not stop.is_set():
+                try:
+                    journal.run(
+                        queue, options['batch_size'], options['max_wait_ms'] / 1000, stop,
+                        retain=options['retain'], prune_interval=options['prune_interval'],
+                    )
+                except Exception:
+                    # the batch stays queued; retry once the database is back
+                    logger.exception("Draining the journal failed")
+                    connection.close()
+                    stop.wait(1)
+        queue.prune(time.time() - options['retain'])
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from transactions.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete expired idempotency keys in bounded batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Keys deleted per DELETE statement.",
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help="Seconds to pause between batches, to leave room for writers.",
+        )
+
+    def handle(self, *args, **options):
+        purged = 0
+        while True:
+            deleted = IdempotencyKey.objects.purge(options['batch_size'])
+            purged += deleted
+            if deleted < options['batch_size']:
+                break
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} expired idempotency keys"))
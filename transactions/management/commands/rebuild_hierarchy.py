@@ -0,0 +1,88 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from transactions import cache
+from transactions.models import Transactions
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the hierarchy index (root, depth) and the materialized "
+        "subtree aggregates of every transaction, then verify the subtree "
+        "totals against the recursive CTE."
+    )
+
+    derived_fields = ['root_id', 'depth', 'subtree_amount', 'subtree_count']
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only', action='store_true',
+            help="Only compare the stored totals with the CTE, do not rebuild.",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Rows written per UPDATE batch.",
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            fixed = self.rebuild(options['batch_size'])
+            self.stdout.write(f"Rebuilt hierarchy, {fixed} rows corrected")
+        mismatches = self.verify()
+        if mismatches:
+            for pk, stored, expected in mismatches[:20]:
+                self.stderr.write(f"{pk}: stored {stored}, expected {expected}")
+            raise CommandError(f"{len(mismatches)} subtree totals do not match the CTE")
+        self.stdout.write(self.style.SUCCESS("Subtree totals match the CTE"))
+
+    def rebuild(self, batch_size):
+        """
+        Recompute every derived column in a single pass over the table,
+        which is linear in the number of rows unlike the per-root CTE.
+        """
+        with transaction.atomic():
+            rows = Transactions.all_objects.select_for_update().values_list(
+                'id', 'parent_id', 'amount', 'is_deleted', *self.derived_fields
+            )
+            children = defaultdict(list)
+            own, stored = {}, {}
+            for pk, parent_id, amount, is_deleted, *derived in rows.iterator():
+                children[parent_id].append(pk)
+                own[pk] = (Decimal(0), 0) if is_deleted else (amount, 1)
+                stored[pk] = tuple(derived)
+
+            computed = {}
+            # iterative depth-first walk from the roots, so deep chains do
+            # not hit the recursion limit; totals are summed on the way back
+            stack = [(pk, pk, 0, False) for pk in children[None]]
+            while stack:
+                pk, root_id, depth, visited = stack.pop()
+                if visited:
+                    amount, count = own[pk]
+                    for child in children[pk]:
+                        amount += computed[child][2]
+                        count += computed[child][3]
+                    computed[pk] = (root_id, depth, amount, count)
+                    continue
+                stack.append((pk, root_id, depth, True))
+                stack.extend((child, root_id, depth + 1, False) for child in children[pk])
+
+            changed = [
+                Transactions(pk=pk, **dict(zip(['root_id_id', *self.derived_fields[1:]], values)))
+                for pk, values in computed.items() if stored[pk] != values
+            ]
+            Transactions.all_objects.bulk_update(changed, self.derived_fields, batch_size=batch_size)
+        if changed:
+            cache.clear()
+        return len(changed)
+
+    def verify(self):
+        expected = Transactions.all_objects.subtree_sums()
+        return [
+            (pk, stored, expected.get(pk, Decimal(0)))
+            for pk, stored in Transactions.all_objects.values_list('id', 'subtree_amount').iterator()
+            if stored != expected.get(pk, Decimal(0))
+        ]
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from transactions.models import TransactionRollup, Transactions
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the per type and hour rollups of the analytics endpoint "
+        "from the transactions table, or only verify them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only', action='store_true',
+            help="Only compare the stored rollups with the transactions, do not rebuild.",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Rollups written per INSERT batch.",
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            with transaction.atomic():
+                # block writers so no change lands between the scan and the swap
+                list(Transactions.all_objects.select_for_update().values_list('id'))
+                expected = TransactionRollup.objects.from_transactions()
+                TransactionRollup.objects.all().delete()
+                TransactionRollup.objects.bulk_create(
+                    [
+                        TransactionRollup(bucket=bucket, type=type, total=total, count=count)
+                        for (bucket, type), (total, count) in expected.items()
+                    ],
+                    batch_size=options['batch_size'],
+                )
+            self.stdout.write(f"Rebuilt {len(expected)} rollups")
+        mismatches = self.verify()
+        if mismatches:
+            for key, stored, expected in mismatches[:20]:
+                self.stderr.write(f"{key}: stored {stored}, expected {expected}")
+            raise CommandError(f"{len(mismatches)} rollups do not match the transactions")
+        self.stdout.write(self.style.SUCCESS("Rollups match the transactions"))
+
+    def verify(self):
+        expected = TransactionRollup.objects.from_transactions()
+        stored = {
+            (bucket, type): (total, count)
+            for bucket, type, total, count in TransactionRollup.objects.filter(
+                count__gt=0,
+            ).values_list('bucket', 'type', 'total', 'count')
+        }
+        return [
+            (key, stored.get(key), expected.get(key))
+            for key in sorted(set(stored) | set(expected))
+            if stored.get(key) != expected.get(key)
+        ]
@@ -0,0 +1,114 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from transactions import cache
+from transactions.models import TransactionRollup, Transactions, uuid7_time
+
+# created_on is stamped by the database from this migration on
+FIX_MIGRATION = '0014_transactions_created_on_database_default'
+
+
+class Command(BaseCommand):
+    help = (
+        "Repair created_on of rows written while the default was evaluated "
+        "once at import time, and move their amounts to the right rollups. "
+        "Only rows stamped before the fix was deployed with a created_on "
+        "shared by several rows, the frozen process start time, are "
+        "touched. They get the creation time encoded in their version 7 "
+        "ids, or modified_on for other ids."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tolerance', type=float, default=1,
+            help="Seconds created_on may differ from the id's time before it is repaired.",
+        )
+        parser.add_argument(
+            '--before', default=None,
+            help="Only repair rows created before this ISO datetime; defaults to when the fix was migrated.",
+        )
+        parser.add_argument(
+            '--min-shared', type=int, default=2,
+            help="Rows that must share a created_on for it to count as a frozen default.",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Rows read and written per transaction.",
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only count the rows that would be repaired.",
+        )
+
+    def handle(self, *args, **options):
+        tolerance = timedelta(seconds=options['tolerance'])
+        cutoff = self.cutoff(options['before'])
+        frozen = list(
+            Transactions.all_objects.filter(created_on__lt=cutoff).values('created_on')
+            .annotate(rows=Count('id')).filter(rows__gte=options['min_shared'])
+            .values_list('created_on', flat=True)
+        )
+        repaired = 0
+        last = None
+        while frozen:
+            with transaction.atomic():
+                rows = Transactions.all_objects.select_for_update().filter(created_on__in=frozen).order_by('id')
+                if last is not None:
+                    rows = rows.filter(pk__gt=last)
+                rows = list(rows.values_list(
+                    'id', 'created_on', 'modified_on', 'type', 'amount', 'is_deleted',
+                )[:options['batch_size']])
+                if not rows:
+                    break
+                last = rows[-1][0]
+                fixes = []
+                for pk, created_on, modified_on, type, amount, is_deleted in rows:
+                    # a row without a time-ordered id was created by its
+                    # first write at the latest
+                    created = uuid7_time(Transactions.objects.to_id(pk)) or modified_on
+                    if abs(created_on - created) > tolerance:
+                        fixes.append((pk, created_on, created, modified_on, type, amount, is_deleted))
+                repaired += len(fixes)
+                if fixes and not options['dry_run']:
+                    self.repair(fixes, options['batch_size'])
+        verb = "Would repair" if options['dry_run'] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"{verb} created_on of {repaired} transactions"))
+
+    def cutoff(self, before):
+        """rows stamped from this time on got created_on from the database"""
+        if before is not None:
+            value = parse_datetime(before)
+            if value is None:
+                raise CommandError(f"Invalid --before datetime: {before}")
+            return value if timezone.is_aware(value) else timezone.make_aware(value)
+        applied = MigrationRecorder.Migration.objects.filter(
+            app='transactions', name=FIX_MIGRATION,
+        ).values_list('applied', flat=True).first()
+        if applied is None:
+            raise CommandError(f"{FIX_MIGRATION} is not applied; pass --before")
+        return applied
+
+    def repair(self, fixes, batch_size):
+        # modified_on moves too, so the list validators change with the data;
+        # rows repaired from modified_on keep it, so a second run finds them
+        # repaired
+        now = timezone.now()
+        Transactions.all_objects.bulk_update(
+            [
+                Transactions(id=pk, created_on=created, modified_on=modified_on if created == modified_on else now)
+                for pk, _, created, modified_on, *_ in fixes
+            ],
+            ['created_on', 'modified_on'], batch_size=batch_size,
+        )
+        changes = []
+        for pk, created_on, created, modified_on, type, amount, is_deleted in fixes:
+            if not is_deleted:
+                changes += [(created_on, type, -amount, -1), (created, type, amount, 1)]
+        TransactionRollup.objects.add(changes)
+        cache.invalidate(details=[fix[0] for fix in fixes], types={fix[4] for fix in fixes})
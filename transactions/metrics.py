@@ -0,0 +1,168 @@
+"""
+Per view request metrics in the Prometheus text exposition format.
+
+``MetricsMiddleware`` times every request and ``record_query``, installed
+as an ``execute_wrapper`` on each new database connection, adds the
+queries it runs. The current request is tracked in a context variable, so
+queries of async views, which run in a worker thread, are counted too. The
+totals live in this process only; every worker serves its own on
+``/metrics``.
+
+Requests slower than ``TRANSACTIONS_SLOW_REQUEST_SECONDS`` are logged to
+the ``transactions.metrics`` logger with their SQL.
+"""
+import asyncio
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger(__name__)
+
+# upper bounds of the latency histogram, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# statements kept per request for the slow request log
+MAX_LOGGED_QUERIES = 100
+
+_current = contextvars.ContextVar('transactions_request_metrics', default=None)
+_lock = threading.Lock()
+
+
+class ViewMetrics:
+    __slots__ = ('buckets', 'requests', 'seconds', 'queries', 'db_seconds', 'response_bytes')
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.requests = self.queries = self.response_bytes = 0
+        self.seconds = self.db_seconds = 0.0
+
+
+_views = defaultdict(ViewMetrics)
+
+
+class RequestMetrics:
+    """queries of the request in progress"""
+    __slots__ = ('queries', 'db_seconds', 'statements')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = []
+
+
+def record_query(execute, sql, params, many, context):
+    """``execute_wrapper`` adding the query to the current request, if any"""
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        request_metrics.queries += 1
+        request_metrics.db_seconds += elapsed
+        if len(request_metrics.statements) < MAX_LOGGED_QUERIES:
+            request_metrics.statements.append((elapsed, sql))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """``connection_created`` receiver installing ``record_query``"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def observe(request, response, request_metrics, seconds):
+    match = request.resolver_match
+    key = (match.url_name if match and match.url_name else 'unmatched', request.method)
+    size = 0 if response.streaming else len(response.content)
+    with _lock:
+        view = _views[key]
+        view.requests += 1
+        view.seconds += seconds
+        position = bisect.bisect_left(BUCKETS, seconds)
+        if position < len(BUCKETS):
+            view.buckets[position] += 1
+        view.queries += request_metrics.queries
+        view.db_seconds += request_metrics.db_seconds
+        view.response_bytes += size
+    if seconds >= getattr(settings, 'TRANSACTIONS_SLOW_REQUEST_SECONDS', 1.0):
+        logger.warning(
+            "Slow request %s %s (%s): %.3fs, %d queries in %.3fs\n%s",
+            request.method, request.get_full_path(), key[0], seconds,
+            request_metrics.queries, request_metrics.db_seconds,
+            '\n'.join(f'  {elapsed:.4f}s {sql}' for elapsed, sql in request_metrics.statements),
+        )
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """Times each request and counts its queries, in sync and async stacks"""
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        observe(request, response, request_metrics, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        observe(request, response, request_metrics, time.perf_counter() - start)
+        return response
+
+
+def _labels(view, method, **extra):
+    pairs = [('view', view), ('method', method), *extra.items()]
+    return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                             for name, value in pairs)
+
+
+def exposition():
+    """current totals in the Prometheus text format"""
+    lines = [
+        '# HELP transactions_request_duration_seconds Time to produce the response, per view.',
+        '# TYPE transactions_request_duration_seconds histogram',
+    ]
+    counters = (
+        ('transactions_request_queries_total', 'queries', 'Database queries run, per view.'),
+        ('transactions_request_db_seconds_total', 'db_seconds', 'Time spent in database queries, per view.'),
+        ('transactions_response_bytes_total', 'response_bytes', 'Response body bytes, per view; streamed bodies are not counted.'),
+    )
+    with _lock:
+        views = sorted(_views.items())
+        for (view, method), metrics in views:
+            cumulative = 0
+            for bound, count in zip(BUCKETS, metrics.buckets):
+                cumulative += count
+                lines.append(f'transactions_request_duration_seconds_bucket{_labels(view, method, le=bound)} {cumulative}')
+            lines.append(f'transactions_request_duration_seconds_bucket{_labels(view, method, le="+Inf")} {metrics.requests}')
+            lines.append(f'transactions_request_duration_seconds_sum{_labels(view, method)} {metrics.seconds}')
+            lines.append(f'transactions_request_duration_seconds_count{_labels(view, method)} {metrics.requests}')
+        for name, attribute, help_text in counters:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for (view, method), metrics in views:
+                lines.append(f'{name}{_labels(view, method)} {getattr(metrics, attribute)}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _lock:
+        _views.clear()
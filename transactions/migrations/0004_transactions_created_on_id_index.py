@@ -0,0 +1,23 @@
+# Generated by Django 4.1.2 on 2026-10-18 18:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_alter_transactions_amount_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transactions',
+            name='parent_id',
+            field=models.ForeignKey(default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, to='transactions.transactions'),
+        ),
+        migrations.AddIndex(
+            model_name='transactions',
+            index=models.Index(fields=['created_on', 'id'], name='transactions_created_id_idx'),
+        ),
+    ]
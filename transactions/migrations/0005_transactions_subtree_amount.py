@@ -0,0 +1,47 @@
+# Generated by Django 4.1.2 on 2026-10-18 18:15
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+SUBTREE_SUM_SQL = """
+with recursive cte as (
+    select id as input_id, id, case when is_deleted then 0 else amount end as amount
+    from transactions_transactions t
+    union all
+    select cte.input_id, tc.id, case when tc.is_deleted then 0 else tc.amount end
+    from cte join transactions_transactions tc on tc.parent_id_id = cte.id
+)
+select input_id, sum(amount) from cte group by input_id
+"""
+
+
+def populate_subtree_amounts(apps, schema_editor):
+    Transactions = apps.get_model('transactions', 'Transactions')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(SUBTREE_SUM_SQL)
+        totals = cursor.fetchall()
+    Transactions.objects.bulk_update(
+        [
+            Transactions(pk=pk, subtree_amount=Decimal(str(total)).quantize(Decimal('0.01')))
+            for pk, total in totals
+        ],
+        ['subtree_amount'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_transactions_created_on_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactions',
+            name='subtree_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=20),
+        ),
+        migrations.RunPython(populate_subtree_amounts, migrations.RunPython.noop),
+    ]
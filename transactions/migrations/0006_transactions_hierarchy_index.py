@@ -0,0 +1,53 @@
+# Generated by Django 4.1.2 on 2026-10-18 18:18
+
+from collections import defaultdict
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_hierarchy(apps, schema_editor):
+    Transactions = apps.get_model('transactions', 'Transactions')
+    children = defaultdict(list)
+    live = {}
+    for pk, parent_id, is_deleted in Transactions.objects.values_list('id', 'parent_id', 'is_deleted').iterator():
+        children[parent_id].append(pk)
+        live[pk] = 0 if is_deleted else 1
+
+    rows = []
+    counts = {}
+    stack = [(pk, pk, 0, False) for pk in children[None]]
+    while stack:
+        pk, root_id, depth, visited = stack.pop()
+        if visited:
+            counts[pk] = live[pk] + sum(counts[child] for child in children[pk])
+            rows.append(Transactions(pk=pk, root_id_id=root_id, depth=depth, subtree_count=counts[pk]))
+            continue
+        stack.append((pk, root_id, depth, True))
+        stack.extend((child, root_id, depth + 1, False) for child in children[pk])
+    Transactions.objects.bulk_update(rows, ['root_id', 'depth', 'subtree_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0005_transactions_subtree_amount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactions',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='transactions',
+            name='root_id',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transactions.transactions'),
+        ),
+        migrations.AddField(
+            model_name='transactions',
+            name='subtree_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_hierarchy, migrations.RunPython.noop),
+    ]
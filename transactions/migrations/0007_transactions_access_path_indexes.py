@@ -0,0 +1,28 @@
+# Generated by Django 4.1.2 on 2026-10-18 18:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0006_transactions_hierarchy_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transactions',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['type', 'id'], name='transactions_live_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactions',
+            index=models.Index(fields=['parent_id', 'is_deleted'], name='transactions_parent_idx'),
+        ),
+        # the composite index above now serves the foreign key lookups
+        migrations.AlterField(
+            model_name='transactions',
+            name='parent_id',
+            field=models.ForeignKey(db_index=False, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, to='transactions.transactions'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.2 on 2026-10-18 18:24
+
+import uuid
+from django.db import migrations
+
+
+# stable replacement ids for legacy keys that are not UUIDs
+LEGACY_ID_NAMESPACE = uuid.UUID('5b0f4a8e-7c1d-4b8a-9a53-2f0d1f3e6c21')
+
+
+def normalize_ids(apps, schema_editor):
+    """
+    Rewrite every id that cannot be cast to a UUID, and the references to
+    it, before the columns change type in the next migration.
+    """
+    Transactions = apps.get_model('transactions', 'Transactions')
+    renamed = {}
+    for pk in Transactions.objects.values_list('id', flat=True).iterator():
+        try:
+            uuid.UUID(pk)
+        except ValueError:
+            renamed[pk] = str(uuid.uuid5(LEGACY_ID_NAMESPACE, pk))
+    for old, new in renamed.items():
+        Transactions.objects.filter(pk=old).update(id=new)
+        Transactions.objects.filter(parent_id=old).update(parent_id=new)
+        Transactions.objects.filter(root_id=old).update(root_id=new)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0007_transactions_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.1.2 on 2026-10-18 18:24
+
+from django.db import migrations, models
+import transactions.models
+
+
+def drop_pattern_indexes(apps, schema_editor):
+    """
+    The text key columns carry varchar_pattern_ops indexes on PostgreSQL,
+    which cannot be cast to uuid; only the primary key one is dropped by
+    AlterField, the self references keep theirs.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "select indexname from pg_indexes where tablename = 'transactions_transactions' "
+            "and indexdef like '%%varchar_pattern_ops%%'"
+        )
+        for (name,) in cursor.fetchall():
+            schema_editor.execute(f'drop index if exists "{name}"')
+
+
+def strip_dashes(apps, schema_editor):
+    """
+    Backends without a native uuid type store UUIDField values as 32 hex
+    characters, while the text keys kept the dashed form.
+    """
+    if schema_editor.connection.features.has_native_uuid_field:
+        return
+    schema_editor.execute(
+        "update transactions_transactions set id = replace(id, '-', ''), "
+        "parent_id_id = replace(parent_id_id, '-', ''), "
+        "root_id_id = replace(root_id_id, '-', '')"
+    )
+
+
+def restore_dashes(apps, schema_editor):
+    if schema_editor.connection.features.has_native_uuid_field:
+        return
+    for column in ('id', 'parent_id_id', 'root_id_id'):
+        schema_editor.execute(
+            f"update transactions_transactions set {column} = "
+            f"substr({column}, 1, 8) || '-' || substr({column}, 9, 4) || '-' || "
+            f"substr({column}, 13, 4) || '-' || substr({column}, 17, 4) || '-' || "
+            f"substr({column}, 21) where {column} is not null"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_transactions_normalize_ids'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_pattern_indexes, migrations.RunPython.noop),
+        # PostgreSQL casts the key and both self references to uuid in place
+        migrations.AlterField(
+            model_name='transactions',
+            name='id',
+            field=models.UUIDField(default=transactions.models.uuid7, primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(strip_dashes, restore_dashes),
+    ]
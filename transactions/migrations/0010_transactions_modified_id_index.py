@@ -0,0 +1,17 @@
+# Generated by Django 4.1.2 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0009_transactions_uuid_primary_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transactions',
+            index=models.Index(fields=['modified_on', 'id'], name='transactions_modified_id_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.1.2 on 2026-10-18 18:41
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Trunc
+
+
+def populate_rollups(apps, schema_editor):
+    Transactions = apps.get_model('transactions', 'Transactions')
+    TransactionRollup = apps.get_model('transactions', 'TransactionRollup')
+    rows = Transactions.objects.filter(is_deleted=False).annotate(
+        bucket=Trunc('created_on', 'hour'),
+    ).values('bucket', 'type').annotate(total=Sum('amount'), count=Count('id'))
+    TransactionRollup.objects.bulk_create(
+        [TransactionRollup(**row) for row in rows.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0010_transactions_modified_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('type', models.CharField(choices=[('shopping', 'shopping'), ('fuel', 'fuel'), ('house_hold', 'house_hold')], max_length=50)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=24)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='transactionrollup',
+            constraint=models.UniqueConstraint(fields=('bucket', 'type'), name='transactions_rollup_bucket_type_uniq'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.2 on 2026-10-18 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0011_transactionrollup'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transactions',
+            name='transactions_created_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transactions',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_on', 'id'], name='transactions_live_created_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.2 on 2026-10-18 18:47
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0012_transactions_live_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionArchive',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('parent_id', models.UUIDField(null=True)),
+                ('root_id', models.UUIDField(null=True)),
+                ('depth', models.PositiveIntegerField(default=0)),
+                ('type', models.CharField(choices=[('shopping', 'shopping'), ('fuel', 'fuel'), ('house_hold', 'house_hold')], max_length=50)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('created_on', models.DateTimeField()),
+                ('modified_on', models.DateTimeField()),
+                ('archived_on', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='transactionarchive',
+            index=models.Index(fields=['created_on'], name='transactions_archive_created'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.2 on 2026-10-18 18:50
+
+from django.db import migrations
+import transactions.models
+
+
+def set_column_default(apps, schema_editor):
+    """
+    The ORM puts the timestamp expression in every INSERT; the column
+    default covers rows inserted outside of it. SQLite cannot change the
+    default of an existing column.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "alter table transactions_transactions alter column created_on set default statement_timestamp()"
+        )
+
+
+def drop_column_default(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("alter table transactions_transactions alter column created_on drop default")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0013_transactionarchive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transactions',
+            name='created_on',
+            field=transactions.models.ReturningDateTimeField(default=transactions.models.insert_timestamp),
+        ),
+        migrations.RunPython(set_column_default, drop_column_default),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.2 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0015_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transactions',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['amount', 'id'], name='transactions_live_amount_idx'),
+        ),
+    ]
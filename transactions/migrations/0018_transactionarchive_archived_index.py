@@ -0,0 +1,17 @@
+# Generated by Django 4.1.2 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0017_transactions_live_root_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transactionarchive',
+            index=models.Index(fields=['archived_on'], name='transactions_archive_archived'),
+        ),
+    ]
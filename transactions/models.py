@@ -1,20 +1,70 @@
 from email.policy import default
 from pyexpat import model
 from unicodedata import decimal
+from collections import defaultdict
+from decimal import Decimal
 from django.db import models
+import os
+import time
 import uuid
-from django.db import OperationalError
+from django.db import IntegrityError, OperationalError, connection, connections, router, transaction
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Now, Trunc
+from django.db.models.expressions import RawSQL
+from django.db.models.query import RawQuerySet
 from django.utils.translation import gettext_lazy as _
 import datetime
 from django.utils import timezone
+from transactions import cache
 
 
 # Create your models here.
 
+def uuid7():
+    """
+    Time-ordered UUID (version 7): a 48-bit millisecond timestamp followed
+    by random bits, so new keys land at the right edge of the primary key
+    index instead of on a random page.
+    """
+    value = (time.time_ns() // 1_000_000 & (1 << 48) - 1) << 80
+    value |= int.from_bytes(os.urandom(10), 'big')
+    value = value & ~(0xF << 76) | 0x7 << 76  # version
+    value = value & ~(0x3 << 62) | 0x2 << 62  # RFC 4122 variant
+    return uuid.UUID(int=value)
+
+def uuid7_time(value):
+    """Creation time encoded in a version 7 UUID, None for other versions"""
+    if value.version != 7:
+        return None
+    return datetime.datetime.fromtimestamp((value.int >> 80) / 1000, tz=datetime.timezone.utc)
+
+class CurrentTimestamp(Now):
+    """``Now()`` keeping fractional seconds on SQLite, in Django's text format"""
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template="REPLACE(STRFTIME('%%%%Y-%%%%m-%%%%d %%%%H:%%%%M:%%%%f000', 'NOW'), '.000000', '')",
+            **extra_context,
+        )
+
+def insert_timestamp():
+    """default evaluated by the database in the INSERT statement itself"""
+    return CurrentTimestamp()
+
+class ReturningDateTimeField(models.DateTimeField):
+    """DateTimeField read back from INSERT ... RETURNING into the saved instance"""
+    db_returning = True
+
+class SoftDeleteManager(models.Manager):
+    """Manager hiding soft-deleted rows"""
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
 class BaseModel(models.Model):
-    id = models.CharField(default = uuid.uuid4, primary_key=True, max_length=36)
+    id = models.UUIDField(default = uuid7, primary_key=True)
     # to track when the current document was created on
-    created_on = models.DateTimeField(default = timezone.now())
+    created_on = ReturningDateTimeField(default = insert_timestamp)
     # to track when the current record was last modified on
     modified_on = models.DateTimeField(auto_now=True)
 
@@ -35,8 +85,683 @@ class TransactionType(models.TextChoices):
     fuel = 'fuel', _('fuel')
     house_hold = 'house_hold', _('house_hold')
 
+# Rows of the subtree rooted at each input_id; soft-deleted rows are walked
+# through but contribute nothing to the total.
+SUBTREE_SUM_SQL = """
+with recursive cte as (
+    select id as input_id, id, case when is_deleted then 0 else amount end as amount
+    from transactions_transactions t {where}
+    union all
+    select cte.input_id, tc.id, case when tc.is_deleted then 0 else tc.amount end
+    from cte join transactions_transactions tc on tc.parent_id_id = cte.id
+)
+select input_id, sum(amount) from cte group by input_id
+"""
+
+# The row itself followed by every ancestor up to its root.
+ANCESTORS_SQL = """
+with recursive ancestors(id, parent_id) as (
+    select id, parent_id_id from transactions_transactions where id = %s
+    union
+    select t.id, t.parent_id_id
+    from transactions_transactions t join ancestors a on t.id = a.parent_id
+)
+select id from ancestors
+"""
+
+# The row itself and every row below it.
+DESCENDANTS_SQL = """
+with recursive descendants(id) as (
+    select id from transactions_transactions where id = %s
+    union all
+    select t.id
+    from transactions_transactions t join descendants d on t.parent_id_id = d.id
+)
+select id from descendants
+"""
+
+# The row itself and every row below it, each once even if the parent links
+# loop back to it.
+SUBTREE_SQL = """
+with recursive subtree(id) as (
+    select id from transactions_transactions where id = %s
+    union
+    select t.id
+    from transactions_transactions t join subtree s on t.parent_id_id = s.id
+)
+select id from subtree
+"""
+
+# (input_id, ancestor id) pairs for several rows at once, each row included.
+ANCESTOR_PAIRS_SQL = """
+with recursive ancestors(input_id, id, parent_id) as (
+    select id, id, parent_id_id from transactions_transactions where id in ({ids})
+    union all
+    select a.input_id, t.id, t.parent_id_id
+    from transactions_transactions t join ancestors a on t.id = a.parent_id
+)
+select input_id, id from ancestors
+"""
+
+MOVE_SUBTREE_SQL = f"""
+update transactions_transactions set depth = depth + %s, root_id_id = %s
+where id in ({DESCENDANTS_SQL})
+"""
+
+# Writes a live row and reads it back in one statement. A new parent given
+# with the write must be live and outside the row's subtree; the returned
+# depth and root follow the parent the row ends up under.
+UPDATE_RETURNING_SQL = f"""
+update transactions_transactions set {{assignments}}
+where id = %s and not is_deleted
+and (%s is null or exists (
+    select 1 from transactions_transactions p
+    where p.id = %s and not p.is_deleted and %s not in ({ANCESTORS_SQL})
+))
+returning id, parent_id_id, type, amount, created_on, modified_on, is_deleted,
+    coalesce((
+        select p.depth + 1 from transactions_transactions p
+        where p.id = transactions_transactions.parent_id_id
+    ), 0) as depth,
+    coalesce((
+        select p.root_id_id from transactions_transactions p
+        where p.id = transactions_transactions.parent_id_id
+    ), id) as root_id_id
+"""
+
+ROLLUP_UPSERT_SQL = """
+insert into transactions_transactionrollup (bucket, type, total, count)
+values {values}
+on conflict (bucket, type) do update
+set total = transactions_transactionrollup.total + excluded.total,
+    count = transactions_transactionrollup.count + excluded.count
+"""
+
+def chunked(items, size):
+    """Split ``items`` into lists of at most ``size`` elements"""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class BaseQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """
+        ``QuerySet.update`` moving ``modified_on`` as ``save()`` does, so
+        the rows show up in the changes feed. A ``modified_on`` given
+        explicitly wins, and updates of ``derived_fields`` alone leave it.
+        """
+        derived_fields = getattr(self.model, 'derived_fields', ())
+        if 'modified_on' not in kwargs and any(name not in derived_fields for name in kwargs):
+            kwargs['modified_on'] = timezone.now()
+        return super().update(**kwargs)
+
+class TransactionQuerySet(BaseQuerySet):
+    def db_id(self, pk):
+        """``pk`` as the database expects it in raw SQL parameters"""
+        return self.model._meta.pk.get_db_prep_value(pk, connection)
+
+    def to_id(self, value):
+        """normalize a raw database or in-memory id for comparisons"""
+        return None if value is None else self.model._meta.pk.to_python(value)
+
+    def with_id(self, pk):
+        """
+        Rows whose primary key is ``pk``; ids that are not valid UUIDs
+        match nothing instead of raising, as they did with text keys.
+        """
+        try:
+            pk = self.to_id(pk)
+        except ValidationError:
+            return self.none()
+        return self.filter(pk=pk)
+
+    def search(self, types=None, amount_min=None, amount_max=None, created_after=None, created_before=None,
+               modified_after=None, modified_before=None, parent_id=None, root=False):
+        """
+        Rows matching the list filters. Each one is an equality or a range
+        on a column leading an index, so they combine with the keyset seek
+        of the pagination.
+        """
+        filters = {
+            'type__in': types,
+            'amount__gte': amount_min,
+            'amount__lte': amount_max,
+            'created_on__gte': created_after,
+            'created_on__lt': created_before,
+            'modified_on__gte': modified_after,
+            'modified_on__lt': modified_before,
+            'parent_id': parent_id,
+        }
+        queryset = self.filter(**{lookup: value for lookup, value in filters.items() if value is not None})
+        return queryset.filter(parent_id__isnull=True) if root else queryset
+
+    def ancestor_ids(self, pk):
+        """ids of the transaction ``pk`` and all of its ancestors"""
+        with connection.cursor() as cursor:
+            cursor.execute(ANCESTORS_SQL, [self.db_id(pk)])
+            return [self.to_id(row[0]) for row in cursor.fetchall()]
+
+    def ancestors(self, pk):
+        """every row above ``pk``, resolved by the database in one query"""
+        return self.filter(
+            pk__in=RawSQL(ANCESTORS_SQL, [self.db_id(pk)])
+        ).exclude(pk=pk)
+
+    def descendants(self, pk):
+        """
+        every row below ``pk``. Below a root these are the rows of its
+        (root_id, depth) index range; below an inner row that range is
+        narrowed with the recursive walk, which alone knows the branches.
+        """
+        position = self.model.all_objects.filter(pk=pk).values('root_id', 'depth', 'parent_id').first()
+        if position is None:
+            return self.none()
+        rows = self.filter(root_id=position['root_id'], depth__gt=position['depth'])
+        if position['parent_id'] is None:
+            return rows
+        return rows.filter(pk__in=RawSQL(DESCENDANTS_SQL, [self.db_id(pk)]))
+
+    def update_returning(self, pk, **values):
+        """
+        Write ``values`` to the live row ``pk`` and read it back with one
+        ``UPDATE ... RETURNING``. A ``parent_id`` among the values moves the
+        row, and the statement also checks the new parent is live and not
+        in the row's subtree. Returns the updated instance, or None when the
+        row is missing or the move is refused. Derived data is left to
+        ``Transactions.propagate``.
+        """
+        meta = self.model._meta
+        db = router.db_for_write(self.model)
+        values['modified_on'] = timezone.now()
+        assignments, params = [], []
+        for name, value in values.items():
+            field = meta.get_field(name)
+            assignments.append(f'{field.column} = %s')
+            params.append(field.get_db_prep_save(value, connections[db]))
+        parent_id = values.get('parent_id')
+        parent_id = None if parent_id is None else self.db_id(parent_id)
+        rows = RawQuerySet(
+            UPDATE_RETURNING_SQL.format(assignments=', '.join(assignments)),
+            model=self.model, using=db,
+            params=[*params, self.db_id(pk), parent_id, parent_id, self.db_id(pk), parent_id],
+        )
+        return next(iter(rows), None)
+
+    def lock_ancestors(self, pks, batch_size=500):
+        """
+        Lock the rows ``pks`` and all of their ancestors in pk order, before
+        the first write of a change to the hierarchy. Every writer takes its
+        chain in this one order, so two writers on one chain queue up on
+        its top-most shared row instead of deadlocking.
+        """
+        pks = [pk for pk in pks if pk is not None]
+        ids = set()
+        with connection.cursor() as cursor:
+            for chunk in chunked(pks, batch_size):
+                cursor.execute(
+                    ANCESTOR_PAIRS_SQL.format(ids=', '.join(['%s'] * len(chunk))),
+                    [self.db_id(pk) for pk in chunk],
+                )
+                ids.update(self.to_id(pk) for _, pk in cursor.fetchall())
+        for chunk in chunked(sorted(ids), batch_size):
+            list(self.select_for_update().filter(pk__in=chunk).order_by('pk').values_list('pk'))
+        return ids
+
+    def add_to_subtrees(self, pk, amount, count):
+        """
+        Add ``amount`` and ``count`` to the subtree aggregates of ``pk`` and
+        its ancestors, returning the ids of the updated rows
+        """
+        if not amount and not count:
+            return []
+        ids = self.ancestor_ids(pk)
+        # writers normally hold these from lock_ancestors() already; taken
+        # in the same order for callers that do not
+        list(self.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk'))
+        self.filter(pk__in=ids).update(
+            subtree_amount=F('subtree_amount') + amount,
+            subtree_count=F('subtree_count') + count,
+        )
+        return ids
+
+    def add_to_subtrees_many(self, deltas, batch_size=500):
+        """
+        Apply several ``{pk: (amount, count)}`` deltas to the subtree
+        aggregates of each pk and its ancestors. Deltas meeting on a shared
+        ancestor are summed first, so every row is written once. Returns the
+        ids of the updated rows.
+        """
+        totals = defaultdict(lambda: [Decimal(0), 0])
+        anchors = [pk for pk, (amount, count) in deltas.items() if amount or count]
+        normalized = {self.to_id(pk): deltas[pk] for pk in anchors}
+        with connection.cursor() as cursor:
+            for chunk in chunked(anchors, batch_size):
+                cursor.execute(
+                    ANCESTOR_PAIRS_SQL.format(ids=', '.join(['%s'] * len(chunk))),
+                    [self.db_id(pk) for pk in chunk],
+                )
+                for input_id, pk in cursor.fetchall():
+                    amount, count = normalized[self.to_id(input_id)]
+                    totals[self.to_id(pk)][0] += amount
+                    totals[self.to_id(pk)][1] += count
+        ids = sorted(totals)
+        for chunk in chunked(ids, batch_size):
+            list(self.select_for_update().filter(pk__in=chunk).order_by('pk').values_list('pk'))
+        self.bulk_update(
+            [
+                self.model(
+                    pk=pk,
+                    subtree_amount=F('subtree_amount') + totals[pk][0],
+                    subtree_count=F('subtree_count') + totals[pk][1],
+                )
+                for pk in ids
+            ],
+            ['subtree_amount', 'subtree_count'],
+            batch_size=batch_size,
+        )
+        return ids
+
+    def move_subtree(self, pk, depth_shift, root_id):
+        """Shift the depth and reset the root of ``pk`` and all rows below it"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                MOVE_SUBTREE_SQL, [depth_shift, self.db_id(root_id), self.db_id(pk)]
+            )
+
+    def archive_subtree(self, pk):
+        """
+        Soft delete ``pk`` and every row below it with one set-based UPDATE,
+        then take what was live in the subtree off the ancestors' aggregates
+        and the rollups. Returns the number of rows archived.
+        """
+        with transaction.atomic():
+            self.model.all_objects.lock_ancestors([pk])
+            root = self.filter(pk=pk).values(
+                'parent_id', 'subtree_amount', 'subtree_count',
+            ).get()
+            subtree = self.filter(pk__in=RawSQL(DESCENDANTS_SQL, [self.db_id(pk)]))
+            live = list(subtree.select_for_update().filter(is_deleted=False).values_list(
+                'id', 'created_on', 'type', 'amount',
+            ))
+            # nothing below stays live, so every subtree aggregate drops to zero
+            subtree.update(is_deleted=True, subtree_amount=0, subtree_count=0, modified_on=timezone.now())
+            changed = []
+            if root['parent_id'] is not None:
+                changed = self.add_to_subtrees(root['parent_id'], -root['subtree_amount'], -root['subtree_count'])
+            TransactionRollup.objects.add(
+                (created_on, type, -amount, -1) for _, created_on, type, amount in live
+            )
+            ids = [row[0] for row in live]
+            cache.invalidate(details=ids, types={row[2] for row in live}, sums=ids + changed)
+        return len(live)
+
+    def update_subtree(self, pk, type, from_type=None, batch_size=1000):
+        """
+        Set the type of the live rows of the subtree of ``pk``, or of those
+        of ``from_type`` only, with set-based UPDATEs of ``batch_size`` rows
+        in one transaction. Returns the number of rows changed.
+        """
+        with transaction.atomic():
+            root = self.select_for_update().filter(pk=pk, is_deleted=False).values('parent_id').get()
+            with connection.cursor() as cursor:
+                cursor.execute(SUBTREE_SQL, [self.db_id(pk)])
+                ids = [self.to_id(row[0]) for row in cursor.fetchall()]
+            # a cycle can only reach the subtree through its root
+            if root['parent_id'] is not None and self.to_id(root['parent_id']) in ids:
+                raise ValidationError({'parent_id': ['The transaction is part of a cycle.']})
+            size = min(batch_size, connection.features.max_query_params or batch_size)
+            updated = 0
+            for chunk in chunked(ids, size):
+                rows = self.select_for_update().filter(pk__in=chunk, is_deleted=False).exclude(type=type)
+                if from_type is not None:
+                    rows = rows.filter(type=from_type)
+                rows = list(rows.order_by('pk').values_list('id', 'created_on', 'type', 'amount'))
+                if not rows:
+                    continue
+                changed = [row[0] for row in rows]
+                self.filter(pk__in=changed).update(type=type)
+                TransactionRollup.objects.add(
+                    change for _, created_on, old_type, amount in rows
+                    for change in ((created_on, old_type, -amount, -1), (created_on, type, amount, 1))
+                )
+                cache.invalidate(details=changed, types={type} | {row[2] for row in rows})
+                updated += len(rows)
+        return updated
+
+    def subtree_amounts(self, pks):
+        """
+        Materialized subtree totals of the given ids, in chunks that fit
+        the backend's parameter limit; ids that do not exist are left out.
+        """
+        pks = list(pks)
+        amounts = {}
+        for chunk in chunked(pks, connection.features.max_query_params or len(pks) or 1):
+            amounts.update(self.filter(pk__in=chunk).values_list('id', 'subtree_amount'))
+        return amounts
+
+    def subtree_sums(self, pks=None):
+        """
+        Compute subtree totals from scratch with a recursive CTE, for the
+        given ids or for every transaction when ``pks`` is None.
+        """
+        pks = None if pks is None else list(pks)
+        if pks == []:
+            return {}
+        where, params = '', []
+        if pks is not None:
+            where = f"where id in ({', '.join(['%s'] * len(pks))})"
+            params = [self.db_id(pk) for pk in pks]
+        with connection.cursor() as cursor:
+            cursor.execute(SUBTREE_SUM_SQL.format(where=where), params)
+            return {
+                self.to_id(input_id): Decimal(str(total)).quantize(Decimal('0.01'))
+                for input_id, total in cursor.fetchall()
+            }
+
 class Transactions(BaseModel):
-    parent_id = models.ForeignKey('Transactions', on_delete = models.SET_NULL, null = True, default=None)
+    # indexed together with is_deleted below
+    parent_id = models.ForeignKey('Transactions', on_delete = models.SET_NULL, null = True, default=None, db_index=False)
     type = models.CharField(max_length=50, choices=TransactionType.choices)
     amount = models.DecimalField(max_digits=20, decimal_places = 2)
+    # hierarchy index: top-most ancestor and distance from it
+    root_id = models.ForeignKey('Transactions', on_delete=models.SET_NULL, null=True, related_name='+', editable=False)
+    depth = models.PositiveIntegerField(default=0, editable=False)
+    # total amount and number of the live rows in the subtree rooted here
+    subtree_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0, editable=False)
+    subtree_count = models.PositiveIntegerField(default=0, editable=False)
 
+    # live rows only; the hierarchy and aggregate maintenance, which has to
+    # walk through archived rows, goes through all_objects
+    objects = SoftDeleteManager.from_queryset(TransactionQuerySet)()
+    all_objects = TransactionQuerySet.as_manager()
+
+    # maintained by the database, never written from a stale instance
+    derived_fields = ('root_id', 'depth', 'subtree_amount', 'subtree_count')
+    cycle_message = 'A transaction cannot be moved under its own subtree.'
+    # values of the row before a write, which propagate() works from
+    previous_fields = (
+        'parent_id', 'type', 'amount', 'is_deleted', 'created_on', 'depth', 'subtree_amount', 'subtree_count',
+    )
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the live transaction list
+            models.Index(
+                fields=['created_on', 'id'], condition=Q(is_deleted=False),
+                name='transactions_live_created_idx',
+            ),
+            # ids of the live transactions of a type, answered from the index alone
+            models.Index(
+                fields=['type', 'id'], condition=Q(is_deleted=False),
+                name='transactions_live_type_idx',
+            ),
+            # child lookups of the recursive walks; also serves the foreign key
+            models.Index(fields=['parent_id', 'is_deleted'], name='transactions_parent_idx'),
+            # latest modification, the validator of conditional list requests
+            models.Index(fields=['modified_on', 'id'], name='transactions_modified_id_idx'),
+            # list sorted or filtered by amount
+            models.Index(
+                fields=['amount', 'id'], condition=Q(is_deleted=False),
+                name='transactions_live_amount_idx',
+            ),
+            # descendant pages, level by level below a root
+            models.Index(
+                fields=['root_id', 'depth', 'id'], condition=Q(is_deleted=False),
+                name='transactions_live_root_idx',
+            ),
+        ]
+
+    @property
+    def own_amount(self):
+        """amount this row contributes to subtree totals"""
+        if self.is_deleted:
+            return Decimal(0)
+        return self._meta.get_field('amount').to_python(self.amount)
+
+    @property
+    def own_count(self):
+        """number of rows this row contributes to subtree counts"""
+        return 0 if self.is_deleted else 1
+
+    def save(self, *args, **kwargs):
+        objects = type(self).all_objects
+        with transaction.atomic():
+            previous = None
+            if self._state.adding:
+                objects.lock_ancestors([self.parent_id_id])
+            else:
+                objects.lock_ancestors([self.pk, self.parent_id_id])
+                previous = objects.filter(pk=self.pk).values(*self.previous_fields).first()
+            if previous is None or objects.to_id(previous['parent_id']) != objects.to_id(self.parent_id_id):
+                self.locate(check_cycle=previous is not None)
+            if previous is None:
+                # a new row has no descendants yet
+                self.subtree_amount = self.own_amount
+                self.subtree_count = self.own_count
+            else:
+                update_fields = kwargs.get('update_fields') or [
+                    field.name for field in self._meta.concrete_fields if not field.primary_key
+                ]
+                kwargs['update_fields'] = [
+                    name for name in update_fields if name not in self.derived_fields
+                ]
+            super().save(*args, **kwargs)
+            self.propagate(previous)
+
+    def propagate(self, previous):
+        """
+        Bring the hierarchy, the rollups and the cache in line with the
+        write of this row, whose ``previous`` values are locked
+        """
+        changed_sums = self.sync_hierarchy(previous)
+        TransactionRollup.objects.add(self.rollup_changes(previous))
+        cache.invalidate(
+            details=[self.pk],
+            types={self.type, previous['type'] if previous else self.type},
+            sums=changed_sums,
+        )
+
+    def rollup_changes(self, previous):
+        """(created_on, type, amount, count) changes of this write to the rollups"""
+        changes = []
+        if previous is not None and not previous['is_deleted']:
+            changes.append((previous['created_on'], previous['type'], -previous['amount'], -1))
+        if not self.is_deleted:
+            changes.append((self.created_on, self.type, self.own_amount, 1))
+        return changes
+
+    def locate(self, check_cycle):
+        """Set depth and root from the parent, rejecting moves into own subtree"""
+        objects = type(self).all_objects
+        if self.parent_id_id is None:
+            self.depth, self.root_id_id = 0, self.pk
+            return
+        if check_cycle and objects.to_id(self.pk) in objects.ancestor_ids(self.parent_id_id):
+            raise ValidationError({'parent_id': [self.cycle_message]})
+        parent = objects.values('depth', 'root_id').get(pk=self.parent_id_id)
+        self.depth, self.root_id_id = parent['depth'] + 1, parent['root_id']
+
+    def sync_hierarchy(self, previous):
+        """
+        Propagate the change of this row to the hierarchy index and subtree
+        aggregates, returning the ids whose subtree totals changed
+        """
+        objects = type(self).all_objects
+        if previous is None:
+            if self.parent_id_id is None:
+                return []
+            return objects.add_to_subtrees(self.parent_id_id, self.subtree_amount, self.subtree_count)
+        old_amount = Decimal(0) if previous['is_deleted'] else previous['amount']
+        old_count = 0 if previous['is_deleted'] else 1
+        amount_delta = self.own_amount - old_amount
+        count_delta = self.own_count - old_count
+        if objects.to_id(previous['parent_id']) == objects.to_id(self.parent_id_id):
+            changed = objects.add_to_subtrees(self.pk, amount_delta, count_delta)
+        else:
+            # move the whole subtree from the old chain to the new one
+            subtree_amount, subtree_count = previous['subtree_amount'], previous['subtree_count']
+            changed = [self.pk]
+            if previous['parent_id'] is not None:
+                changed += objects.add_to_subtrees(previous['parent_id'], -subtree_amount, -subtree_count)
+            objects.filter(pk=self.pk).update(
+                subtree_amount=F('subtree_amount') + amount_delta,
+                subtree_count=F('subtree_count') + count_delta,
+            )
+            objects.move_subtree(self.pk, self.depth - previous['depth'], self.root_id_id)
+            if self.parent_id_id is not None:
+                changed += objects.add_to_subtrees(
+                    self.parent_id_id, subtree_amount + amount_delta, subtree_count + count_delta
+                )
+        # the row lock taken in save() keeps these in step with the database
+        self.subtree_amount = previous['subtree_amount'] + amount_delta
+        self.subtree_count = previous['subtree_count'] + count_delta
+        return changed
+
+
+def rollup_bucket(value):
+    """start of the hour of ``value`` in the current time zone"""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.replace(minute=0, second=0, microsecond=0)
+
+class TransactionRollupQuerySet(models.QuerySet):
+    def add(self, changes):
+        """
+        Apply (created_on, type, amount, count) changes to the rollups with
+        one upsert per chunk; changes that cancel out are not written.
+        """
+        deltas = defaultdict(lambda: [Decimal(0), 0])
+        for created_on, type, amount, count in changes:
+            delta = deltas[rollup_bucket(created_on), type]
+            delta[0] += Decimal(amount)
+            delta[1] += count
+        fields = [self.model._meta.get_field(name) for name in ('bucket', 'type', 'total', 'count')]
+        # sorted, so concurrent writers lock the buckets in the same order
+        rows = [
+            [field.get_db_prep_save(value, connection) for field, value in zip(fields, (*key, *delta))]
+            for key, delta in sorted(deltas.items()) if delta[1] or delta[0]
+        ]
+        size = max(1, (connection.features.max_query_params or 4000) // len(fields))
+        with connection.cursor() as cursor:
+            for chunk in chunked(rows, size):
+                values = ', '.join(['(%s, %s, %s, %s)'] * len(chunk))
+                cursor.execute(
+                    ROLLUP_UPSERT_SQL.format(values=values), [value for row in chunk for value in row]
+                )
+
+    def series(self, kind='day', types=None, start=None, end=None):
+        """
+        Totals and counts per ``kind`` (hour, day or month) and type, over
+        the hour buckets from ``start`` (inclusive) to ``end`` (exclusive)
+        """
+        queryset = self
+        if types:
+            queryset = queryset.filter(type__in=types)
+        if start is not None:
+            queryset = queryset.filter(bucket__gte=rollup_bucket(start))
+        if end is not None:
+            queryset = queryset.filter(bucket__lt=rollup_bucket(end))
+        return queryset.annotate(period=Trunc('bucket', kind)).values('period', 'type').annotate(
+            total=Sum('total'), count=Sum('count'),
+        ).filter(count__gt=0).order_by('period', 'type')
+
+    def from_transactions(self):
+        """{(bucket, type): (total, count)} recomputed from the live transactions"""
+        rows = Transactions.objects.annotate(
+            bucket=Trunc('created_on', 'hour'),
+        ).values('bucket', 'type').annotate(total=Sum('amount'), count=models.Count('id'))
+        return {(row['bucket'], row['type']): (row['total'], row['count']) for row in rows}
+
+class TransactionRollup(models.Model):
+    """
+    Live transaction totals per type and hour of ``created_on``, updated
+    on every write so analytics never scan the transactions table.
+    """
+    bucket = models.DateTimeField()
+    type = models.CharField(max_length=50, choices=TransactionType.choices)
+    total = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+    count = models.BigIntegerField(default=0)
+
+    objects = TransactionRollupQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # target of the upsert; also serves the bucket range scans
+            models.UniqueConstraint(fields=['bucket', 'type'], name='transactions_rollup_bucket_type_uniq'),
+        ]
+
+class TransactionArchive(models.Model):
+    """
+    Cold copy of soft-deleted transactions moved out of the hot table by
+    the ``archive_transactions`` command. Nothing refers to these rows, so
+    the parent and root ids are kept as plain values.
+    """
+    id = models.UUIDField(primary_key=True)
+    parent_id = models.UUIDField(null=True)
+    root_id = models.UUIDField(null=True)
+    depth = models.PositiveIntegerField(default=0)
+    type = models.CharField(max_length=50, choices=TransactionType.choices)
+    amount = models.DecimalField(max_digits=20, decimal_places=2)
+    created_on = models.DateTimeField()
+    modified_on = models.DateTimeField()
+    archived_on = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_on'], name='transactions_archive_created'),
+            # latest archiving, a validator of lists showing deleted rows
+            models.Index(fields=['archived_on'], name='transactions_archive_archived'),
+        ]
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    def reserve(self, key, fingerprint, ttl):
+        """
+        Claim ``key`` for the request in progress and return None, or return
+        the stored request that claimed it first. A concurrent claim of the
+        same key waits on the unique index until the first one's transaction
+        ends, then sees its stored response.
+        """
+        while True:
+            now = timezone.now()
+            try:
+                with transaction.atomic():
+                    self.filter(key=key, expires_on__lte=now).delete()
+                    self.create(key=key, fingerprint=fingerprint, expires_on=now + ttl)
+                return None
+            except IntegrityError:
+                stored = self.filter(key=key).first()
+                # None when the first claim was rolled back meanwhile
+                if stored is not None:
+                    return stored
+
+    def purge(self, batch_size):
+        """Delete one batch of expired keys, returning how many were deleted"""
+        expired = list(self.filter(expires_on__lte=timezone.now()).values_list('pk', flat=True)[:batch_size])
+        if expired:
+            self.filter(pk__in=expired).delete()
+        return len(expired)
+
+class IdempotencyKey(models.Model):
+    """
+    Response of a POST or PUT sent with an ``Idempotency-Key`` header,
+    replayed to retries of the same request until ``expires_on``.
+    """
+    key = models.CharField(max_length=255)
+    # hash of the method, path and body the key was first used with
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    headers = models.JSONField(default=dict)
+    body = models.BinaryField(default=b'')
+    created_on = models.DateTimeField(default=timezone.now)
+    expires_on = models.DateTimeField()
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['key'], name='transactions_idempotency_key_uniq'),
+        ]
+        indexes = [
+            # batch deletes of expired keys
+            models.Index(fields=['expires_on'], name='transactions_idempotency_exp'),
+        ]
@@ -0,0 +1,158 @@
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a unique, composite ordering.
+
+    The cursor carries the ordering values of the last row of the previous
+    page, so every page is fetched with an index range scan starting right
+    after that row instead of an OFFSET that grows with the page number.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = ('created_on', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.get_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views"""
+        return self.get_page([row async for row in self.get_page_queryset(queryset, request)])
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        model = queryset.model
+        position = self.decode_cursor(request, model)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position))
+
+        # fetch one extra row to find out whether there is a next page
+        return queryset[:self.page_size + 1]
+
+    def get_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = None
+        if self.has_next:
+            last = rows[-1]
+            self.next_position = [
+                self.get_value(last, name) for name, _ in self.fields
+            ]
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        page_size = api_settings.PAGE_SIZE or 100
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            pass
+        return max(1, min(page_size, self.max_page_size))
+
+    @property
+    def fields(self):
+        """(field name, descending) pairs of the ordering"""
+        return [
+            (name.lstrip('-'), name.startswith('-')) for name in self.ordering
+        ]
+
+    def get_value(self, row, name):
+        if isinstance(row, dict):
+            return row[name]
+        if isinstance(row, tuple):
+            # named values_list() row
+            return getattr(row, name)
+        return getattr(row, 'pk' if name == 'id' else name)
+
+    def seek_filter(self, position):
+        """
+        Rows strictly after ``position`` in the ordering, i.e. the expanded
+        form of the row-value comparison ``(a, b) > (x, y)``. A redundant
+        bound on the leading column keeps the predicate sargable.
+        """
+        fields = self.fields
+        clauses = []
+        for i, (name, descending) in enumerate(fields):
+            lookup = 'lt' if descending else 'gt'
+            equal = {prev: position[j] for j, (prev, _) in enumerate(fields[:i])}
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': position[i]}))
+        leading, descending = fields[0]
+        bound = Q(**{f"{leading}__{'lte' if descending else 'gte'}": position[0]})
+        return bound & reduce(or_, clauses)
+
+    def encode_cursor(self, position):
+        payload = json.dumps([str(value) for value in position])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if len(values) != len(self.fields):
+                raise ValueError
+            return [
+                model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
+
+
+class HierarchyPagination(KeysetPagination):
+    """
+    Keyset pagination walking a subtree or an ancestor chain level by level.
+    """
+    ordering = ('depth', 'id')
+
+
+class ChangesPagination(KeysetPagination):
+    """
+    Keyset pagination of the changes feed. Besides the link to the next
+    page, every page carries the cursor after its last row, for the next
+    sync to resume from once the feed is caught up.
+    """
+    ordering = ('modified_on', 'id')
+
+    def get_page(self, rows):
+        page = super().get_page(rows)
+        self.cursor = self.request.query_params.get(self.cursor_query_param) or None
+        if page:
+            self.cursor = self.encode_cursor([self.get_value(page[-1], name) for name, _ in self.fields])
+        return page
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['cursor'] = self.cursor
+        return response
@@ -0,0 +1,156 @@
+"""
+Fast rendering of read-only transaction rows.
+
+``SerializedRows`` wraps the tuples of a ``values_list()`` query and stands
+for the data its ``serializer_class`` would produce from model instances.
+Iterating it yields that representation, so any renderer can output it;
+``TransactionJSONRenderer`` encodes it straight from the tuples instead,
+without building a dict and calling ``to_representation`` per value.
+"""
+import decimal
+import json
+from functools import partial
+
+from rest_framework import serializers as sz
+from rest_framework.compat import SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from transactions.serializers import TransactionChangeSerializer, TransactionGetSerializer, TransactionTypeResponseSerializer
+
+
+def column_encoder(field, dumps):
+    """
+    Function encoding a non-null value of ``field`` to the JSON ``dumps``
+    would produce for ``field.to_representation(value)``.
+    """
+    def represent(value):
+        return dumps(field.to_representation(value))
+
+    if isinstance(field, sz.UUIDField) and field.uuid_format == 'hex_verbose':
+        return lambda value: '"%s"' % value
+
+    if type(field) is sz.ChoiceField:
+        encoded = {key: dumps(value) for key, value in field.choice_strings_to_values.items()}
+        return lambda value: encoded.get(value) or represent(value)
+
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if type(field) is sz.DecimalField and coerce_to_string and not field.localize \
+            and field.decimal_places is not None:
+        # same quantization as DecimalField.quantize, with the context built once
+        exponent = decimal.Decimal('.1') ** field.decimal_places
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+        rounding = field.rounding
+
+        def encode_decimal(value):
+            if type(value) is not decimal.Decimal:
+                return represent(value)
+            return '"%s"' % format(value.quantize(exponent, rounding=rounding, context=context), 'f')
+        return encode_decimal
+
+    return represent
+
+
+class SerializedRows:
+    """
+    Rows of a ``values_list()`` query whose leading columns are the fields
+    of ``serializer_class``, in order; trailing columns are ignored.
+    """
+    serializer_class = None
+    # subset of the serializer fields to render, in order; all of them by default
+    field_names = None
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def get_fields(cls):
+        if '_fields' not in cls.__dict__:
+            fields = cls.serializer_class().fields
+            cls._fields = [fields[name] for name in cls.field_names or fields]
+        return cls._fields
+
+    @classmethod
+    def only(cls, field_names):
+        """subclass rendering the fields ``field_names`` only"""
+        field_names = tuple(field_names)
+        subclasses = cls.__dict__.get('_subclasses')
+        if subclasses is None:
+            subclasses = cls._subclasses = {}
+        if field_names not in subclasses:
+            subclasses[field_names] = type(cls.__name__, (cls,), {'field_names': field_names})
+        return subclasses[field_names]
+
+    def __iter__(self):
+        fields = self.get_fields()
+        for row in self.rows:
+            yield {
+                field.field_name: None if value is None else field.to_representation(value)
+                for field, value in zip(fields, row)
+            }
+
+    def __len__(self):
+        return len(self.rows)
+
+    def encode_rows(self, dumps=json.dumps):
+        """JSON object of each row, as ``dumps`` encodes its representation"""
+        fields = self.get_fields()
+        template = '{%s}' % ','.join(
+            dumps(field.field_name).replace('%', '%%') + ':%s' for field in fields
+        )
+        encoders = [column_encoder(field, dumps) for field in fields]
+        for row in self.rows:
+            yield template % tuple([
+                'null' if value is None else encode(value)
+                for encode, value in zip(encoders, row)
+            ])
+
+    def encode(self, dumps=json.dumps):
+        return '[' + ','.join(self.encode_rows(dumps)) + ']'
+
+
+class TransactionRows(SerializedRows):
+    serializer_class = TransactionGetSerializer
+
+
+class TransactionIdRows(SerializedRows):
+    serializer_class = TransactionTypeResponseSerializer
+
+
+class TransactionChangeRows(SerializedRows):
+    serializer_class = TransactionChangeSerializer
+
+
+class TransactionJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` encoding ``SerializedRows``, alone or as values of the
+    response dict, directly from their tuples. The output is byte for byte
+    the one of ``JSONRenderer``; select either one in
+    ``REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']``.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if not self.compact or indent is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        dumps = partial(
+            json.dumps, cls=self.encoder_class, ensure_ascii=self.ensure_ascii,
+            allow_nan=not self.strict, separators=SHORT_SEPARATORS,
+        )
+        if isinstance(data, SerializedRows):
+            ret = data.encode(dumps)
+        elif isinstance(data, dict) and all(isinstance(key, str) for key in data) \
+                and any(isinstance(value, SerializedRows) for value in data.values()):
+            ret = '{%s}' % ','.join(
+                dumps(key) + ':' + (value.encode(dumps) if isinstance(value, SerializedRows) else dumps(value))
+                for key, value in data.items()
+            )
+        else:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # same escaping as JSONRenderer, see there
+        ret = ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        return ret.encode()
@@ -0,0 +1,70 @@
+"""
+Routing of the read endpoints to read replicas.
+
+Reads only go to a replica inside ``use_replica()``, which the list, type
+and sum views enter through ``replica_reads``. Every other query,
+including the reads of the write paths (row locks, parent lookups, If-Match
+checks), stays on the primary and sees its own writes. The replica aliases
+are listed in ``TRANSACTIONS_READ_REPLICAS``; with none, every read goes
+to the primary.
+"""
+import asyncio
+import contextvars
+import itertools
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+_read_alias = contextvars.ContextVar('transactions_read_alias', default=None)
+_turn = itertools.count()
+
+
+def replica_aliases():
+    return getattr(settings, 'TRANSACTIONS_READ_REPLICAS', [])
+
+
+def current_read_alias():
+    """replica the current reads go to, or None for the primary"""
+    return _read_alias.get()
+
+
+@contextmanager
+def use_replica():
+    """send the reads of the block to the next replica, round robin"""
+    aliases = replica_aliases()
+    token = _read_alias.set(aliases[next(_turn) % len(aliases)] if aliases else None)
+    try:
+        yield _read_alias.get()
+    finally:
+        _read_alias.reset(token)
+
+
+def replica_reads(method):
+    """run a sync or async view method inside ``use_replica()``"""
+    if asyncio.iscoroutinefunction(method):
+        @wraps(method)
+        async def wrapper(*args, **kwargs):
+            with use_replica():
+                return await method(*args, **kwargs)
+    else:
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            with use_replica():
+                return method(*args, **kwargs)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db in replica_aliases() else None
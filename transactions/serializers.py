@@ -2,6 +2,7 @@
 from datetime import datetime
 from distutils.util import strtobool
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.validators import URLValidator
 from django.db.models import F
 from django.utils import timezone
@@ -11,21 +12,150 @@ from transactions.models import Transactions, TransactionType
 class TransactionGetSerializer(sz.Serializer):
     # serializer for listing get request
     id = sz.UUIDField()
-    parent_id = sz.UUIDField(allow_null=True, source="parent_id.id")
+    # read the raw FK column; dereferencing parent_id costs one query per row
+    parent_id = sz.UUIDField(allow_null=True, source="parent_id_id")
     type = sz.ChoiceField(choices=TransactionType.choices)
     amount = sz.DecimalField(max_digits=20, decimal_places = 2)
 
+def does_not_exist_message(pk):
+    """error of a parent_id naming no live transaction"""
+    return sz.PrimaryKeyRelatedField.default_error_messages['does_not_exist'].format(pk_value=pk)
+
+class TransactionPrimaryKeyField(sz.PrimaryKeyRelatedField):
+    # Reports ids that are not valid UUIDs as missing, like any unknown pk
+    def to_internal_value(self, data):
+        try:
+            return super().to_internal_value(data)
+        except DjangoValidationError:
+            self.fail('does_not_exist', pk_value=data)
+
 class TransactionRequestSerializer(sz.Serializer):
     # Serializes request data payload while creation of transaction
-    parent_id = sz.PrimaryKeyRelatedField(queryset=Transactions.objects.all(), allow_null = True, required = False)
+    parent_id = TransactionPrimaryKeyField(queryset=Transactions.objects.all(), allow_null = True, required = False)
     type = sz.ChoiceField(choices=TransactionType.choices)
     amount = sz.DecimalField(max_digits=20, decimal_places = 2)
 
+class TransactionUpdateSerializer(sz.Serializer):
+    # Serializes the payload of PUT and PATCH; the parent is checked by the
+    # UPDATE statement itself instead of a lookup here
+    parent_id = sz.CharField(allow_null = True, required = False)
+    type = sz.ChoiceField(choices=TransactionType.choices)
+    amount = sz.DecimalField(max_digits=20, decimal_places = 2)
+
+    def validate_parent_id(self, value):
+        try:
+            return Transactions.objects.to_id(value)
+        except DjangoValidationError:
+            raise sz.ValidationError(does_not_exist_message(value))
+
+class TransactionBulkUpdateItemSerializer(TransactionUpdateSerializer):
+    # Serializes one item of a bulk update; fields left out keep their value
+    id = sz.UUIDField()
+    type = sz.ChoiceField(choices=TransactionType.choices, required=False)
+    amount = sz.DecimalField(max_digits=20, decimal_places = 2, required=False)
+
+class TransactionSubtreeUpdateSerializer(sz.Serializer):
+    # Serializes the update applied to a whole subtree, optionally to the
+    # rows of one type only
+    type = sz.ChoiceField(choices=TransactionType.choices)
+    from_type = sz.ChoiceField(choices=TransactionType.choices, required=False)
+
 class TransactionTypeRequestSerializer(sz.Serializer):
     # Serializes request type of transaction
     type = sz.ChoiceField(choices=TransactionType.choices)
 
+class TransactionSumBatchRequestSerializer(sz.Serializer):
+    # Serializes the ids of a batch sum request; malformed ids are reported as unknown
+    ids = sz.ListField(child=sz.CharField(), allow_empty=False)
+
+class TransactionAnalyticsRequestSerializer(sz.Serializer):
+    # Serializes the query parameters of the analytics endpoint
+    bucket = sz.ChoiceField(choices=['hour', 'day', 'month'], default='day')
+    type = sz.ListField(child=sz.ChoiceField(choices=TransactionType.choices), required=False)
+    start = sz.DateTimeField(required=False)
+    end = sz.DateTimeField(required=False)
+
+    def validate(self, data):
+        if 'start' in data and 'end' in data and data['start'] >= data['end']:
+            raise sz.ValidationError({'end': ['Must be after start.']})
+        return data
+
+class TransactionListRequestSerializer(sz.Serializer):
+    # Serializes the filter, sort and field selection parameters of the list
+    # endpoint; date ranges include their start and exclude their end
+    type = sz.ListField(child=sz.ChoiceField(choices=TransactionType.choices), required=False)
+    amount_min = sz.DecimalField(max_digits=20, decimal_places = 2, required=False)
+    amount_max = sz.DecimalField(max_digits=20, decimal_places = 2, required=False)
+    created_after = sz.DateTimeField(required=False)
+    created_before = sz.DateTimeField(required=False)
+    modified_after = sz.DateTimeField(required=False)
+    modified_before = sz.DateTimeField(required=False)
+    parent_id = sz.UUIDField(required=False)
+    root = sz.BooleanField(required=False)
+    deleted = sz.ChoiceField(choices=['false', 'true', 'any'], default='false')
+    sort = sz.ChoiceField(choices=[
+        key for name in ('created_on', 'modified_on', 'amount') for key in (name, '-' + name)
+    ], default='created_on')
+    fields = sz.CharField(required=False)
+
+    def validate_fields(self, value):
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        allowed = list(TransactionGetSerializer().fields)
+        unknown = [name for name in names if name not in allowed]
+        if unknown or not names:
+            raise sz.ValidationError(f"Choose among {', '.join(allowed)}.")
+        return list(dict.fromkeys(names))
+
+    def validate(self, data):
+        for start, end in (('amount_min', 'amount_max'), ('created_after', 'created_before'),
+                           ('modified_after', 'modified_before')):
+            if start in data and end in data and data[start] > data[end]:
+                raise sz.ValidationError({end: [f'Must not be below {start}.']})
+        if data.get('root') and 'parent_id' in data:
+            raise sz.ValidationError({'root': ['Cannot be combined with parent_id.']})
+        return data
+
+class TransactionChangesRequestSerializer(sz.Serializer):
+    # Serializes the query parameters of the changes feed; rows modified
+    # after ``since`` are returned, resuming from ``cursor`` when given
+    since = sz.DateTimeField(required=False)
+    export = sz.ChoiceField(choices=['ndjson'], required=False)
+
+class TransactionAnalyticsSerializer(sz.Serializer):
+    # Serializes one bucket of the analytics response
+    bucket = sz.DateTimeField(source='period')
+    type = sz.ChoiceField(choices=TransactionType.choices)
+    total = sz.DecimalField(max_digits=24, decimal_places=2)
+    count = sz.IntegerField()
+    average = sz.DecimalField(max_digits=24, decimal_places=2)
+
 class TransactionTypeResponseSerializer(sz.Serializer):
     # Serializes response type of transaction
     id = sz.UUIDField()
 
+
+class TransactionChangeSerializer(sz.Serializer):
+    # Serializes one row of the changes feed; deleted rows are tombstones
+    id = sz.UUIDField()
+    parent_id = sz.UUIDField(allow_null=True, source="parent_id_id")
+    type = sz.ChoiceField(choices=TransactionType.choices)
+    amount = sz.DecimalField(max_digits=20, decimal_places = 2)
+    created_on = sz.DateTimeField()
+    modified_on = sz.DateTimeField()
+    deleted = sz.BooleanField(source="is_deleted")
+
+class TransactionStatsSerializer(sz.Serializer):
+    # Serializes the hierarchy position and subtree aggregates of a transaction
+    id = sz.UUIDField()
+    root_id = sz.UUIDField(allow_null=True, source="root_id_id")
+    depth = sz.IntegerField()
+    subtree_count = sz.IntegerField()
+    subtree_amount = sz.DecimalField(max_digits=20, decimal_places = 2)
+
+class TransactionBulkItemSerializer(sz.Serializer):
+    # Serializes one item of a bulk creation payload; parents are checked
+    # for the whole batch at once instead of one lookup per item
+    id = sz.UUIDField(required = False)
+    parent_id = sz.UUIDField(allow_null = True, required = False)
+    type = sz.ChoiceField(choices=TransactionType.choices)
+    amount = sz.DecimalField(max_digits=20, decimal_places = 2)
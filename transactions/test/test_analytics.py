@@ -0,0 +1,139 @@
+from datetime import datetime, timezone
+from io import StringIO
+from transactions.test.tests import BaseTestCase
+import pytest
+from transactions.models import TransactionRollup, Transactions, TransactionType
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+def at(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+class TestTransactionAnalyticsView(BaseTestCase):
+    @pytest.fixture
+    def transaction_fixtures_timeline(self):
+        """
+        Fixture to create transactions spread over hours, days and months
+        """
+        self.fuel = Transactions.objects.create(type=TransactionType.fuel, amount=10, created_on=at(2026, 1, 1, 10, 15))
+        Transactions.objects.create(type=TransactionType.fuel, amount=20, created_on=at(2026, 1, 1, 10, 45))
+        Transactions.objects.create(type=TransactionType.fuel, amount=30, created_on=at(2026, 1, 1, 11, 5))
+        Transactions.objects.create(type=TransactionType.shopping, amount=100, created_on=at(2026, 1, 2, 9, 0))
+        Transactions.objects.create(type=TransactionType.house_hold, amount=5, created_on=at(2026, 2, 1, 0, 30))
+
+    def get_analytics(self, **params):
+        return self.client.get(reverse('transaction-analytics'), params)
+
+    @pytest.mark.usefixtures("transaction_fixtures_timeline")
+    def test_hourly_buckets(self, *args):
+        """
+        Tests totals, counts and averages per type and hour
+        """
+        resp = self.get_analytics(bucket="hour", type="fuel")
+        assert resp.status_code == 200
+        assert resp.json() == [
+            {"bucket": "2026-01-01T10:00:00Z", "type": "fuel", "total": "30.00", "count": 2, "average": "15.00"},
+            {"bucket": "2026-01-01T11:00:00Z", "type": "fuel", "total": "30.00", "count": 1, "average": "30.00"},
+        ]
+
+    @pytest.mark.usefixtures("transaction_fixtures_timeline")
+    def test_daily_and_monthly_buckets(self, *args):
+        """
+        Tests hour rollups are grouped into days and months
+        """
+        daily = self.get_analytics().json()
+        assert [(row["bucket"], row["type"], row["count"]) for row in daily] == [
+            ("2026-01-01T00:00:00Z", "fuel", 3),
+            ("2026-01-02T00:00:00Z", "shopping", 1),
+            ("2026-02-01T00:00:00Z", "house_hold", 1),
+        ]
+        monthly = self.get_analytics(bucket="month", type=["fuel", "shopping"]).json()
+        assert [(row["bucket"], row["type"], row["total"]) for row in monthly] == [
+            ("2026-01-01T00:00:00Z", "fuel", "60.00"),
+            ("2026-01-01T00:00:00Z", "shopping", "100.00"),
+        ]
+
+    @pytest.mark.usefixtures("transaction_fixtures_timeline")
+    def test_date_range(self, *args):
+        """
+        Tests start is inclusive and end exclusive, on hour boundaries
+        """
+        rows = self.get_analytics(bucket="hour", start="2026-01-01T11:00:00Z", end="2026-02-01T00:00:00Z").json()
+        assert [(row["bucket"], row["type"]) for row in rows] == [
+            ("2026-01-01T11:00:00Z", "fuel"),
+            ("2026-01-02T09:00:00Z", "shopping"),
+        ]
+
+    def test_invalid_parameters(self, *args):
+        """
+        Tests unknown buckets, types and reversed ranges are rejected
+        """
+        assert self.get_analytics(bucket="week").status_code == 400
+        assert self.get_analytics(type="travel").status_code == 400
+        resp = self.get_analytics(start="2026-02-01T00:00:00Z", end="2026-01-01T00:00:00Z")
+        assert resp.status_code == 400
+        assert resp.json() == {"end": ["Must be after start."]}
+
+    @pytest.mark.usefixtures("transaction_fixtures_timeline")
+    def test_rollups_follow_writes(self, *args):
+        """
+        Tests updates, type changes and soft deletes adjust the rollups in place
+        """
+        self.fuel.amount = 15
+        self.fuel.save()
+        Transactions.objects.get(amount=20).delete()
+        moved = Transactions.objects.get(amount=30)
+        moved.type = TransactionType.shopping
+        moved.save()
+        rows = self.get_analytics(bucket="hour", end="2026-01-02T00:00:00Z").json()
+        assert [(row["bucket"], row["type"], row["total"], row["count"]) for row in rows] == [
+            ("2026-01-01T10:00:00Z", "fuel", "15.00", 1),
+            ("2026-01-01T11:00:00Z", "shopping", "30.00", 1),
+        ]
+        stored = {
+            (bucket, type): (total, count)
+            for bucket, type, total, count in TransactionRollup.objects.filter(count__gt=0).values_list('bucket', 'type', 'total', 'count')
+        }
+        assert stored == TransactionRollup.objects.from_transactions()
+
+    def test_bulk_insert_updates_rollups(self, *args):
+        """
+        Tests a bulk insert adds its live rows to the rollups
+        """
+        req_data = [{"type": "fuel", "amount": 5} for i in range(4)]
+        self.client.post(reverse('transaction-bulk'), data=req_data, content_type='application/json')
+        rows = self.get_analytics(bucket="month").json()
+        assert [(row["type"], row["total"], row["count"]) for row in rows] == [("fuel", "20.00", 4)]
+
+
+class TestRebuildRollupsCommand(BaseTestCase):
+    @pytest.fixture
+    def transaction_fixtures_rollups(self):
+        """
+        Fixture to create transactions in two hours
+        """
+        Transactions.objects.create(type=TransactionType.fuel, amount=10, created_on=at(2026, 1, 1, 10, 15))
+        Transactions.objects.create(type=TransactionType.fuel, amount=20, created_on=at(2026, 1, 1, 11, 15))
+
+    @pytest.mark.usefixtures("transaction_fixtures_rollups")
+    def test_verify_detects_drift(self, *args):
+        """
+        Tests verification fails when a rollup has drifted
+        """
+        call_command('rebuild_rollups', '--verify-only', stdout=StringIO())
+        TransactionRollup.objects.filter(total=20).update(total=0)
+        with pytest.raises(CommandError):
+            call_command('rebuild_rollups', '--verify-only', stdout=StringIO(), stderr=StringIO())
+
+    @pytest.mark.usefixtures("transaction_fixtures_rollups")
+    def test_rebuild_repairs_drift(self, *args):
+        """
+        Tests rebuilding restores drifted and missing rollups
+        """
+        TransactionRollup.objects.filter(total=20).delete()
+        TransactionRollup.objects.update(count=5)
+        out = StringIO()
+        call_command('rebuild_rollups', stdout=out)
+        assert "Rollups match the transactions" in out.getvalue()
+        assert TransactionRollup.objects.count() == 2
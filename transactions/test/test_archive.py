@@ -0,0 +1,95 @@
+from datetime import timedelta
+from io import StringIO
+from transactions.test.tests import BaseTestCase
+import pytest
+from transactions.models import TransactionArchive, Transactions, TransactionType
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+class TestArchiveTransactionsCommand(BaseTestCase):
+    @pytest.fixture
+    def transaction_fixtures_archived_tree(self):
+        """
+        Fixture to create a tree whose right subtree was deleted long ago
+        """
+                #            300(a)
+                #             /  \
+                #            /    \
+                #       (b)200    (c)100 deleted
+                #          /        /\
+                #         /        /  \
+                #    10(d)     30(f)40(g) deleted
+        self.root = Transactions.objects.create(type=TransactionType.shopping, amount=300)
+        self.left = Transactions.objects.create(parent_id=self.root, type=TransactionType.shopping, amount=200)
+        self.right = Transactions.objects.create(parent_id=self.root, type=TransactionType.fuel, amount=100)
+        Transactions.objects.create(parent_id=self.left, type=TransactionType.fuel, amount=10)
+        for amount in (30, 40):
+            Transactions.objects.create(parent_id=self.right, type=TransactionType.fuel, amount=amount)
+        Transactions.all_objects.archive_subtree(self.right.pk)
+        Transactions.all_objects.filter(is_deleted=True).update(modified_on=timezone.now() - timedelta(days=90))
+
+    def archive(self, **options):
+        out = StringIO()
+        call_command('archive_transactions', stdout=out, **options)
+        return out.getvalue()
+
+    @pytest.mark.usefixtures("transaction_fixtures_archived_tree")
+    def test_archives_deleted_subtree(self, *args):
+        """
+        Tests a deleted subtree is moved to the archive from the leaves up
+        """
+        assert "Archived 3 transactions in 2 batches" in self.archive()
+        assert Transactions.all_objects.count() == 3
+        archived = TransactionArchive.objects.get(pk=self.right.pk)
+        assert (archived.parent_id, archived.root_id, archived.amount) == (self.root.pk, self.root.pk, 100)
+        assert TransactionArchive.objects.filter(parent_id=self.right.pk).count() == 2
+        assert self.client.get(reverse('transaction-sum', kwargs={'pk': self.root.id})).json() == {"sum": 510}
+        assert Transactions.objects.subtree_sums([self.root.id]) == {self.root.id: 510}
+        call_command('rebuild_hierarchy', verify_only=True, stdout=StringIO())
+        call_command('rebuild_rollups', verify_only=True, stdout=StringIO())
+
+    @pytest.mark.usefixtures("transaction_fixtures_archived_tree")
+    def test_resumes_in_bounded_batches(self, *args):
+        """
+        Tests a run limited to some batches is picked up by the next run
+        """
+        assert "Archived 2 transactions in 2 batches" in self.archive(batch_size=1, max_batches=2)
+        assert TransactionArchive.objects.count() == 2
+        assert "Archived 1 transactions in 1 batches" in self.archive(batch_size=1)
+        assert "Archived 0 transactions in 0 batches" in self.archive()
+
+    @pytest.mark.usefixtures("transaction_fixtures_archived_tree")
+    def test_keeps_recent_and_referenced_rows(self, *args):
+        """
+        Tests recently deleted rows and deleted rows with live children stay hot
+        """
+        self.left.delete()
+        leaf = Transactions.objects.create(type=TransactionType.fuel, amount=5)
+        leaf.delete()
+        self.archive()
+        hot = set(Transactions.all_objects.filter(is_deleted=True).values_list('id', flat=True))
+        assert hot == {self.left.pk, leaf.pk}
+        self.archive(days=0)
+        assert set(Transactions.all_objects.filter(is_deleted=True).values_list('id', flat=True)) == {self.left.pk}
+
+    @pytest.mark.usefixtures("transaction_fixtures_archived_tree")
+    def test_archived_id_reused(self, *args):
+        """
+        Tests an archived id is refused at ingest, and a hot row already in the archive is never dropped
+        """
+        self.archive()
+        resp = self.client.post(
+            reverse('transaction-bulk'), data=[{"id": str(self.right.pk), "type": "fuel", "amount": 1}],
+            content_type='application/json',
+        )
+        assert resp.status_code == 400
+        assert resp.json()["results"] == [{"errors": {"id": [f'Transaction with id "{self.right.pk}" already exists.']}}]
+        # a row written with the id before the check existed
+        Transactions.objects.create(id=self.right.pk, type=TransactionType.fuel, amount=1).delete()
+        Transactions.all_objects.filter(pk=self.right.pk).update(modified_on=timezone.now() - timedelta(days=90))
+        with pytest.raises(CommandError, match=str(self.right.pk)):
+            self.archive()
+        assert Transactions.all_objects.filter(pk=self.right.pk).exists()
+        assert TransactionArchive.objects.get(pk=self.right.pk).amount == 100
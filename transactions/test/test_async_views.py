@@ -0,0 +1,93 @@
+from asgiref.sync import async_to_sync
+from transactions.test.tests import BaseTestCase
+import pytest
+from transactions.models import Transactions, TransactionType
+from django.test import AsyncClient
+from django.urls import reverse
+
+class TestAsyncReadViews(BaseTestCase):
+    @pytest.fixture
+    def transaction_fixtures_chain(self):
+        """
+        Fixture to create a chain 300(a)---> 200(b) ---> 100(c) and one fuel transaction
+        """
+        self.root = Transactions.objects.create(type=TransactionType.shopping, amount=300)
+        self.child = Transactions.objects.create(parent_id=self.root, type=TransactionType.shopping, amount=200)
+        Transactions.objects.create(parent_id=self.child, type=TransactionType.shopping, amount=100)
+        Transactions.objects.create(type=TransactionType.fuel, amount=10)
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.async_client = AsyncClient()
+
+    def async_get(self, uri, params=None, **extra):
+        async def fetch():
+            return await self.async_client.get(uri, params or {}, **extra)
+        return async_to_sync(fetch)()
+
+    def get_both(self, name, params=None, **kwargs):
+        """responses of the sync endpoint and of its async version"""
+        sync_resp = self.client.get(reverse(name, kwargs=kwargs), params or {})
+        async_resp = self.async_get(reverse('async-' + name, kwargs=kwargs), params)
+        return sync_resp, async_resp
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_same_bodies_as_sync_views(self, *args):
+        """
+        Tests every async endpoint answers with the body of its sync counterpart
+        """
+        cases = [
+            ('transaction-list', {"page_size": 2}, {}),
+            ('transaction-detail', None, {'pk': self.child.id}),
+            ('transaction-type', None, {'type': "shopping"}),
+            ('transaction-sum', None, {'pk': self.root.id}),
+        ]
+        for name, params, kwargs in cases:
+            sync_name = 'transaction-list-post' if name == 'transaction-list' else name
+            sync_resp = self.client.get(reverse(sync_name, kwargs=kwargs), params or {})
+            async_resp = self.async_get(reverse('async-' + name, kwargs=kwargs), params or {})
+            assert async_resp.status_code == 200
+            # the next link of the list points at the async route
+            assert async_resp.content.replace(b'/async/', b'/') == sync_resp.content, name
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_list_pages(self, *args):
+        """
+        Tests walking the async list page by page with cursors
+        """
+        get = self.async_get
+        resp_body = get(reverse('async-transaction-list'), {"page_size": 3}).json()
+        ids = [row["id"] for row in resp_body["results"]]
+        assert resp_body["next"]
+        resp_body = get(resp_body["next"]).json()
+        ids.extend(row["id"] for row in resp_body["results"])
+        assert resp_body["next"] is None
+        expected = Transactions.objects.order_by("created_on", "id").values_list("id", flat=True)
+        assert ids == [str(pk) for pk in expected]
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_errors(self, *args):
+        """
+        Tests missing ids, invalid types and invalid cursors are reported like DRF does
+        """
+        sync_resp, async_resp = self.get_both('transaction-detail', pk=Transactions().id)
+        assert async_resp.status_code == 404
+        assert async_resp.json() == sync_resp.json()
+        sync_resp, async_resp = self.get_both('transaction-type', type="travel")
+        assert async_resp.status_code == 400
+        assert async_resp.json() == sync_resp.json()
+        async_resp = self.async_get(reverse('async-transaction-list'), {"cursor": "bad"})
+        assert async_resp.status_code == 404
+        assert async_resp.json() == {"detail": "Invalid cursor"}
+        sync_resp, async_resp = self.get_both('transaction-sum', pk="missing")
+        assert async_resp.json() == sync_resp.json() == {"sum": 0}
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_detail_not_modified(self, *args):
+        """
+        Tests the async detail honours If-None-Match
+        """
+        uri = reverse('async-transaction-detail', kwargs={'pk': self.child.id})
+        get = self.async_get
+        etag = get(uri).headers["ETag"]
+        assert get(uri, **{'If-None-Match': etag}).status_code == 304
@@ -0,0 +1,20 @@
+from argparse import Namespace
+import pytest
+from benchmarks.endpoints import regressions, run_shapes
+
+@pytest.mark.benchmark
+@pytest.mark.django_db(transaction=True)
+def test_endpoint_benchmarks():
+    """
+    Tests the endpoint benchmark suite runs every shape at small sizes
+    """
+    args = Namespace(roots=3, children=10, depths=[10, 100], rows=300, repeat=2, warm_cache=False)
+    shapes = run_shapes(args)
+    assert set(shapes) == {'wide', 'deep-10', 'deep-100', 'skewed'}
+    for endpoints in shapes.values():
+        assert 'recursive sum (CTE)' in endpoints and 'update leaf amount' in endpoints
+        assert all(timings['p50_ms'] > 0 and timings['requests_per_second'] for timings in endpoints.values())
+    report = {'shapes': shapes}
+    slower = {'shapes': {'wide': {'sum': dict(shapes['wide']['sum'], p50_ms=shapes['wide']['sum']['p50_ms'] * 2)}}}
+    assert regressions(report, report, 0.2) == []
+    assert [found[:2] for found in regressions(report, slower, 0.2)] == [('wide', 'sum')]
@@ -0,0 +1,204 @@
+import re
+from io import StringIO
+from transactions.test.tests import BaseTestCase
+import pytest
+from transactions.models import TransactionRollup, Transactions, TransactionType
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+class TestBulkUpdate(BaseTestCase):
+    @pytest.fixture(autouse=True)
+    def transaction_fixtures_binary_tree(self):
+        """
+        Fixture to create dummy Transaction instances to be used in tests
+        """
+                #            300(a) shopping
+                #             /  \
+                #            /    \
+                #       (b)200    (c)100 fuel
+                #          /\       /\
+                #         /  \     /  \
+                #    10(d)  20(e) 30(f)40(g)   all fuel
+        self.root = Transactions.objects.create(type=TransactionType.shopping, amount=300)
+        self.left = Transactions.objects.create(parent_id=self.root, type=TransactionType.shopping, amount=200)
+        self.right = Transactions.objects.create(parent_id=self.root, type=TransactionType.fuel, amount=100)
+        self.leaves = [
+            Transactions.objects.create(parent_id=parent, type=TransactionType.fuel, amount=amount)
+            for parent, amount in ((self.left, 10), (self.left, 20), (self.right, 30), (self.right, 40))
+        ]
+
+    def bulk_update(self, items):
+        return self.client.patch(reverse('transaction-bulk-update'), data=items, content_type='application/json')
+
+    def subtree_update(self, pk, **data):
+        return self.client.patch(
+            reverse('transaction-subtree', kwargs={'pk': pk}), data=data, content_type='application/json',
+        )
+
+    def field_updates(self, queries):
+        """the CASE updates of the type and amount columns"""
+        return [query for query in queries if re.match(r'UPDATE "transactions_transactions" SET "type" = \(?CASE', query['sql'])]
+
+    def get_sum(self, pk):
+        return self.client.get(reverse('transaction-sum', kwargs={'pk': pk})).json()["sum"]
+
+    def type_total(self, type):
+        return TransactionRollup.objects.filter(type=type).aggregate(total=Sum('total'))['total']
+
+    def verify(self):
+        call_command('rebuild_hierarchy', verify_only=True, stdout=StringIO())
+        call_command('rebuild_rollups', verify_only=True, stdout=StringIO())
+
+    def test_bulk_update_fields(self, *args):
+        """
+        Tests type and amount changes of many rows are written with one CASE update
+        """
+        self.get_sum(self.root.id)
+        items = [
+            {"id": str(self.leaves[0].id), "amount": 15},
+            {"id": str(self.leaves[2].id), "type": TransactionType.house_hold},
+            {"id": str(self.right.id), "type": TransactionType.house_hold, "amount": 150},
+            {"id": str(self.leaves[3].id), "amount": 40},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.bulk_update(items)
+        assert resp.status_code == 200
+        assert resp.json() == {"updated": 3, "moved": 0, "results": [{"id": item["id"]} for item in items]}
+        assert len(self.field_updates(queries)) == 1
+        assert self.get_sum(self.root.id) == 755 and self.get_sum(self.right.id) == 220
+        assert self.type_total(TransactionType.house_hold) == 180
+        detail = self.client.get(reverse('transaction-detail', kwargs={'pk': self.right.id})).json()
+        assert (detail["type"], detail["amount"]) == ("house_hold", "150.00")
+        self.verify()
+
+    @override_settings(TRANSACTIONS_BULK_UPDATE_BATCH_SIZE=2)
+    def test_bulk_update_in_batches(self, *args):
+        """
+        Tests a large batch is written in bounded UPDATE statements
+        """
+        items = [{"id": str(leaf.id), "amount": 1} for leaf in self.leaves] + [{"id": str(self.left.id), "amount": 1}]
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.bulk_update(items)
+        assert resp.json()["updated"] == 5
+        assert len(self.field_updates(queries)) == 3
+        assert self.get_sum(self.root.id) == 405
+        self.verify()
+
+    def test_bulk_move(self, *args):
+        """
+        Tests re-parenting several subtrees in one request
+        """
+        items = [
+            {"id": str(self.right.id), "parent_id": str(self.left.id)},
+            {"id": str(self.leaves[0].id), "parent_id": None, "amount": 5},
+        ]
+        resp = self.bulk_update(items)
+        assert resp.status_code == 200
+        assert (resp.json()["updated"], resp.json()["moved"]) == (1, 2)
+        assert self.get_sum(self.left.id) == 390 and self.get_sum(self.root.id) == 690
+        assert self.get_sum(self.leaves[0].id) == 5
+        assert Transactions.objects.get(pk=self.leaves[2].pk).depth == 3
+        self.verify()
+
+    def test_bulk_move_cycle(self, *args):
+        """
+        Tests a batch whose moves form a cycle is rejected as a whole
+        """
+        items = [
+            {"id": str(self.right.id), "amount": 1},
+            {"id": str(self.left.id), "parent_id": str(self.right.id)},
+            {"id": str(self.right.id), "parent_id": str(self.leaves[0].id)},
+        ]
+        resp = self.bulk_update(items)
+        assert resp.status_code == 400
+        assert resp.json()["results"][2] == {"errors": {"id": [
+            f'Transaction "{self.right.id}" is updated more than once in this batch.']}}
+        resp = self.bulk_update(items[1:])
+        assert resp.status_code == 400
+        assert resp.json() == {"updated": 0, "moved": 0, "results": [
+            {}, {"errors": {"parent_id": ["A transaction cannot be moved under its own subtree."]}}]}
+        assert Transactions.objects.get(pk=self.left.pk).parent_id_id == self.root.pk
+        assert self.get_sum(self.root.id) == 700
+        self.verify()
+
+    def test_bulk_update_invalid_items(self, *args):
+        """
+        Tests unknown ids, deleted rows and missing parents reject the batch
+        """
+        missing = str(Transactions().id)
+        self.leaves[3].delete()
+        resp = self.bulk_update([
+            {"id": str(self.leaves[0].id), "amount": 1},
+            {"id": missing, "amount": 1},
+            {"id": str(self.leaves[3].id), "amount": 1},
+            {"id": str(self.leaves[1].id), "parent_id": missing},
+        ])
+        assert resp.status_code == 400
+        assert resp.json()["results"] == [
+            {},
+            {"errors": {"id": [f'Transaction "{missing}" does not exist.']}},
+            {"errors": {"id": [f'Transaction "{self.leaves[3].id}" does not exist.']}},
+            {"errors": {"parent_id": [f'Invalid pk "{missing}" - object does not exist.']}},
+        ]
+        assert Transactions.objects.get(pk=self.leaves[0].pk).amount == 10
+        resp = self.bulk_update([{"amount": 1}, {"id": str(self.root.id), "type": "rent"}])
+        assert resp.status_code == 400
+        assert set(resp.json()["results"][0]["errors"]) == {"id"}
+        assert set(resp.json()["results"][1]["errors"]) == {"type"}
+        assert self.bulk_update({"id": str(self.root.id)}).status_code == 400
+
+    def test_subtree_update(self, *args):
+        """
+        Tests retagging the fuel rows of a subtree only
+        """
+        resp = self.subtree_update(self.root.id, type=TransactionType.house_hold, from_type=TransactionType.fuel)
+        assert resp.status_code == 200
+        assert resp.json() == {"updated": 5}
+        assert set(Transactions.objects.values_list('type', flat=True)) == {"shopping", "house_hold"}
+        assert self.type_total(TransactionType.house_hold) == 200
+        assert self.type_total(TransactionType.fuel) == 0
+        resp = self.client.get(reverse('transaction-type', kwargs={'type': TransactionType.house_hold}))
+        assert len(resp.json()) == 5
+        assert self.get_sum(self.root.id) == 700
+        self.verify()
+
+    @override_settings(TRANSACTIONS_BULK_UPDATE_BATCH_SIZE=2)
+    def test_subtree_update_in_batches(self, *args):
+        """
+        Tests a subtree update in bounded batches skips deleted rows and other subtrees
+        """
+        self.leaves[0].delete()
+        resp = self.subtree_update(self.left.id, type=TransactionType.house_hold)
+        assert resp.json() == {"updated": 2}
+        assert Transactions.all_objects.get(pk=self.leaves[0].pk).type == TransactionType.fuel
+        assert Transactions.objects.get(pk=self.leaves[2].pk).type == TransactionType.fuel
+        self.verify()
+
+    def test_subtree_update_errors(self, *args):
+        """
+        Tests unknown roots, invalid types and cycles in the hierarchy
+        """
+        assert self.subtree_update(Transactions().id, type="fuel").status_code == 404
+        assert self.subtree_update("1-2-3", type="fuel").status_code == 404
+        assert self.subtree_update(self.root.id, type="rent").status_code == 400
+        # corrupt the hierarchy behind the model's back
+        Transactions.objects.filter(pk=self.root.pk).update(parent_id=self.leaves[0].pk)
+        resp = self.subtree_update(self.left.id, type=TransactionType.house_hold)
+        assert resp.status_code == 400
+        assert resp.json() == {"parent_id": ["The transaction is part of a cycle."]}
+        assert not Transactions.objects.filter(type=TransactionType.house_hold).exists()
+
+    def test_bulk_update_is_idempotent(self, *args):
+        """
+        Tests a retried bulk update with an Idempotency-Key is replayed
+        """
+        uri = reverse('transaction-bulk-update')
+        items = [{"id": str(self.leaves[0].id), "amount": 11}]
+        for _ in range(2):
+            resp = self.client.patch(uri, data=items, content_type='application/json', HTTP_IDEMPOTENCY_KEY="bulk-up")
+            assert resp.status_code == 200
+        assert resp["Idempotent-Replayed"] == "true"
@@ -0,0 +1,115 @@
+from transactions.test.tests import BaseTestCase
+import pytest
+from transactions import cache, checks
+from transactions.models import Transactions, TransactionType
+from django.test import override_settings
+from django.urls import reverse
+
+class TestReadThroughCache(BaseTestCase):
+    @pytest.fixture
+    def transaction_fixtures_chain(self):
+        """
+        Fixture to create a chain 300(a)---> 200(b)
+        """
+        self.root = Transactions.objects.create(type=TransactionType.shopping, amount=300)
+        self.child = Transactions.objects.create(parent_id=self.root, type=TransactionType.shopping, amount=200)
+
+    def get_sum(self, pk):
+        return self.client.get(reverse('transaction-sum', kwargs={'pk': pk})).json()["sum"]
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_detail_after_update(self, *args):
+        """
+        Tests a cached detail is replaced by an update
+        """
+        uri = reverse('transaction-detail', kwargs={'pk': self.child.id})
+        assert self.client.get(uri).json()["amount"] == "200.00"
+        self.client.put(uri, data={"parent_id": str(self.root.id), "type": "fuel", "amount": 250}, content_type='application/json')
+        assert self.client.get(uri).json()["amount"] == "250.00"
+        assert self.get_sum(self.root.id) == 550
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_ancestor_sums_after_create(self, *args):
+        """
+        Tests creating a grandchild expires the sums of the whole chain
+        """
+        assert self.get_sum(self.root.id) == 500
+        assert self.get_sum(self.child.id) == 200
+        self.client.post(reverse('transaction-list-post'), data={"parent_id": str(self.child.id), "type": "fuel", "amount": 50}, content_type='application/json')
+        assert self.get_sum(self.root.id) == 550
+        assert self.get_sum(self.child.id) == 250
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_type_listing_and_sums_after_delete(self, *args):
+        """
+        Tests a soft delete expires the type listing and the ancestor sums
+        """
+        uri = reverse('transaction-type', kwargs={'type': "shopping"})
+        assert len(self.client.get(uri).json()) == 2
+        assert self.get_sum(self.root.id) == 500
+        self.child.delete()
+        assert self.client.get(uri).json() == [{"id": str(self.root.id)}]
+        assert self.get_sum(self.root.id) == 300
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_bulk_insert_expires_sums(self, *args):
+        """
+        Tests a bulk insert expires the sums of the parents it touches
+        """
+        assert self.get_sum(self.root.id) == 500
+        req_data = [{"parent_id": str(self.child.id), "type": "fuel", "amount": 5} for i in range(3)]
+        self.client.post(reverse('transaction-bulk'), data=req_data, content_type='application/json')
+        assert self.get_sum(self.root.id) == 515
+
+    def test_missing_rows_are_not_cached(self, *args):
+        """
+        Tests a sum read of a missing id does not hide the row once created
+        """
+        pk = Transactions.objects.to_id(Transactions().id)
+        assert self.get_sum(pk) == 0
+        Transactions.objects.create(id=pk, type=TransactionType.fuel, amount=10)
+        assert self.get_sum(pk) == 10
+
+    def test_load_racing_a_write(self, *args):
+        """
+        Tests a value loaded before an invalidation is never served after it
+        """
+        def stale_loader():
+            # the write commits while this reader still holds the old value
+            cache.invalidate(sums=["key"])
+            return "stale"
+
+        assert cache.get_or_load('sum', "key", stale_loader) == "stale"
+        assert cache.get_or_load('sum', "key", lambda: "fresh") == "fresh"
+        assert cache.get_or_load('sum', "key", lambda: "unused") == "fresh"
+
+    def test_stats_endpoint(self, *args):
+        """
+        Tests hit and miss counters are reported per kind of entry
+        """
+        before = self.client.get(reverse('cache-stats')).json()
+        for i in range(3):
+            cache.get_or_load('type', "fuel", lambda: [])
+        after = self.client.get(reverse('cache-stats')).json()
+        assert after["type"]["misses"] - before["type"]["misses"] == 1
+        assert after["type"]["hits"] - before["type"]["hits"] == 2
+
+
+class TestCacheProcessesCheck:
+    def test_process_local_cache(self):
+        """
+        Tests the startup check refuses a per-process cache served by several processes
+        """
+        local = {'transactions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(TRANSACTIONS_WEB_PROCESSES=4, CACHES=local):
+            assert [error.id for error in checks.check_web_processes_cache(None)] == ['transactions.E002']
+
+    def test_shared_cache(self):
+        """
+        Tests the startup check accepts a shared cache, or a single process
+        """
+        shared = {'transactions': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/cache'}}
+        with override_settings(TRANSACTIONS_WEB_PROCESSES=4, CACHES=shared):
+            assert checks.check_web_processes_cache(None) == []
+        with override_settings(TRANSACTIONS_WEB_PROCESSES=1):
+            assert checks.check_web_processes_cache(None) == []
@@ -0,0 +1,114 @@
+import json
+from datetime import timedelta
+from transactions.test.tests import BaseTestCase
+import pytest
+from django.db.models import F
+from transactions.models import Transactions, TransactionType
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+@override_settings(TRANSACTIONS_CHANGES_SETTLE_SECONDS=0)
+class TestTransactionChanges(BaseTestCase):
+    @pytest.fixture(autouse=True)
+    def transaction_fixtures_changes(self):
+        """
+        Fixture to create a small tree modified at distinct times
+        """
+        self.root = Transactions.objects.create(type=TransactionType.fuel, amount=100)
+        self.child = Transactions.objects.create(parent_id=self.root, type=TransactionType.shopping, amount=30)
+        self.other = Transactions.objects.create(type=TransactionType.fuel, amount=5)
+        start = timezone.now() - timedelta(minutes=10)
+        for minutes, row in enumerate((self.root, self.child, self.other)):
+            Transactions.all_objects.filter(pk=row.pk).update(modified_on=start + timedelta(minutes=minutes))
+
+    def changes(self, uri=None, **params):
+        resp = self.client.get(uri or reverse('transaction-changes'), params)
+        assert resp.status_code == 200, resp.content
+        return resp.json()
+
+    def sync(self, cursor=None):
+        """ids of every change after ``cursor``, and the cursor to resume from"""
+        body = self.changes(**({"cursor": cursor} if cursor else {}), page_size=2)
+        ids = [row["id"] for row in body["results"]]
+        while body["next"]:
+            body = self.changes(body["next"])
+            ids.extend(row["id"] for row in body["results"])
+        return ids, body["cursor"]
+
+    def test_feed_resumes_from_cursor(self, *args):
+        """
+        Tests a sync walks every row once and the next one picks up only later changes
+        """
+        ids, cursor = self.sync()
+        assert ids == [str(self.root.id), str(self.child.id), str(self.other.id)]
+        assert self.sync(cursor) == ([], cursor)
+        self.child.amount = 40
+        self.child.save()
+        ids, cursor = self.sync(cursor)
+        assert ids == [str(self.child.id)]
+        assert self.changes(cursor=cursor)["results"] == []
+
+    def test_tombstones(self, *args):
+        """
+        Tests deleted rows are reported with their last values
+        """
+        _, cursor = self.sync()
+        self.other.delete()
+        rows = self.changes(cursor=cursor)["results"]
+        assert len(rows) == 1
+        row = rows[0]
+        assert row["id"] == str(self.other.id) and row["deleted"] is True
+        assert (row["type"], row["amount"], row["parent_id"]) == ("fuel", "5.00", None)
+        assert set(row) == {"id", "parent_id", "type", "amount", "created_on", "modified_on", "deleted"}
+
+    def test_updates_move_modified_on(self, *args):
+        """
+        Tests PUT and QuerySet.update show up in the feed, and derived-only updates do not
+        """
+        _, cursor = self.sync()
+        Transactions.objects.filter(pk=self.root.pk).update(subtree_amount=F('subtree_amount') + 0)
+        assert self.changes(cursor=cursor)["results"] == []
+        Transactions.objects.filter(pk=self.other.pk).update(amount=7)
+        resp = self.client.put(
+            reverse('transaction-detail', kwargs={'pk': self.root.id}),
+            data={"type": TransactionType.fuel, "amount": 120}, content_type='application/json',
+        )
+        assert resp.status_code == 200
+        rows = self.changes(cursor=cursor)["results"]
+        assert [(row["id"], row["amount"]) for row in rows] == [
+            (str(self.other.id), "7.00"), (str(self.root.id), "120.00")]
+
+    def test_since_and_settle_window(self, *args):
+        """
+        Tests the watermark parameter, and that recent rows are held back
+        """
+        since = Transactions.objects.get(pk=self.child.pk).modified_on
+        assert [row["id"] for row in self.changes(since=since.isoformat())["results"]] == [str(self.other.id)]
+        with override_settings(TRANSACTIONS_CHANGES_SETTLE_SECONDS=60):
+            Transactions.objects.filter(pk=self.root.pk).update(amount=1)
+            assert [row["id"] for row in self.changes()["results"]] == [str(self.child.id), str(self.other.id)]
+
+    def test_streamed_changes(self, *args):
+        """
+        Tests the NDJSON catch-up ends with the cursor to resume from
+        """
+        resp = self.client.get(reverse('transaction-changes'), {"export": "ndjson"})
+        assert resp["Content-Type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in b"".join(resp.streaming_content).decode().splitlines()]
+        assert [row["id"] for row in lines[:-1]] == [str(self.root.id), str(self.child.id), str(self.other.id)]
+        assert lines[-1] == {"cursor": self.changes()["cursor"]}
+        self.other.delete()
+        resp = self.client.get(reverse('transaction-changes'), {"export": "ndjson", "cursor": lines[-1]["cursor"]})
+        lines = [json.loads(line) for line in b"".join(resp.streaming_content).decode().splitlines()]
+        assert [(row["id"], row["deleted"]) for row in lines[:-1]] == [(str(self.other.id), True)]
+
+    def test_invalid_parameters(self, *args):
+        """
+        Tests malformed watermarks, cursors and export formats
+        """
+        uri = reverse('transaction-changes')
+        assert self.client.get(uri, {"since": "yesterday"}).status_code == 400
+        assert self.client.get(uri, {"export": "csv"}).status_code == 400
+        assert self.client.get(uri, {"cursor": "invalid"}).status_code == 404
+        assert self.client.get(uri, {"cursor": "invalid", "export": "ndjson"}).status_code == 404
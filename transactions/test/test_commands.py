@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+import uuid
+from transactions.test.tests import BaseTestCase
+import pytest
+from transactions.models import TransactionRollup, Transactions, TransactionType, uuid7_time
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+class TestRebuildHierarchyCommand(BaseTestCase):
+    @pytest.fixture
+    def transaction_fixtures_chain(self):
+        """
+        Fixture to create a chain 300(a)---> 200(b) ---> 100(c)
+        """
+        first = Transactions.objects.create(type=TransactionType.shopping, amount=300)
+        second = Transactions.objects.create(parent_id=first, type=TransactionType.shopping, amount=200)
+        Transactions.objects.create(parent_id=second, type=TransactionType.shopping, amount=100)
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_verify_consistent_totals(self, *args):
+        """
+        Tests verification passes on totals maintained by the model layer
+        """
+        out = StringIO()
+        call_command('rebuild_hierarchy', '--verify-only', stdout=out)
+        assert "Subtree totals match the CTE" in out.getvalue()
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_verify_detects_drift(self, *args):
+        """
+        Tests verification fails when a stored total has drifted
+        """
+        Transactions.objects.filter(amount=200).update(subtree_amount=0)
+        with pytest.raises(CommandError):
+            call_command('rebuild_hierarchy', '--verify-only', stdout=StringIO(), stderr=StringIO())
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_rebuild_repairs_drift(self, *args):
+        """
+        Tests rebuilding restores every drifted total
+        """
+        Transactions.objects.update(subtree_amount=0)
+        out = StringIO()
+        call_command('rebuild_hierarchy', stdout=out)
+        assert "3 rows corrected" in out.getvalue()
+        assert Transactions.objects.get(parent_id=None).subtree_amount == 600
+
+
+class TestRepairCreatedOnCommand(BaseTestCase):
+    @pytest.fixture
+    def transaction_fixtures_stale(self):
+        """
+        Fixture to create rows stamped with a process start time, as the
+        import-time default did, next to one correct row
+        """
+        self.stale = datetime(2022, 10, 30, 10, 0, tzinfo=timezone.utc)
+        for amount in (10, 20):
+            Transactions.objects.create(type=TransactionType.fuel, amount=amount, created_on=self.stale)
+        self.correct = Transactions.objects.create(type=TransactionType.fuel, amount=30)
+
+    def repair(self, *args):
+        out = StringIO()
+        call_command('repair_created_on', *args, stdout=out)
+        return out.getvalue()
+
+    @pytest.mark.usefixtures("transaction_fixtures_stale")
+    def test_dry_run(self, *args):
+        """
+        Tests a dry run only counts the rows to repair
+        """
+        assert "Would repair created_on of 2 transactions" in self.repair('--dry-run')
+        assert Transactions.objects.filter(created_on=self.stale).count() == 2
+
+    @pytest.mark.usefixtures("transaction_fixtures_stale")
+    def test_repair_from_ids(self, *args):
+        """
+        Tests created_on is restored from the ids and the rollups follow
+        """
+        correct_on = Transactions.objects.get(pk=self.correct.pk).created_on
+        assert "Repaired created_on of 2 transactions" in self.repair('--batch-size', '2')
+        for pk, created_on in Transactions.objects.values_list('id', 'created_on'):
+            assert abs(created_on - uuid7_time(pk)) <= timedelta(seconds=1)
+        assert Transactions.objects.get(pk=self.correct.pk).created_on == correct_on
+        assert not TransactionRollup.objects.filter(bucket=self.stale, count__gt=0).exists()
+        call_command('rebuild_rollups', verify_only=True, stdout=StringIO())
+        assert "Repaired created_on of 0 transactions" in self.repair()
+
+    def test_updated_row_left_unchanged(self, *args):
+        """
+        Tests a correctly stamped row with a client supplied id, updated days later, is not repaired
+        """
+        pk = str(uuid.uuid4())
+        resp = self.client.post(
+            reverse('transaction-bulk'), data=[{"id": pk, "type": "fuel", "amount": 5}], content_type='application/json',
+        )
+        assert resp.status_code == 201
+        self.client.patch(reverse('transaction-detail', kwargs={'pk': pk}), data={"amount": 6}, content_type='application/json')
+        created_on = Transactions.objects.get(pk=pk).created_on
+        Transactions.objects.filter(pk=pk).update(modified_on=created_on + timedelta(days=3))
+        buckets = list(TransactionRollup.objects.values_list('bucket', 'type', 'total', 'count'))
+        later = (datetime.now(timezone.utc) + timedelta(days=4)).isoformat()
+        assert "Repaired created_on of 0 transactions" in self.repair()
+        assert "Repaired created_on of 0 transactions" in self.repair('--before', later)
+        assert Transactions.objects.get(pk=pk).created_on == created_on
+        assert list(TransactionRollup.objects.values_list('bucket', 'type', 'total', 'count')) == buckets
+
+    def test_repair_without_time_ordered_ids(self, *args):
+        """
+        Tests created_on of rows with version 4 ids is restored from modified_on
+        """
+        stale = datetime(2022, 10, 30, 10, 0, tzinfo=timezone.utc)
+        for amount in (10, 20):
+            Transactions.objects.create(id=uuid.uuid4(), type=TransactionType.fuel, amount=amount, created_on=stale)
+        modified = dict(Transactions.objects.values_list('id', 'modified_on'))
+        assert "Repaired created_on of 2 transactions" in self.repair()
+        for pk, created_on, modified_on in Transactions.objects.values_list('id', 'created_on', 'modified_on'):
+            assert created_on == modified_on == modified[pk]
+        assert not TransactionRollup.objects.filter(bucket=stale, count__gt=0).exists()
+        call_command('rebuild_rollups', verify_only=True, stdout=StringIO())
+        assert "Repaired created_on of 0 transactions" in self.repair()
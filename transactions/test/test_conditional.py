@@ -0,0 +1,143 @@
+from transactions.test.tests import BaseTestCase
+import pytest
+from transactions import cache
+from transactions.models import Transactions, TransactionType
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+class TestConditionalRequests(BaseTestCase):
+    @pytest.fixture
+    def transaction_fixtures_chain(self):
+        """
+        Fixture to create a chain 300(a)---> 200(b)
+        """
+        self.root = Transactions.objects.create(type=TransactionType.shopping, amount=300)
+        self.child = Transactions.objects.create(parent_id=self.root, type=TransactionType.shopping, amount=200)
+
+    def put(self, pk, amount, **headers):
+        req_data = {"parent_id": str(self.root.id), "type": "shopping", "amount": amount}
+        return self.client.put(
+            reverse('transaction-detail', kwargs={'pk': pk}), data=req_data,
+            content_type='application/json', **headers
+        )
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_detail_not_modified(self, *args):
+        """
+        Tests a detail is answered with 304 until the transaction changes
+        """
+        uri = reverse('transaction-detail', kwargs={'pk': self.child.id})
+        resp = self.client.get(uri)
+        etag = resp.headers["ETag"]
+        assert resp.headers["Last-Modified"]
+        resp = self.client.get(uri, HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 304
+        assert resp.headers["ETag"] == etag
+        assert resp.content == b""
+        resp = self.client.get(uri, HTTP_IF_MODIFIED_SINCE=resp.headers["Last-Modified"])
+        assert resp.status_code == 304
+
+        self.put(self.child.id, 250)
+        resp = self.client.get(uri, HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag
+        assert resp.json()["amount"] == "250.00"
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_list_not_modified(self, *args):
+        """
+        Tests the list is answered with 304 until a transaction is added
+        """
+        uri = reverse('transaction-list-post')
+        etag = self.client.get(uri, {"page_size": 1}).headers["ETag"]
+        assert self.client.get(uri, {"page_size": 1}, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        assert self.client.get(uri, {"page_size": 2}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+        Transactions.objects.create(type=TransactionType.fuel, amount=10)
+        assert self.client.get(uri, {"page_size": 1}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_list_validators_without_count(self, *args):
+        """
+        Tests the list validators read the latest modification only, never a count over the table
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('transaction-list-post'), {"page_size": 1})
+        assert not any('count(' in query['sql'].lower() for query in queries)
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_deleted_list_after_archiving(self, *args):
+        """
+        Tests a list showing deleted rows changes its validators when they are archived
+        """
+        self.child.delete()
+        Transactions.all_objects.filter(pk=self.child.pk).update(modified_on=timezone.now() - timedelta(days=90))
+        uri = reverse('transaction-list-post')
+        etag = self.client.get(uri, {"deleted": "true"}).headers["ETag"]
+        assert self.client.get(uri, {"deleted": "true"}, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        call_command('archive_transactions', stdout=StringIO())
+        resp = self.client.get(uri, {"deleted": "true"}, HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 200 and resp.json()["results"] == []
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_export_not_modified(self, *args):
+        """
+        Tests a full export carries validators too
+        """
+        uri = reverse('transaction-list-post')
+        etag = self.client.get(uri, {"export": "ndjson"}).headers["ETag"]
+        assert self.client.get(uri, {"export": "ndjson"}, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_type_not_modified(self, *args):
+        """
+        Tests a type listing is answered with 304 until a transaction leaves it
+        """
+        uri = reverse('transaction-type', kwargs={'type': "shopping"})
+        etag = self.client.get(uri).headers["ETag"]
+        assert self.client.get(uri, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        self.child.delete()
+        resp = self.client.get(uri, HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 200
+        assert resp.json() == [{"id": str(self.root.id)}]
+
+    @pytest.mark.usefixtures("transaction_fixtures_chain")
+    def test_update_if_match(self, *args):
+        """
+        Tests an update only applies while the client's entity tag is current
+        """
+        etag = self.client.get(reverse('transaction-detail', kwargs={'pk': self.child.id})).headers["ETag"]
+        resp = self.put(self.child.id, 250, HTTP_IF_MATCH=etag)
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag
+
+        resp = self.put(self.child.id, 275, HTTP_IF_MATCH=etag)
+        assert resp.status_code == 412
+        self.child.refresh_from_db()
+        assert self.child.amount == 250
+
+    def test_update_if_match_missing(self, *args):
+        """
+        Tests If-Match fails on a transaction that does not exist
+        """
+        self.root = Transactions.objects.create(type=TransactionType.shopping, amount=300)
+        resp = self.put(Transactions().id, 250, HTTP_IF_MATCH='"abc"')
+        assert resp.status_code == 412
+
+
+@pytest.mark.django_db
+def test_not_modified_served_from_cache(client, django_assert_num_queries):
+    """
+    Tests a polling client of a cached detail costs no query
+    """
+    cache.clear()
+    transaction_object = Transactions.objects.create(type=TransactionType.fuel, amount=100)
+    uri = reverse('transaction-detail', kwargs={'pk': transaction_object.id})
+    etag = client.get(uri).headers["ETag"]
+    with django_assert_num_queries(0):
+        resp = client.get(uri, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 304
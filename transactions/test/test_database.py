@@ -0,0 +1,176 @@
+import threading
+from transactions.test.tests import BaseTestCase
+import pytest
+from asgiref.sync import async_to_sync
+from psycopg2 import extensions
+from transactions import cache, routers
+from transactions.models import Transactions, TransactionType
+from transaction_service.backends.postgresql_pool.base import ConnectionPool, Database, DatabaseWrapper
+from django.db import OperationalError, connection
+from django.test import override_settings
+from django.urls import reverse
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def get_transaction_status(self):
+        return self.status
+
+    def close(self):
+        self.closed = 1
+
+
+def test_pool_reuses_idle_connections():
+    """
+    Tests a released connection is handed out again instead of a new one
+    """
+    pool = ConnectionPool(size=2, timeout=0.1)
+    first = pool.acquire(FakeConnection)
+    pool.release(first)
+    assert pool.acquire(FakeConnection) is first
+    assert pool.stats() == {
+        'created': 1, 'reused': 1, 'discarded': 0, 'timeouts': 0,
+        'size': 2, 'timeout': 0.1, 'in_use': 1, 'idle': 0,
+    }
+
+
+def test_pool_discards_unusable_connections():
+    """
+    Tests connections released inside a transaction or closed are not reused
+    """
+    pool = ConnectionPool(size=2, timeout=0.1)
+    in_transaction, closed = pool.acquire(FakeConnection), pool.acquire(FakeConnection)
+    in_transaction.status = extensions.TRANSACTION_STATUS_INTRANS
+    pool.release(in_transaction)
+    pool.release(closed)
+    closed.closed = 1
+    assert in_transaction.closed
+    fresh = pool.acquire(FakeConnection)
+    assert fresh is not in_transaction and fresh is not closed
+    assert pool.stats()['discarded'] == 2
+
+
+def test_pool_waits_for_a_free_connection():
+    """
+    Tests an exhausted pool times out, and hands out a connection released meanwhile
+    """
+    pool = ConnectionPool(size=1, timeout=0.05)
+    held = pool.acquire(FakeConnection)
+    with pytest.raises(Database.OperationalError):
+        pool.acquire(FakeConnection)
+    assert pool.stats()['timeouts'] == 1
+    pool.timeout = 5
+    threading.Timer(0.05, pool.release, [held]).start()
+    assert pool.acquire(FakeConnection) is held
+
+
+@pytest.mark.django_db
+def test_pooled_backend_reuses_server_connections():
+    """
+    Tests closing a pooled Django connection keeps the server connection open
+    """
+    if connection.vendor != 'postgresql':
+        pytest.skip("the pooled backend is PostgreSQL only")
+    settings_dict = dict(connection.settings_dict, POOL={'SIZE': 1, 'TIMEOUT': 0.1})
+    first, second = DatabaseWrapper(settings_dict, alias='pooled'), DatabaseWrapper(settings_dict, alias='pooled')
+    try:
+        first.ensure_connection()
+        server_connection = first.connection
+        with pytest.raises(OperationalError):
+            second.ensure_connection()
+        first.close()
+        second.ensure_connection()
+        assert second.connection is server_connection and not server_connection.closed
+        with second.cursor() as cursor:
+            cursor.execute("select 1")
+            assert cursor.fetchone() == (1,)
+    finally:
+        second.close()
+        first.pool.close_idle()
+
+
+class TestReadReplicaRouting(BaseTestCase):
+    @pytest.fixture(autouse=True)
+    def recorded_reads(self, monkeypatch):
+        """
+        Fixture recording where the router sends each read
+        """
+        self.reads = []
+        db_for_read = routers.ReadReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            self.reads.append(alias)
+            return alias
+        monkeypatch.setattr(routers.ReadReplicaRouter, 'db_for_read', record)
+
+    def test_reads_go_to_the_primary_by_default(self, *args):
+        """
+        Tests reads outside the replica scope and without replicas stay on the primary
+        """
+        assert routers.current_read_alias() is None
+        with routers.use_replica() as alias:
+            assert alias is None
+        with override_settings(TRANSACTIONS_READ_REPLICAS=['replica_0', 'replica_1']):
+            with routers.use_replica() as first, routers.use_replica() as second:
+                assert {first, second} == {'replica_0', 'replica_1'}
+                assert routers.current_read_alias() == second
+            assert routers.current_read_alias() is None
+            assert routers.ReadReplicaRouter().allow_migrate('replica_0', 'transactions') is False
+            assert routers.ReadReplicaRouter().allow_migrate('default', 'transactions') is None
+
+    def test_replica_reads_wraps_async_methods(self, *args):
+        """
+        Tests the replica scope also covers coroutine view methods
+        """
+        @routers.replica_reads
+        async def read():
+            return routers.current_read_alias()
+        with override_settings(TRANSACTIONS_READ_REPLICAS=['replica_0']):
+            assert async_to_sync(read)() == 'replica_0'
+
+    @override_settings(TRANSACTIONS_READ_REPLICAS=['default'])
+    def test_read_endpoints_use_replicas(self, *args):
+        """
+        Tests the list, type and sum reads go to the replica and writes do not
+        """
+        resp = self.client.post(
+            reverse('transaction-list-post'), data={"type": TransactionType.fuel, "amount": 10},
+            content_type='application/json',
+        )
+        assert resp.status_code == 201
+        assert set(self.reads) <= {None}
+        pk = Transactions.objects.get().pk
+        for uri in (
+            reverse('transaction-list-post'),
+            reverse('transaction-type', kwargs={'type': TransactionType.fuel}),
+            reverse('transaction-sum', kwargs={'pk': pk}),
+        ):
+            self.reads.clear()
+            assert self.client.get(uri).status_code == 200
+            assert self.reads and set(self.reads) == {'default'}, uri
+
+    @override_settings(TRANSACTIONS_READ_REPLICAS=['default'], TRANSACTIONS_REPLICA_CACHE_TIMEOUT=0)
+    def test_replica_reads_are_cached_briefly(self, *args):
+        """
+        Tests values loaded from a replica expire after the replica cache timeout
+        """
+        pk = Transactions.objects.create(type=TransactionType.fuel, amount=10).pk
+        uri = reverse('transaction-sum', kwargs={'pk': pk})
+        self.client.get(uri)
+        hits = cache.stats()['sum']['hits']
+        self.client.get(uri)
+        assert cache.stats()['sum']['hits'] == hits
+
+    def test_database_stats(self, *args):
+        """
+        Tests the diagnostic endpoint reports the connection settings
+        """
+        resp = self.client.get(reverse('database-stats'))
+        assert resp.status_code == 200
+        stats = resp.json()["default"]
+        assert stats["vendor"] == connection.vendor
+        assert stats["replica"] is False and stats["pool"] is None
+        assert set(stats) == {"vendor", "replica", "conn_max_age", "conn_health_checks", "connected", "pool"}
@@ -0,0 +1,128 @@
+from io import StringIO
+from transactions.test.tests import BaseTestCase
+import pytest
+from transactions.models import TransactionRollup, Transactions, TransactionType
+from django.core.management import call_command
+from django.db.models import Sum
+from django.urls import reverse
+
+class TestTransactionDeleteView(BaseTestCase):
+    @pytest.fixture
+    def transaction_fixtures_binary_tree(self):
+        """
+        Fixture to create dummy Transaction instances to be used in tests
+        """
+                #            300(a)
+                #             /  \
+                #            /    \
+                #       (b)200    (c)100
+                #          /\       /\
+                #         /  \     /  \
+                #    10(d)  20(e) 30(f)40(g)
+        self.root = Transactions.objects.create(type=TransactionType.shopping, amount=300)
+        self.left = Transactions.objects.create(parent_id=self.root, type=TransactionType.shopping, amount=200)
+        self.right = Transactions.objects.create(parent_id=self.root, type=TransactionType.fuel, amount=100)
+        for parent, amount in ((self.left, 10), (self.left, 20), (self.right, 30), (self.right, 40)):
+            Transactions.objects.create(parent_id=parent, type=TransactionType.fuel, amount=amount)
+
+    def delete(self, pk, **params):
+        uri = reverse('transaction-detail', kwargs={'pk': pk})
+        if params:
+            uri += '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+        return self.client.delete(uri)
+
+    def get_sum(self, pk):
+        return self.client.get(reverse('transaction-sum', kwargs={'pk': pk})).json()["sum"]
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_delete_single_transaction(self, *args):
+        """
+        Tests deleting a transaction hides it and takes it off the sums only
+        """
+        self.get_sum(self.root.id)
+        resp = self.delete(self.left.id)
+        assert resp.status_code == 200
+        assert resp.json() == {"archived": 1}
+        assert self.client.get(reverse('transaction-detail', kwargs={'pk': self.left.id})).status_code == 404
+        assert self.get_sum(self.root.id) == 500
+        # the children stay live under the archived row
+        assert Transactions.objects.filter(parent_id=self.left).count() == 2
+        ids = [row["id"] for row in self.client.get(reverse('transaction-list-post')).json()["results"]]
+        assert str(self.left.id) not in ids and len(ids) == 6
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_delete_cascade(self, *args):
+        """
+        Tests a cascading delete archives the subtree and updates ancestors and rollups
+        """
+        self.get_sum(self.root.id)
+        resp = self.delete(self.right.id, cascade='true')
+        assert resp.status_code == 200
+        assert resp.json() == {"archived": 3}
+        assert self.get_sum(self.root.id) == 530
+        assert self.get_sum(self.right.id) == 0
+        assert not Transactions.objects.filter(parent_id=self.right).exists()
+        archived = Transactions.all_objects.filter(is_deleted=True)
+        assert archived.count() == 3
+        assert set(archived.values_list('subtree_amount', 'subtree_count')) == {(0, 0)}
+        assert Transactions.all_objects.get(pk=self.root.pk).subtree_count == 4
+        assert TransactionRollup.objects.filter(type=TransactionType.fuel).aggregate(
+            total=Sum('total'))['total'] == 30
+        out = StringIO()
+        call_command('rebuild_hierarchy', verify_only=True, stdout=out)
+        call_command('rebuild_rollups', verify_only=True, stdout=out)
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_delete_cascade_skips_archived_rows(self, *args):
+        """
+        Tests rows archived before a cascading delete are not counted twice
+        """
+        self.delete(Transactions.objects.get(amount=30).id)
+        resp = self.delete(self.right.id, cascade='true')
+        assert resp.json() == {"archived": 2}
+        assert self.get_sum(self.root.id) == 530
+        assert TransactionRollup.objects.filter(type=TransactionType.fuel).aggregate(
+            total=Sum('total'))['total'] == 30
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_delete_missing_transaction(self, *args):
+        """
+        Tests deleting an unknown or already deleted transaction
+        """
+        assert self.delete(Transactions().id).status_code == 404
+        assert self.delete("1-2-3").status_code == 404
+        assert self.delete(self.left.id).status_code == 200
+        assert self.delete(self.left.id).status_code == 404
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_delete_if_match(self, *args):
+        """
+        Tests a delete with a stale If-Match is refused
+        """
+        uri = reverse('transaction-detail', kwargs={'pk': self.left.id})
+        etag = self.client.get(uri)["ETag"]
+        assert self.client.delete(uri, HTTP_IF_MATCH='"stale"').status_code == 412
+        assert self.client.delete(uri, HTTP_IF_MATCH=etag).status_code == 200
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_default_manager_hides_deleted(self, *args):
+        """
+        Tests the default manager hides soft-deleted rows, unlike all_objects
+        """
+        self.left.delete()
+        assert not Transactions.objects.filter(pk=self.left.pk).exists()
+        assert Transactions.all_objects.get(pk=self.left.pk).is_deleted
+        assert Transactions.objects.count() == 6
+        assert Transactions.all_objects.count() == 7
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_archived_parent_is_rejected(self, *args):
+        """
+        Tests new transactions cannot be attached to an archived parent
+        """
+        self.left.delete()
+        req_data = {"parent_id": str(self.left.id), "type": TransactionType.shopping, "amount": 5}
+        resp = self.client.post(reverse('transaction-list-post'), data=req_data, content_type='application/json')
+        assert resp.status_code == 400
+        resp = self.client.post(reverse('transaction-bulk'), data=[req_data], content_type='application/json')
+        assert "parent_id" in resp.json()["results"][0]["errors"]
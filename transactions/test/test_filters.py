@@ -0,0 +1,135 @@
+import json
+from datetime import timedelta
+from transactions.test.tests import BaseTestCase
+import pytest
+from asgiref.sync import async_to_sync
+from transactions.models import Transactions, TransactionType
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils import timezone
+
+class TestTransactionListFilters(BaseTestCase):
+    @pytest.fixture(autouse=True)
+    def transaction_fixtures_tree(self):
+        """
+        Fixture to create two trees of transactions of several types and amounts
+        """
+                #        100(a) fuel           50(e) shopping
+                #         /   \
+                #   30(b) fuel 30(c) shopping
+                #      |
+                #   10(d) shopping, deleted
+        self.a = Transactions.objects.create(type=TransactionType.fuel, amount=100)
+        self.b = Transactions.objects.create(parent_id=self.a, type=TransactionType.fuel, amount=30)
+        self.c = Transactions.objects.create(parent_id=self.a, type=TransactionType.shopping, amount=30)
+        self.d = Transactions.objects.create(parent_id=self.b, type=TransactionType.shopping, amount=10)
+        self.e = Transactions.objects.create(type=TransactionType.shopping, amount=50)
+        self.d.delete()
+
+    def list(self, **params):
+        resp = self.client.get(reverse('transaction-list-post'), params)
+        assert resp.status_code == 200, resp.content
+        return resp.json()
+
+    def ids(self, **params):
+        return [row["id"] for row in self.list(**params)["results"]]
+
+    def walk(self, **params):
+        body = self.list(page_size=2, **params)
+        ids = [row["id"] for row in body["results"]]
+        while body["next"]:
+            body = self.client.get(body["next"]).json()
+            ids.extend(row["id"] for row in body["results"])
+        return ids
+
+    def expected(self, *rows):
+        return [str(row.id) for row in rows]
+
+    def test_filters(self, *args):
+        """
+        Tests filtering by type, amount range, parent and roots
+        """
+        assert self.ids(type=[TransactionType.fuel]) == self.expected(self.a, self.b)
+        assert self.ids(type=[TransactionType.fuel, TransactionType.shopping]) == self.expected(
+            self.a, self.b, self.c, self.e)
+        assert self.ids(amount_min=30, amount_max=50) == self.expected(self.b, self.c, self.e)
+        assert self.ids(parent_id=self.a.id) == self.expected(self.b, self.c)
+        assert self.ids(root="true") == self.expected(self.a, self.e)
+        assert self.ids(root="true", type=[TransactionType.shopping], amount_min=40) == self.expected(self.e)
+
+    def test_date_filters(self, *args):
+        """
+        Tests creation and modification ranges include their start only
+        """
+        now = timezone.now()
+        Transactions.all_objects.filter(pk=self.a.pk).update(
+            created_on=now - timedelta(days=2), modified_on=now - timedelta(days=2))
+        created_on = Transactions.objects.get(pk=self.b.pk).created_on
+        assert self.ids(created_before=now - timedelta(days=1)) == self.expected(self.a)
+        assert self.expected(self.a) == self.ids(modified_before=now - timedelta(days=1))
+        after = self.ids(created_after=created_on.isoformat())
+        assert after[0] == str(self.b.id) and str(self.a.id) not in after
+        assert self.ids(created_after=created_on.isoformat(), created_before=created_on.isoformat()) == []
+
+    def test_deleted_state(self, *args):
+        """
+        Tests live rows are listed by default, and deleted ones on request
+        """
+        assert str(self.d.id) not in self.ids()
+        assert self.ids(deleted="true") == self.expected(self.d)
+        assert self.ids(deleted="any", type=[TransactionType.shopping]) == self.expected(self.c, self.d, self.e)
+
+    def test_sorted_pages(self, *args):
+        """
+        Tests walking pages sorted by amount both ways, with ties broken by id
+        """
+        by_amount = sorted([self.a, self.b, self.c, self.e], key=lambda row: (row.amount, row.id))
+        assert self.walk(sort="amount") == self.expected(*by_amount)
+        by_amount_desc = sorted([self.a, self.b, self.c, self.e], key=lambda row: (row.amount, row.id), reverse=True)
+        assert self.walk(sort="-amount") == self.expected(*by_amount_desc)
+        assert self.walk(sort="-created_on") == self.expected(self.e, self.c, self.b, self.a)
+        assert self.walk(sort="-amount", amount_max=30) == self.expected(*by_amount_desc[2:])
+
+    def test_field_selection(self, *args):
+        """
+        Tests only the selected fields are returned, in the list and the export
+        """
+        body = self.list(fields="id", type=[TransactionType.fuel], page_size=1)
+        assert body["results"] == [{"id": str(self.a.id)}]
+        assert self.client.get(body["next"]).json()["results"] == [{"id": str(self.b.id)}]
+        assert self.list(fields="amount,id", sort="-amount", page_size=1)["results"] == [
+            {"amount": "100.00", "id": str(self.a.id)}]
+        resp = self.client.get(reverse('transaction-list-post'), {"fields": "id,parent_id", "export": "ndjson", "root": "true"})
+        lines = b"".join(resp.streaming_content).decode().splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {"id": str(self.a.id), "parent_id": None}, {"id": str(self.e.id), "parent_id": None}]
+
+    def test_invalid_parameters(self, *args):
+        """
+        Tests unknown sort keys, fields, types and inverted ranges are rejected
+        """
+        uri = reverse('transaction-list-post')
+        for params, field in (
+            ({"sort": "subtree_amount"}, "sort"),
+            ({"fields": "id,depth"}, "fields"),
+            ({"type": "rent"}, "type"),
+            ({"amount_min": 50, "amount_max": 10}, "amount_max"),
+            ({"root": "true", "parent_id": str(self.a.id)}, "root"),
+        ):
+            resp = self.client.get(uri, params)
+            assert resp.status_code == 400 and field in resp.json(), params
+
+    def test_async_list_filters(self, *args):
+        """
+        Tests the async list applies the same filters and renders the same bytes
+        """
+        params = {"type": TransactionType.shopping, "sort": "-amount", "fields": "id,amount"}
+        sync = self.client.get(reverse('transaction-list-post'), params)
+        async def get():
+            return await AsyncClient().get(reverse('async-transaction-list'), params)
+        resp = async_to_sync(get)()
+        assert resp.status_code == 200
+        assert resp.content == sync.content
+        async def get_invalid():
+            return await AsyncClient().get(reverse('async-transaction-list'), {"sort": "type"})
+        assert async_to_sync(get_invalid)().status_code == 400
@@ -0,0 +1,131 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from transactions.test.tests import BaseTestCase
+import pytest
+from transactions.models import IdempotencyKey, Transactions, TransactionType
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+class TestIdempotencyKeys(BaseTestCase):
+    def post(self, data, key, uri=None):
+        return self.client.post(
+            uri or reverse('transaction-list-post'), data=data, content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retried_create_is_replayed(self, *args):
+        """
+        Tests a retried POST returns the stored response without inserting again
+        """
+        data = {"type": TransactionType.fuel, "amount": 10}
+        first = self.post(data, "create-1")
+        second = self.post(data, "create-1")
+        assert first.status_code == second.status_code == 201
+        assert first.content == second.content
+        assert second["Content-Type"] == first["Content-Type"]
+        assert second["Idempotent-Replayed"] == "true" and not first.has_header("Idempotent-Replayed")
+        assert Transactions.objects.count() == 1
+        assert self.post(data, "create-2").status_code == 201
+        assert Transactions.objects.count() == 2
+
+    def test_replay_skips_validation(self, *args):
+        """
+        Tests a stored validation error is replayed even once the request became valid
+        """
+        parent_id = str(Transactions().id)
+        data = {"parent_id": parent_id, "type": TransactionType.fuel, "amount": 10}
+        first = self.post(data, "invalid-parent")
+        assert first.status_code == 400
+        Transactions.objects.bulk_create([
+            Transactions(id=parent_id, type=TransactionType.fuel, amount=1, root_id_id=parent_id)
+        ])
+        second = self.post(data, "invalid-parent")
+        assert (second.status_code, second.content) == (400, first.content)
+        assert Transactions.objects.count() == 1
+
+    def test_key_reused_for_another_request(self, *args):
+        """
+        Tests a key sent with a different body is refused
+        """
+        self.post({"type": TransactionType.fuel, "amount": 10}, "reused")
+        resp = self.post({"type": TransactionType.fuel, "amount": 20}, "reused")
+        assert resp.status_code == 422
+        assert resp.json() == {"detail": "This Idempotency-Key was already used with a different request."}
+        assert Transactions.objects.count() == 1
+
+    def test_retried_update_and_bulk_create(self, *args):
+        """
+        Tests PUT and bulk POST retries are replayed with their headers
+        """
+        root = Transactions.objects.create(type=TransactionType.fuel, amount=10)
+        uri = reverse('transaction-detail', kwargs={'pk': root.id})
+        data = {"type": TransactionType.fuel, "amount": 50}
+        first = self.client.put(uri, data=data, content_type='application/json', HTTP_IDEMPOTENCY_KEY="put-1")
+        Transactions.objects.filter(pk=root.pk).update(amount=70)
+        second = self.client.put(uri, data=data, content_type='application/json', HTTP_IDEMPOTENCY_KEY="put-1")
+        assert second.status_code == 200 and second["ETag"] == first["ETag"]
+        assert Transactions.objects.get(pk=root.pk).amount == 70
+        items = [{"parent_id": str(root.id), "type": "fuel", "amount": 1}] * 3
+        for _ in range(2):
+            resp = self.post(items, "bulk-1", uri=reverse('transaction-bulk'))
+            assert resp.status_code == 201
+        assert Transactions.objects.count() == 4
+
+    def test_expired_key_runs_again(self, *args):
+        """
+        Tests a request is processed again once its key expired
+        """
+        data = {"type": TransactionType.fuel, "amount": 10}
+        self.post(data, "expiring")
+        IdempotencyKey.objects.update(expires_on=timezone.now() - timedelta(seconds=1))
+        resp = self.post(data, "expiring")
+        assert not resp.has_header("Idempotent-Replayed")
+        assert Transactions.objects.count() == 2
+        assert IdempotencyKey.objects.count() == 1
+
+    def test_purge_expired_keys(self, *args):
+        """
+        Tests expired keys are deleted in batches and live ones are kept
+        """
+        now = timezone.now()
+        IdempotencyKey.objects.bulk_create(
+            [IdempotencyKey(key=f"old-{i}", fingerprint="", expires_on=now - timedelta(hours=1)) for i in range(5)]
+            + [IdempotencyKey(key="live", fingerprint="", expires_on=now + timedelta(hours=1))]
+        )
+        out = StringIO()
+        call_command('purge_idempotency_keys', batch_size=2, stdout=out)
+        assert "Purged 5 expired idempotency keys" in out.getvalue()
+        assert list(IdempotencyKey.objects.values_list('key', flat=True)) == ["live"]
+
+    def test_concurrent_duplicates(self, *args):
+        """
+        Tests concurrent requests with the same key insert once and agree
+        """
+        if connection.vendor == 'sqlite':
+            pytest.skip("SQLite serializes writers on a single connection")
+        data = {"type": TransactionType.fuel, "amount": 10}
+        responses = []
+        start = threading.Barrier(4)
+
+        def send():
+            try:
+                start.wait()
+                responses.append(Client().post(
+                    reverse('transaction-list-post'), data=data, content_type='application/json',
+                    HTTP_IDEMPOTENCY_KEY="concurrent",
+                ))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=send) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert [resp.status_code for resp in responses] == [201] * 4
+        assert sum(resp.has_header("Idempotent-Replayed") for resp in responses) == 3
+        assert Transactions.objects.count() == 1
@@ -0,0 +1,249 @@
+from io import StringIO
+from transactions.test.tests import BaseTestCase
+import pytest
+import threading
+import time
+from transactions import checks, journal
+from transactions.ingest import BulkIngestion
+from transactions.models import TransactionQuerySet, Transactions, TransactionType
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+
+class Crash(BaseException):
+    """stands for the worker process dying"""
+
+
+class TestWriteBehindJournal(BaseTestCase):
+    @pytest.fixture(autouse=True)
+    def transaction_fixtures_journal(self, tmp_path):
+        """
+        Fixture pointing the journal at a fresh file and creating a root transaction
+        """
+        path = str(tmp_path / "journal.sqlite3")
+        with override_settings(TRANSACTIONS_JOURNAL_PATH=path):
+            self.journal = journal.get_journal()
+            self.root = Transactions.objects.create(type=TransactionType.fuel, amount=10)
+            yield
+        self.journal.close()
+
+    def enqueue(self, **data):
+        data = {"parent_id": str(self.root.id), "type": TransactionType.fuel, "amount": 5, **data}
+        resp = self.client.post(
+            reverse('transaction-list-post'), data=data, content_type='application/json',
+            HTTP_PREFER='respond-async',
+        )
+        assert resp.status_code == 202, resp.content
+        return resp
+
+    def status(self, pk):
+        return self.client.get(reverse('transaction-queue-status', kwargs={'pk': pk}))
+
+    def drain(self, **options):
+        out = StringIO()
+        call_command('drain_journal', once=True, stdout=out, **options)
+        return out.getvalue()
+
+    def test_post_is_queued(self, *args):
+        """
+        Tests a queued POST answers 202 with its id and inserts nothing yet
+        """
+        resp = self.enqueue()
+        pk = resp.json()["id"]
+        assert resp.json() == {"id": pk, "status": "queued"}
+        assert resp["Location"] == reverse('transaction-queue-status', kwargs={'pk': pk})
+        assert Transactions.objects.count() == 1
+        assert self.status(pk).json() == {"id": pk, "status": "queued"}
+        # without the preference the request is handled synchronously
+        resp = self.client.post(
+            reverse('transaction-list-post'), data={"type": TransactionType.fuel, "amount": 1},
+            content_type='application/json',
+        )
+        assert resp.status_code == 201
+
+    def test_invalid_fields_are_not_queued(self, *args):
+        """
+        Tests field errors are reported right away
+        """
+        resp = self.client.post(
+            reverse('transaction-list-post'), data={"type": "rent", "amount": 5},
+            content_type='application/json', HTTP_PREFER='respond-async',
+        )
+        assert resp.status_code == 400
+        assert self.journal.counts() == {}
+
+    def test_drain_commits_in_groups(self, *args):
+        """
+        Tests the worker inserts the queued transactions in batches and marks them committed
+        """
+        ids = [self.enqueue(amount=amount).json()["id"] for amount in range(1, 11)]
+        batches = []
+        insert = BulkIngestion.insert
+
+        def record(ingestion, rows):
+            batches.append(len(rows))
+            return insert(ingestion, rows)
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            monkeypatch.setattr(BulkIngestion, 'insert', record)
+            assert "Drained 10 queued transactions" in self.drain(batch_size=4)
+        assert batches == [4, 4, 2]
+        assert [str(pk) for pk in Transactions.objects.filter(parent_id=self.root).order_by('created_on', 'id')
+                .values_list('id', flat=True)] == ids
+        assert self.client.get(reverse('transaction-sum', kwargs={'pk': self.root.id})).json() == {"sum": 65}
+        assert self.status(ids[0]).json() == {"id": ids[0], "status": "committed"}
+        call_command('rebuild_hierarchy', verify_only=True, stdout=StringIO())
+
+    def test_failed_entries_keep_their_errors(self, *args):
+        """
+        Tests an entry whose parent does not exist fails without blocking its batch
+        """
+        missing = str(Transactions().id)
+        failed = self.enqueue(parent_id=missing).json()["id"]
+        queued = self.enqueue().json()["id"]
+        self.drain()
+        resp = self.status(failed).json()
+        assert resp["status"] == "failed" and "parent_id" in resp["errors"]
+        assert self.status(queued).json()["status"] == "committed"
+        assert not Transactions.all_objects.filter(pk=failed).exists()
+
+    def test_crash_after_database_commit(self, *args):
+        """
+        Tests a worker dying before marking its batch neither loses nor duplicates rows
+        """
+        ids = [self.enqueue().json()["id"] for _ in range(3)]
+        mark = journal.Journal.mark
+
+        def crash(queue, outcomes):
+            if any(state == journal.COMMITTED for _, state, _ in outcomes):
+                raise Crash
+            mark(queue, outcomes)
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            monkeypatch.setattr(journal.Journal, 'mark', crash)
+            with pytest.raises(Crash):
+                self.drain()
+        assert Transactions.objects.filter(parent_id=self.root).count() == 3
+        assert self.journal.counts() == {"claimed": 3}
+        assert self.status(ids[0]).json()["status"] == "queued"
+        self.drain()
+        assert Transactions.objects.filter(parent_id=self.root).count() == 3
+        assert {self.status(pk).json()["status"] for pk in ids} == {"committed"}
+        assert Transactions.objects.get(pk=self.root.pk).subtree_amount == 25
+        call_command('rebuild_hierarchy', verify_only=True, stdout=StringIO())
+
+    def test_crash_before_database_commit(self, *args):
+        """
+        Tests a batch rolled back by a crash is inserted once on the next run
+        """
+        self.enqueue()
+
+        def crash(*args, **kwargs):
+            raise Crash
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            # the rows are written, the subtree totals are not
+            monkeypatch.setattr(TransactionQuerySet, 'add_to_subtrees_many', crash)
+            with pytest.raises(Crash):
+                self.drain()
+        assert Transactions.objects.count() == 1
+        assert self.journal.counts() == {"claimed": 1}
+        self.drain()
+        assert Transactions.objects.count() == 2
+
+    def test_existing_id_is_a_duplicate(self, *args):
+        """
+        Tests an entry reusing the id of a row it did not insert fails instead of passing as committed
+        """
+        pk = self.enqueue(id=str(self.root.id), amount=99).json()["id"]
+        self.drain()
+        resp = self.status(pk).json()
+        assert resp["status"] == "failed"
+        assert resp["errors"] == {"id": [f'Transaction with id "{self.root.id}" already exists.']}
+        assert Transactions.objects.get(pk=self.root.pk).amount == 10
+
+    def test_id_queued_twice(self, *args):
+        """
+        Tests queuing an id that is already in the journal is refused
+        """
+        pk = self.enqueue().json()["id"]
+        resp = self.client.post(
+            reverse('transaction-list-post'), data={"id": pk, "type": TransactionType.fuel, "amount": 1},
+            content_type='application/json', HTTP_PREFER='respond-async',
+        )
+        assert resp.status_code == 400
+        assert resp.json() == {"id": [f'Transaction with id "{pk}" already exists.']}
+        assert self.journal.counts() == {"queued": 1}
+
+    def test_claimed_id_taken_by_another_row(self, *args):
+        """
+        Tests a claimed entry whose id now holds other values is not marked committed
+        """
+        pk = self.enqueue().json()["id"]
+        self.journal.claim([pk])
+        Transactions.objects.create(id=pk, type=TransactionType.shopping, amount=1)
+        self.drain()
+        assert self.status(pk).json()["status"] == "failed"
+
+    def test_journal_survives_reopening(self, *args):
+        """
+        Tests entries acknowledged by one process are drained by another
+        """
+        pk = self.enqueue().json()["id"]
+        reopened = journal.Journal(self.journal.path)
+        try:
+            assert [entry.id for entry in reopened.queued(10)] == [pk]
+            assert journal.drain(reopened, 10) == 1
+        finally:
+            reopened.close()
+        assert self.status(pk).json()["status"] == "committed"
+
+    def test_status_after_prune(self, *args):
+        """
+        Tests committed entries pruned from the journal still report committed
+        """
+        pk = self.enqueue().json()["id"]
+        self.drain(retain=-1)
+        assert self.journal.status(pk) is None
+        assert self.status(pk).json() == {"id": pk, "status": "committed"}
+        assert self.status(str(Transactions().id)).status_code == 404
+        assert self.status("1-2-3").status_code == 404
+
+
+    def test_worker_prunes_while_running(self, *args):
+        """
+        Tests a running worker prunes committed entries without waiting for its exit
+        """
+        pk = self.enqueue().json()["id"]
+        self.drain(retain=3600)
+        assert self.journal.status(pk)["state"] == "committed"
+        stop = threading.Event()
+        worker = threading.Thread(
+            target=journal.run, args=(self.journal, 10, 0.01, stop), kwargs={"retain": -1, "prune_interval": 0},
+        )
+        worker.start()
+        try:
+            deadline = time.monotonic() + 5
+            while self.journal.status(pk) is not None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert self.journal.status(pk) is None
+        finally:
+            stop.set()
+            worker.join()
+
+
+class TestJournalCacheCheck:
+    def test_process_local_cache(self):
+        """
+        Tests the startup check refuses a per-process cache with the journal on
+        """
+        local = {'transactions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(TRANSACTIONS_JOURNAL_PATH='/tmp/journal.sqlite3', CACHES=local):
+            assert [error.id for error in checks.check_journal_cache(None)] == ['transactions.E001']
+
+    def test_shared_cache(self):
+        """
+        Tests the startup check accepts a shared cache, or no journal at all
+        """
+        shared = {'transactions': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}}
+        with override_settings(TRANSACTIONS_JOURNAL_PATH='/tmp/journal.sqlite3', CACHES=shared):
+            assert checks.check_journal_cache(None) == []
+        with override_settings(TRANSACTIONS_JOURNAL_PATH=None):
+            assert checks.check_journal_cache(None) == []
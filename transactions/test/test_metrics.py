@@ -0,0 +1,71 @@
+import logging
+import re
+from transactions.test.tests import BaseTestCase
+import pytest
+from asgiref.sync import async_to_sync
+from transactions import metrics
+from transactions.models import Transactions, TransactionType
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+
+def sample(text, name, view, method='GET', **labels):
+    """value of one sample of the exposition text"""
+    label_text = ','.join([f'view="{view}"', f'method="{method}"', *(f'{key}="{value}"' for key, value in labels.items())])
+    match = re.search(r'^%s\{%s\} (\S+)$' % (re.escape(name), re.escape(label_text)), text, re.M)
+    return float(match.group(1)) if match else None
+
+class TestMetrics(BaseTestCase):
+    @pytest.fixture(autouse=True)
+    def transaction_fixtures_metrics(self, caplog):
+        """
+        Fixture resetting the metrics and creating a root transaction
+        """
+        metrics.reset()
+        self.caplog = caplog
+        self.root = Transactions.objects.create(type=TransactionType.fuel, amount=10)
+
+    def get_metrics(self):
+        resp = self.client.get(reverse('metrics'))
+        assert resp.status_code == 200
+        assert resp["Content-Type"].startswith("text/plain; version=0.0.4")
+        return resp.content.decode()
+
+    def test_request_metrics_per_view(self, *args):
+        """
+        Tests latency, queries and response size are recorded per url name
+        """
+        for _ in range(2):
+            list_body = self.client.get(reverse('transaction-list-post')).content
+        self.client.get(reverse('transaction-detail', kwargs={'pk': self.root.id}))
+        text = self.get_metrics()
+        assert sample(text, 'transactions_request_duration_seconds_count', 'transaction-list-post') == 2
+        assert sample(text, 'transactions_request_duration_seconds_bucket', 'transaction-list-post', le='+Inf') == 2
+        assert sample(text, 'transactions_request_duration_seconds_bucket', 'transaction-list-post', le=10) == 2
+        assert sample(text, 'transactions_request_queries_total', 'transaction-list-post') == 4
+        assert sample(text, 'transactions_request_db_seconds_total', 'transaction-list-post') > 0
+        assert sample(text, 'transactions_response_bytes_total', 'transaction-list-post') == 2 * len(list_body)
+        assert sample(text, 'transactions_request_duration_seconds_count', 'transaction-detail') == 1
+        assert "# TYPE transactions_request_duration_seconds histogram" in text
+
+    def test_unmatched_and_async_requests(self, *args):
+        """
+        Tests unknown paths are grouped and async view queries are counted
+        """
+        self.client.get('/no-such-path/')
+        async def get():
+            return await AsyncClient().get(reverse('async-transaction-detail', kwargs={'pk': self.root.id}))
+        assert async_to_sync(get)().status_code == 200
+        text = self.get_metrics()
+        assert sample(text, 'transactions_request_duration_seconds_count', 'unmatched') == 1
+        assert sample(text, 'transactions_request_queries_total', 'async-transaction-detail') == 1
+
+    @override_settings(TRANSACTIONS_SLOW_REQUEST_SECONDS=0)
+    def test_slow_requests_logged_with_sql(self, *args):
+        """
+        Tests requests over the threshold are logged with their statements
+        """
+        with self.caplog.at_level(logging.WARNING, logger='transactions.metrics'):
+            self.client.get(reverse('transaction-sum', kwargs={'pk': self.root.id}))
+        message = self.caplog.records[-1].getMessage()
+        assert "(transaction-sum): " in message
+        assert "1 queries" in message and "subtree_amount" in message
@@ -0,0 +1,49 @@
+import time
+import uuid
+from datetime import timedelta
+import pytest
+from django.utils import timezone
+from transactions.ingest import BulkIngestion
+from transactions.models import Transactions, TransactionType, uuid7, uuid7_time
+
+
+def test_uuid7_version_and_variant():
+    """
+    Tests generated ids are RFC 4122 version 7 UUIDs
+    """
+    value = uuid7()
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+
+
+def test_uuid7_time_ordered():
+    """
+    Tests ids generated in later milliseconds sort after earlier ones
+    """
+    first = uuid7()
+    time.sleep(0.002)
+    second = uuid7()
+    assert first < second
+    assert first.int >> 80 <= time.time_ns() // 1_000_000
+
+
+def test_uuid7_time():
+    """
+    Tests the creation time is read back from version 7 ids only
+    """
+    assert abs(uuid7_time(uuid7()) - timezone.now()) < timedelta(seconds=1)
+    assert uuid7_time(uuid.uuid4()) is None
+
+
+@pytest.mark.django_db
+def test_created_on_set_by_database():
+    """
+    Tests created_on comes from the INSERT, on single and bulk inserts
+    """
+    first = Transactions.objects.create(type=TransactionType.fuel, amount=1)
+    time.sleep(0.002)
+    BulkIngestion().ingest([{"type": "fuel", "amount": 2}])
+    second = Transactions.objects.get(amount=2)
+    assert abs(first.created_on - timezone.now()) < timedelta(seconds=5)
+    assert first.created_on == Transactions.objects.get(pk=first.pk).created_on
+    assert first.created_on < second.created_on
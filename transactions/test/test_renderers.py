@@ -0,0 +1,73 @@
+from decimal import Decimal
+from transactions.test.tests import BaseTestCase
+import pytest
+from transactions.models import Transactions, TransactionType
+from transactions.renderers import TransactionIdRows, TransactionJSONRenderer, TransactionRows
+from transactions.serializers import TransactionGetSerializer, TransactionTypeResponseSerializer
+from transactions.views import TRANSACTION_READ_FIELDS
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+class TestTransactionJSONRenderer(BaseTestCase):
+    @pytest.fixture
+    def transaction_fixtures_amounts(self):
+        """
+        Fixture to create transactions with edge case amounts
+        """
+        root = Transactions.objects.create(type=TransactionType.shopping, amount=0)
+        for amount in ["0.10", "-12.50", "1000000", "9999999999999999.99", "3.1"]:
+            Transactions.objects.create(parent_id=root, type=TransactionType.fuel, amount=Decimal(amount))
+
+    def serializer_output(self, **kwargs):
+        instances = Transactions.objects.order_by('created_on', 'id')
+        return JSONRenderer().render(
+            {"next": None, "results": TransactionGetSerializer(instances, many=True).data}, **kwargs
+        )
+
+    def rows(self):
+        return TransactionRows(list(
+            Transactions.objects.order_by('created_on', 'id').values_list(*TRANSACTION_READ_FIELDS)
+        ))
+
+    @pytest.mark.usefixtures("transaction_fixtures_amounts")
+    def test_matches_serializer_output(self, *args):
+        """
+        Tests rows render byte for byte like the serializer path
+        """
+        output = TransactionJSONRenderer().render({"next": None, "results": self.rows()})
+        assert output == self.serializer_output()
+
+    @pytest.mark.usefixtures("transaction_fixtures_amounts")
+    def test_default_renderer_matches(self, *args):
+        """
+        Tests rows still render identically with the stock JSON renderer
+        """
+        assert JSONRenderer().render({"next": None, "results": self.rows()}) == self.serializer_output()
+
+    @pytest.mark.usefixtures("transaction_fixtures_amounts")
+    def test_indented_output_matches(self, *args):
+        """
+        Tests pretty printed output falls back to the stock encoder
+        """
+        media_type = 'application/json; indent=4'
+        output = TransactionJSONRenderer().render({"next": None, "results": self.rows()}, media_type)
+        assert output == self.serializer_output(accepted_media_type=media_type)
+
+    @pytest.mark.usefixtures("transaction_fixtures_amounts")
+    def test_id_rows_match_serializer_output(self, *args):
+        """
+        Tests id listings render like the type response serializer
+        """
+        queryset = Transactions.objects.filter(type=TransactionType.fuel).order_by('id')
+        expected = JSONRenderer().render(TransactionTypeResponseSerializer(queryset.values('id'), many=True).data)
+        output = TransactionJSONRenderer().render(TransactionIdRows(list(queryset.values_list('id', 'amount'))))
+        assert output == expected
+        assert TransactionJSONRenderer().render(TransactionIdRows([])) == b'[]'
+
+    @pytest.mark.usefixtures("transaction_fixtures_amounts")
+    def test_list_endpoint_matches_serializer_output(self, *args):
+        """
+        Tests the list endpoint body is unchanged by the fast path
+        """
+        resp = self.client.get(reverse('transaction-list-post'))
+        assert resp.content == self.serializer_output()
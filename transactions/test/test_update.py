@@ -0,0 +1,142 @@
+from io import StringIO
+from transactions.test.tests import BaseTestCase
+import pytest
+from transactions.models import TransactionRollup, Transactions, TransactionType
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+class TestTransactionUpdate(BaseTestCase):
+    @pytest.fixture(autouse=True)
+    def transaction_fixtures_chain(self):
+        """
+        Fixture to create a chain of three transactions
+        """
+                #   300(a) shopping
+                #     |
+                #   200(b) fuel
+                #     |
+                #    10(c) fuel
+        self.root = Transactions.objects.create(type=TransactionType.shopping, amount=300)
+        self.middle = Transactions.objects.create(parent_id=self.root, type=TransactionType.fuel, amount=200)
+        self.leaf = Transactions.objects.create(parent_id=self.middle, type=TransactionType.fuel, amount=10)
+
+    def send(self, method, pk, data):
+        return getattr(self.client, method)(
+            reverse('transaction-detail', kwargs={'pk': pk}), data=data, content_type='application/json',
+        )
+
+    def get_sum(self, pk):
+        return self.client.get(reverse('transaction-sum', kwargs={'pk': pk})).json()["sum"]
+
+    def verify(self):
+        call_command('rebuild_hierarchy', verify_only=True, stdout=StringIO())
+        call_command('rebuild_rollups', verify_only=True, stdout=StringIO())
+
+    def test_update_in_one_statement(self, *args):
+        """
+        Tests an update is written and read back by one UPDATE ... RETURNING, without a parent lookup
+        """
+        assert self.get_sum(self.root.id) == 510
+        data = {"parent_id": str(self.middle.id), "type": TransactionType.house_hold, "amount": 60}
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.send('put', self.leaf.id, data)
+        assert resp.status_code == 200
+        assert resp.json() == {
+            "id": str(self.leaf.id), "parent_id": str(self.middle.id), "type": "house_hold", "amount": "60.00",
+        }
+        statements = [query['sql'].lower() for query in queries]
+        updates = [sql for sql in statements if 'returning' in sql and sql.lstrip().startswith('update')]
+        assert len(updates) == 1 and 'exists' in updates[0]
+        # the row lock is the only read of the updated row before the write
+        assert sum('from "transactions_transactions"' in sql and 'for update' not in sql
+                   and 'where "transactions_transactions"."id" =' in sql for sql in statements) == 0
+        assert resp["ETag"] == self.client.get(reverse('transaction-detail', kwargs={'pk': self.leaf.id}))["ETag"]
+        assert self.get_sum(self.root.id) == 560 and self.get_sum(self.middle.id) == 260
+        assert TransactionRollup.objects.filter(type=TransactionType.house_hold).aggregate(
+            total=Sum('total'))['total'] == 60
+        self.verify()
+
+    def test_patch(self, *args):
+        """
+        Tests PATCH changes only the given fields
+        """
+        resp = self.send('patch', self.middle.id, {"amount": 150})
+        assert resp.status_code == 200
+        assert resp.json()["type"] == "fuel" and resp.json()["amount"] == "150.00"
+        resp = self.send('patch', self.middle.id, {"type": TransactionType.shopping})
+        assert resp.json()["amount"] == "150.00" and resp.json()["type"] == "shopping"
+        assert self.get_sum(self.root.id) == 460
+        resp = self.send('patch', self.middle.id, {"parent_id": None})
+        assert resp.status_code == 200 and resp.json()["parent_id"] is None
+        assert self.get_sum(self.root.id) == 300 and self.get_sum(self.middle.id) == 160
+        self.verify()
+
+    def test_missing_transaction(self, *args):
+        """
+        Tests updating an unknown, malformed or deleted id returns 404
+        """
+        data = {"type": TransactionType.fuel, "amount": 5}
+        assert self.send('put', Transactions().id, data).status_code == 404
+        assert self.send('put', "1-2-3", data).status_code == 404
+        self.leaf.delete()
+        assert self.send('patch', self.leaf.id, {"amount": 5}).status_code == 404
+
+    def test_missing_parent(self, *args):
+        """
+        Tests a parent that is unknown, malformed or deleted is rejected and nothing changes
+        """
+        missing = str(Transactions().id)
+        for parent_id in (missing, "1324"):
+            resp = self.send('put', self.leaf.id, {"parent_id": parent_id, "type": "fuel", "amount": 5})
+            assert resp.status_code == 400
+            assert resp.json() == {"parent_id": [f'Invalid pk "{parent_id}" - object does not exist.']}
+        self.middle.delete()
+        resp = self.send('put', self.root.id, {"parent_id": str(self.middle.id), "type": "fuel", "amount": 5})
+        assert resp.status_code == 400
+        assert Transactions.objects.get(pk=self.root.pk).amount == 300
+        assert Transactions.objects.get(pk=self.leaf.pk).amount == 10
+        self.verify()
+
+    def test_unchanged_deleted_parent(self, *args):
+        """
+        Tests a row under a deleted parent stays editable, with or without its parent given
+        """
+        self.middle.delete()
+        resp = self.send('put', self.leaf.id, {"parent_id": str(self.middle.id), "type": "fuel", "amount": 5})
+        assert resp.status_code == 200
+        assert resp.json()["parent_id"] == str(self.middle.id)
+        assert self.send('patch', self.leaf.id, {"amount": 7}).status_code == 200
+        assert Transactions.objects.get(pk=self.leaf.pk).amount == 7
+        self.verify()
+
+    def test_move_in_one_statement(self, *args):
+        """
+        Tests a move checks the new parent within the UPDATE ... RETURNING and relocates the subtree
+        """
+        data = {"parent_id": str(self.root.id), "type": TransactionType.fuel, "amount": 10}
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.send('put', self.leaf.id, data)
+        assert resp.status_code == 200 and resp.json()["parent_id"] == str(self.root.id)
+        statements = [query['sql'].lower().replace('-', '') for query in queries]
+        writes = [index for index, sql in enumerate(statements)
+                  if sql.lstrip().startswith('update') and 'returning' in sql]
+        assert len(writes) == 1
+        # ahead of the write the parent is only locked with its ancestors, never looked up
+        assert not any(self.root.id.hex in sql for sql in statements[:writes[0]]
+                       if 'recursive' not in sql and not sql.startswith('select "transactions_transactions"."id" from'))
+        assert self.get_sum(self.middle.id) == 200 and self.get_sum(self.root.id) == 510
+        assert Transactions.objects.get(pk=self.leaf.pk).depth == 1
+        self.verify()
+
+    def test_move_under_own_subtree(self, *args):
+        """
+        Tests a move below the row's own subtree is refused and nothing changes
+        """
+        resp = self.send('patch', self.root.id, {"parent_id": str(self.leaf.id)})
+        assert resp.status_code == 400
+        assert resp.json() == {"parent_id": ["A transaction cannot be moved under its own subtree."]}
+        assert Transactions.objects.get(pk=self.root.pk).parent_id is None
+        self.verify()
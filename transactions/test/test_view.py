@@ -1,14 +1,19 @@
 from multiprocessing import context
 import re
 from transactions.test.tests import BaseTestCase
+from transactions import cache
 import pytest
 from transactions.models import Transactions, TransactionType
 from django.urls import reverse
 from deepdiff import DeepDiff
 from django.db import connection
 from django.http import Http404
+from django.test.utils import CaptureQueriesContext
+from transactions.ingest import BulkIngestion
 from transactions.serializers import TransactionGetSerializer, TransactionRequestSerializer, TransactionTypeRequestSerializer, TransactionTypeResponseSerializer
 import json
+import threading
+from django.test import Client
 
 class TestTransactionListView(BaseTestCase):
     @pytest.fixture
@@ -35,7 +40,70 @@ class TestTransactionListView(BaseTestCase):
             transaction_objects, many=True
         ).data
         
-        assert not DeepDiff(resp_body, json.loads(json.dumps(response)), ignore_order=True)
+        assert resp_body["next"] is None
+        assert not DeepDiff(resp_body["results"], json.loads(json.dumps(response)), ignore_order=True)
+
+    @pytest.mark.usefixtures("transaction_fixtures_list")
+    def test_get_transactions_paginated(self, *args):
+        """
+        Tests walking the transaction list page by page with cursors
+        """
+        uri = reverse('transaction-list-post')
+        resp = self.client.get(uri, {"page_size": 2})
+        resp_body = resp.json()
+        assert resp.status_code == 200
+        assert len(resp_body["results"]) == 2
+        ids = [row["id"] for row in resp_body["results"]]
+        while resp_body["next"]:
+            resp_body = self.client.get(resp_body["next"]).json()
+            ids.extend(row["id"] for row in resp_body["results"])
+        expected = Transactions.objects.order_by("created_on", "id").values_list("id", flat=True)
+        assert ids == [str(pk) for pk in expected]
+
+    @pytest.mark.usefixtures("transaction_fixtures_list")
+    def test_get_transactions_invalid_cursor(self, *args):
+        """
+        Tests fetching the transaction list with a malformed cursor
+        """
+        uri = reverse('transaction-list-post')
+        resp = self.client.get(uri, {"cursor": "invalid-cursor"})
+        assert resp.status_code == 404
+        assert resp.json() == {"detail": "Invalid cursor"}
+
+    @pytest.mark.usefixtures("transaction_fixtures_list")
+    def test_export_transactions_ndjson(self, *args):
+        """
+        Tests streaming every transaction as newline delimited JSON
+        """
+        uri = reverse('transaction-list-post')
+        resp = self.client.get(uri, {"export": "ndjson"})
+        assert resp.status_code == 200
+        assert resp["Content-Type"] == "application/x-ndjson"
+        lines = b"".join(resp.streaming_content).decode().splitlines()
+        response = TransactionGetSerializer(
+            Transactions.objects.order_by("created_on", "id"), many=True
+        ).data
+        assert [json.loads(line) for line in lines] == json.loads(json.dumps(response))
+
+    @pytest.mark.usefixtures("transaction_fixtures_list")
+    def test_export_transactions_json_array(self, *args):
+        """
+        Tests streaming every transaction as a single JSON array
+        """
+        uri = reverse('transaction-list-post')
+        resp = self.client.get(uri, {"export": "json"})
+        assert resp.status_code == 200
+        resp_body = json.loads(b"".join(resp.streaming_content))
+        assert len(resp_body) == Transactions.objects.count()
+
+    def test_export_transactions_invalid_format(self, *args):
+        """
+        Tests requesting an export in an unsupported format
+        """
+        uri = reverse('transaction-list-post')
+        resp = self.client.get(uri, {"export": "xml"})
+        assert resp.status_code == 400
+        assert resp.json() == {"export": ['"xml" is not a valid choice.']}
 
     def test_create_transactions_without_parentid(self, *args, **kwargs):
         """
@@ -178,6 +246,20 @@ class TestTransactionDetailView(BaseTestCase):
         ).data
         assert not DeepDiff(resp_body, json.loads(json.dumps(response)), ignore_order=True)
 
+    @pytest.mark.usefixtures("transaction_fixtures_list")
+    def test_get_single_transaction_string_ids(self, *args):
+        """
+        Tests ids are accepted and returned as dashed strings, and the
+        compact hex form resolves to the same transaction
+        """
+        transaction = Transactions.objects.get(parent_id__isnull=False)
+        resp = self.client.get(reverse('transaction-detail', kwargs={'pk':str(transaction.id) }))
+        resp_body = resp.json()
+        assert resp_body["id"] == str(transaction.id)
+        assert resp_body["parent_id"] == str(transaction.parent_id_id)
+        resp = self.client.get(reverse('transaction-detail', kwargs={'pk':transaction.id.hex }))
+        assert resp.json() == resp_body
+
     def test_get_single_transaction_invalid_id(self, *args):
         """
         Tests fetching a single transaction with invalid id
@@ -192,17 +274,38 @@ class TestTransactionDetailView(BaseTestCase):
         """
         Tests updation of a transaction when request body is valid
         """
-        transaction = Transactions.objects.first()
+        transaction = Transactions.objects.get(parent_id__isnull=False)
+        new_parent = Transactions.objects.create(type=TransactionType.fuel, amount=50)
         uri = reverse('transaction-detail', kwargs={'pk':transaction.id })
         req_data = {
-            "parent_id": Transactions.objects.all()[1].id,
+            "parent_id": new_parent.id,
             "type": TransactionType.shopping,
             "amount": 250,
         }
         resp = self.client.put(uri, data=req_data, content_type='application/json')
         resp_content = resp.json()
-        num_updates=Transactions.objects.filter(pk = transaction.id).update(**req_data)
-        assert not DeepDiff(resp_content, f"{num_updates} Transaction details updated", ignore_order=True)
+        assert resp.status_code == 200
+        response = TransactionGetSerializer(Transactions.objects.get(pk = transaction.id)).data
+        assert not DeepDiff(resp_content, json.loads(json.dumps(response)), ignore_order=True)
+        assert resp_content["parent_id"] == str(new_parent.id) and resp_content["amount"] == "250.00"
+
+    @pytest.mark.usefixtures("transaction_fixtures_list")
+    def test_update_transactions_rejects_cycle(self, *args, **kwargs):
+        """
+        Tests moving a transaction under its own descendant is rejected
+        """
+        root = Transactions.objects.get(parent_id=None)
+        child = Transactions.objects.get(parent_id=root)
+        uri = reverse('transaction-detail', kwargs={'pk':root.id })
+        req_data = {
+            "parent_id": child.id,
+            "type": TransactionType.shopping,
+            "amount": 300,
+        }
+        resp = self.client.put(uri, data=req_data, content_type='application/json')
+        assert resp.status_code == 400
+        assert resp.json() == {'parent_id': ['A transaction cannot be moved under its own subtree.']}
+        assert Transactions.objects.get(pk=root.id).parent_id_id is None
 
     def test_update_transactions_invalid_parentid(self, *args, **kwargs):
         """
@@ -348,7 +451,7 @@ class TestTransactionSumView(BaseTestCase):
         
     def get_transaction_amount(self, pk):
         with connection.cursor() as cursor:
-            cursor.execute("with recursive cte as (select id as input_id, id, amount from transactions_transactions t where id = %s union all select cte.input_id, tc.id, tc.amount from cte join transactions_transactions tc on tc.parent_id_id = cte.id) select sum(amount) from cte group by input_id",[pk])
+            cursor.execute("with recursive cte as (select id as input_id, id, amount from transactions_transactions t where id = %s union all select cte.input_id, tc.id, tc.amount from cte join transactions_transactions tc on tc.parent_id_id = cte.id) select sum(amount) from cte group by input_id",[Transactions.objects.db_id(pk)])
             row = cursor.fetchone()
             return row[0] if row else 0
 
@@ -422,3 +525,495 @@ class TestTransactionSumView(BaseTestCase):
 
 
 
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_sum_follows_amount_update(self, *args, **kwargs):
+        """
+        Tests the subtree sum of every ancestor after an amount is updated
+        """
+        root = Transactions.objects.get(parent_id = None)
+        leaf = Transactions.objects.get(amount = 10)
+        uri = reverse('transaction-detail', kwargs={'pk':leaf.id })
+        req_data = {
+            "parent_id": leaf.parent_id_id,
+            "type": TransactionType.shopping,
+            "amount": 60,
+        }
+        resp = self.client.put(uri, data=req_data, content_type='application/json')
+        assert resp.status_code == 200
+        assert self.client.get(reverse('transaction-sum', kwargs={'pk':root.id })).json() == {"sum": 750}
+        assert self.get_transaction_amount(root.id) == 750
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_sum_follows_reparenting(self, *args, **kwargs):
+        """
+        Tests moving subtree (c) under node (b) keeps both chains consistent
+        """
+        node_b = Transactions.objects.get(amount = 200)
+        node_c = Transactions.objects.get(amount = 100)
+        uri = reverse('transaction-detail', kwargs={'pk':node_c.id })
+        req_data = {
+            "parent_id": node_b.id,
+            "type": TransactionType.shopping,
+            "amount": 100,
+        }
+        resp = self.client.put(uri, data=req_data, content_type='application/json')
+        assert resp.status_code == 200
+        assert self.client.get(reverse('transaction-sum', kwargs={'pk':node_b.id })).json() == {"sum": 400}
+        assert self.client.get(reverse('transaction-sum', kwargs={'pk':node_c.parent_id_id })).json() == {"sum": 700}
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_sum_excludes_soft_deleted(self, *args, **kwargs):
+        """
+        Tests a soft-deleted transaction no longer counts towards any sum
+        """
+        root = Transactions.objects.get(parent_id = None)
+        Transactions.objects.get(amount = 200).delete()
+        assert self.client.get(reverse('transaction-sum', kwargs={'pk':root.id })).json() == {"sum": 500}
+        assert Transactions.objects.subtree_sums([root.id]) == {root.id: 500}
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_batch_sums(self, *args, **kwargs):
+        """
+        Tests the batch endpoint returns every total and reports unknown ids
+        """
+        root = Transactions.objects.get(parent_id = None)
+        left = Transactions.objects.get(amount = 200)
+        missing = str(Transactions().id)
+        req_data = {"ids": [str(root.id), str(left.id), missing, "1-2-3", str(root.id)]}
+        resp = self.client.post(reverse('transaction-sum-batch'), data=req_data, content_type='application/json')
+        assert resp.status_code == 200
+        assert resp.json() == {
+            "sums": {str(root.id): 700, str(left.id): 230},
+            "unknown": [missing, "1-2-3"],
+        }
+
+    def test_batch_sums_requires_ids(self, *args, **kwargs):
+        """
+        Tests the batch endpoint rejects an empty id list
+        """
+        resp = self.client.post(reverse('transaction-sum-batch'), data={"ids": []}, content_type='application/json')
+        assert resp.status_code == 400
+        assert "ids" in resp.json()
+
+    def test_sum_consistent_under_concurrent_updates(self, *args, **kwargs):
+        """
+        Tests concurrent inserts and amount updates under a shared root
+        """
+        if connection.vendor == 'sqlite':
+            pytest.skip("SQLite serializes writers on a single connection")
+        root = Transactions.objects.create(type=TransactionType.shopping, amount=0)
+        children = [
+            Transactions.objects.create(parent_id=root, type=TransactionType.shopping, amount=1)
+            for i in range(4)
+        ]
+
+        def writer(child):
+            try:
+                for i in range(5):
+                    Transactions.objects.create(parent_id=child, type=TransactionType.shopping, amount=10)
+                    node = Transactions.objects.get(pk=child.pk)
+                    node.amount = node.amount + 1
+                    node.save()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(child,)) for child in children]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        root = Transactions.objects.get(pk=root.pk)
+        assert root.subtree_amount == Transactions.objects.subtree_sums([root.pk])[root.pk] == 4 * (6 + 50)
+
+    def test_chain_writers_do_not_deadlock(self, *args, **kwargs):
+        """
+        Tests updates of a node and inserts below its child, on one chain, queue up instead of deadlocking
+        """
+        if connection.vendor == 'sqlite':
+            pytest.skip("SQLite serializes writers on a single connection")
+        root = Transactions.objects.create(type=TransactionType.shopping, amount=0)
+        parent = Transactions.objects.create(parent_id=root, type=TransactionType.shopping, amount=0)
+        child = Transactions.objects.create(parent_id=parent, type=TransactionType.shopping, amount=0)
+        errors = []
+
+        def updater():
+            client = Client()
+            try:
+                for i in range(1, 21):
+                    resp = client.patch(
+                        reverse('transaction-detail', kwargs={'pk': parent.id}), data={"amount": i},
+                        content_type='application/json',
+                    )
+                    if resp.status_code != 200:
+                        errors.append(resp.status_code)
+                    node = Transactions.objects.get(pk=parent.pk)
+                    node.type = TransactionType.fuel if i % 2 else TransactionType.shopping
+                    node.save()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        def inserter():
+            try:
+                for i in range(20):
+                    Transactions.objects.create(parent_id=child, type=TransactionType.shopping, amount=1)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=updater), threading.Thread(target=inserter)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        root = Transactions.objects.get(pk=root.pk)
+        assert root.subtree_amount == Transactions.objects.subtree_sums([root.pk])[root.pk] == 20 + 20
+        assert root.subtree_count == 23
+
+class TestTransactionHierarchyViews(BaseTestCase):
+    @pytest.fixture
+    def transaction_fixtures_binary_tree(self):
+        """
+        Fixture to create dummy Transaction instances to be used in tests
+        """
+                #            300(a)
+                #             /  \
+                #            /    \
+                #       (b)200    (c)100
+                #          /\       /\
+                #         /  \     /  \
+                #    10(d)  20(e) 30(f)40(g)
+        root = Transactions.objects.create(type=TransactionType.shopping, amount=300)
+        for amount, leaves in ((200, (10, 20)), (100, (30, 40))):
+            node = Transactions.objects.create(parent_id=root, type=TransactionType.shopping, amount=amount)
+            for leaf in leaves:
+                Transactions.objects.create(parent_id=node, type=TransactionType.shopping, amount=leaf)
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_get_ancestors(self, *args):
+        """
+        Tests listing the ancestors of leaf (d) from the root downwards
+        """
+        leaf = Transactions.objects.get(amount=10)
+        uri = reverse('transaction-ancestors', kwargs={'pk':leaf.id })
+        resp = self.client.get(uri)
+        assert resp.status_code == 200
+        assert [row["amount"] for row in resp.json()["results"]] == ["300.00", "200.00"]
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_get_descendants_paginated(self, *args):
+        """
+        Tests walking the descendants of the root level by level
+        """
+        root = Transactions.objects.get(parent_id=None)
+        uri = reverse('transaction-descendants', kwargs={'pk':root.id })
+        resp_body = self.client.get(uri, {"page_size": 4}).json()
+        amounts = [row["amount"] for row in resp_body["results"]]
+        while resp_body["next"]:
+            resp_body = self.client.get(resp_body["next"]).json()
+            amounts.extend(row["amount"] for row in resp_body["results"])
+        assert sorted(amounts[:2]) == ["100.00", "200.00"]
+        assert sorted(amounts[2:]) == ["10.00", "20.00", "30.00", "40.00"]
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_get_descendants_index_range(self, *args):
+        """
+        Tests the descendants of a root are read from the root and depth range, without the recursive walk
+        """
+        root = Transactions.objects.get(parent_id=None)
+        node = Transactions.objects.get(amount=100)
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('transaction-descendants', kwargs={'pk': root.id}))
+        assert len(resp.json()["results"]) == 6
+        assert not any('recursive' in query['sql'].lower() for query in queries)
+        resp = self.client.get(reverse('transaction-descendants', kwargs={'pk': node.id}))
+        assert sorted(row["amount"] for row in resp.json()["results"]) == ["30.00", "40.00"]
+
+    def test_get_descendants_invalid_id(self, *args):
+        """
+        Tests listing descendants of a transaction that does not exist
+        """
+        uri = reverse('transaction-descendants', kwargs={'pk':"123" })
+        assert self.client.get(uri).status_code == 404
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_get_stats(self, *args):
+        """
+        Tests depth, root and subtree statistics of node (b)
+        """
+        root = Transactions.objects.get(parent_id=None)
+        node = Transactions.objects.get(amount=200)
+        uri = reverse('transaction-stats', kwargs={'pk':node.id })
+        resp = self.client.get(uri)
+        assert resp.status_code == 200
+        assert resp.json() == {
+            "id": str(node.id),
+            "root_id": str(root.id),
+            "depth": 1,
+            "subtree_count": 3,
+            "subtree_amount": "230.00",
+        }
+
+    @pytest.mark.usefixtures("transaction_fixtures_binary_tree")
+    def test_reparent_updates_hierarchy_index(self, *args):
+        """
+        Tests moving subtree (c) under leaf (d) shifts depth of the whole subtree
+        """
+        root = Transactions.objects.get(parent_id=None)
+        leaf = Transactions.objects.get(amount=10)
+        node = Transactions.objects.get(amount=100)
+        uri = reverse('transaction-detail', kwargs={'pk':node.id })
+        req_data = {"parent_id": leaf.id, "type": TransactionType.shopping, "amount": 100}
+        assert self.client.put(uri, data=req_data, content_type='application/json').status_code == 200
+        assert Transactions.objects.get(amount=40).depth == 4
+        assert Transactions.objects.get(amount=10).subtree_count == 4
+        assert Transactions.objects.get(pk=root.id).subtree_count == 7
+
+        node.refresh_from_db()
+        node.parent_id = None
+        node.save()
+        assert Transactions.objects.get(amount=40).depth == 1
+        assert Transactions.objects.get(amount=40).root_id_id == node.id
+        assert Transactions.objects.get(pk=root.id).subtree_count == 4
+
+class TestTransactionBulkView(BaseTestCase):
+    @pytest.fixture
+    def transaction_fixtures_root(self):
+        """
+        Fixture to create a single root transaction
+        """
+        Transactions.objects.create(type=TransactionType.shopping, amount=100)
+
+    @pytest.mark.usefixtures("transaction_fixtures_root")
+    def test_bulk_create_json_array(self, *args):
+        """
+        Tests creating a batch whose items hang below an existing transaction
+        and below items defined earlier in the same batch
+        """
+        root = Transactions.objects.get(parent_id=None)
+        parent_id = "7c0e7d9e-3c39-4f5e-9d0c-0d3c7a7b0a11"
+        req_data = [
+            {"id": parent_id, "parent_id": str(root.id), "type": "fuel", "amount": "10.00"},
+            {"parent_id": parent_id, "type": "fuel", "amount": "5.50"},
+            {"type": "house_hold", "amount": "1.00"},
+        ]
+        resp = self.client.post(reverse('transaction-bulk'), data=req_data, content_type='application/json')
+        resp_body = resp.json()
+        assert resp.status_code == 201
+        assert resp_body["created"] == 3
+        assert resp_body["results"][0] == {"id": parent_id}
+        child = Transactions.objects.get(pk=resp_body["results"][1]["id"])
+        assert str(child.parent_id_id) == parent_id
+        assert (child.depth, child.root_id_id) == (2, root.id)
+        assert self.client.get(reverse('transaction-sum', kwargs={'pk':root.id })).json() == {"sum": 115.5}
+        assert Transactions.objects.get(pk=root.id).subtree_count == 3
+
+    @pytest.mark.usefixtures("transaction_fixtures_root")
+    def test_bulk_create_ndjson(self, *args):
+        """
+        Tests creating a batch sent as newline delimited JSON
+        """
+        root = Transactions.objects.get(parent_id=None)
+        lines = [
+            json.dumps({"parent_id": str(root.id), "type": "fuel", "amount": i})
+            for i in range(1, 5)
+        ]
+        resp = self.client.post(
+            reverse('transaction-bulk'), data="\n".join(lines) + "\n", content_type='application/x-ndjson'
+        )
+        assert resp.status_code == 201
+        assert resp.json()["created"] == 4
+        assert Transactions.objects.get(pk=root.id).subtree_amount == 110
+
+    @pytest.mark.usefixtures("transaction_fixtures_root")
+    def test_bulk_create_atomic_rejects_batch(self, *args):
+        """
+        Tests one invalid item rejects the whole batch by default
+        """
+        root = Transactions.objects.get(parent_id=None)
+        req_data = [
+            {"parent_id": str(root.id), "type": "fuel", "amount": 10},
+            {"parent_id": "7c0e7d9e-3c39-4f5e-9d0c-0d3c7a7b0a11", "type": "fuel", "amount": 10},
+            {"type": "invalid-type", "amount": 10},
+        ]
+        resp = self.client.post(reverse('transaction-bulk'), data=req_data, content_type='application/json')
+        assert resp.status_code == 400
+        assert resp.json() == {"created": 0, "results": [
+            {},
+            {"errors": {"parent_id": ['Invalid pk "7c0e7d9e-3c39-4f5e-9d0c-0d3c7a7b0a11" - object does not exist.']}},
+            {"errors": {"type": ['"invalid-type" is not a valid choice.']}},
+        ]}
+        assert Transactions.objects.count() == 1
+
+    @pytest.mark.usefixtures("transaction_fixtures_root")
+    def test_bulk_create_partial(self, *args):
+        """
+        Tests per item errors with atomic=false, including children of an
+        invalid item
+        """
+        root = Transactions.objects.get(parent_id=None)
+        bad_id = "7c0e7d9e-3c39-4f5e-9d0c-0d3c7a7b0a11"
+        req_data = [
+            {"id": bad_id, "parent_id": str(root.id), "type": "fuel"},
+            {"parent_id": bad_id, "type": "fuel", "amount": 10},
+            {"parent_id": str(root.id), "type": "fuel", "amount": 10},
+        ]
+        uri = reverse('transaction-bulk') + "?atomic=false"
+        resp = self.client.post(uri, data=req_data, content_type='application/json')
+        resp_body = resp.json()
+        assert resp.status_code == 207
+        assert resp_body["created"] == 1
+        assert resp_body["results"][0] == {"errors": {"amount": ["This field is required."]}}
+        assert resp_body["results"][1] == {"errors": {"parent_id": [f'Parent "{bad_id}" is invalid in this batch.']}}
+        assert Transactions.objects.get(pk=root.id).subtree_amount == 110
+
+    @pytest.mark.usefixtures("transaction_fixtures_root")
+    def test_bulk_create_duplicate_id(self, *args):
+        """
+        Tests client supplied ids may not collide with existing transactions
+        """
+        root = Transactions.objects.get(parent_id=None)
+        req_data = [{"id": str(root.id), "type": "fuel", "amount": 10}]
+        resp = self.client.post(reverse('transaction-bulk'), data=req_data, content_type='application/json')
+        assert resp.status_code == 400
+        assert resp.json()["results"] == [{"errors": {"id": [f'Transaction with id "{root.id}" already exists.']}}]
+
+    def test_bulk_create_requires_list(self, *args):
+        """
+        Tests the payload must be a list of items
+        """
+        resp = self.client.post(reverse('transaction-bulk'), data={"type": "fuel"}, content_type='application/json')
+        assert resp.status_code == 400
+        assert resp.json() == {"non_field_errors": ["Expected a list of items."]}
+
+
+@pytest.fixture
+def transaction_tree_fixture():
+    """
+    Fixture to create a root transaction with ten children
+    """
+    cache.clear()
+    root = Transactions.objects.create(type=TransactionType.fuel, amount=100)
+    for i in range(10):
+        Transactions.objects.create(
+            parent_id=root, type=TransactionType.fuel, amount=10+i
+        )
+    return root
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("page_size", [1, 5, 11])
+def test_list_transactions_fixed_query_count(client, django_assert_num_queries, transaction_tree_fixture, page_size):
+    """
+    Tests the list endpoint runs the same queries whatever the page size
+    """
+    uri = reverse('transaction-list-post')
+    # validators for conditional requests, then the page itself
+    with django_assert_num_queries(2):
+        resp = client.get(uri, {"page_size": page_size})
+    assert resp.status_code == 200
+    assert len(resp.json()["results"]) == page_size
+
+@pytest.mark.django_db
+def test_read_endpoints_fixed_query_count(client, django_assert_num_queries, transaction_tree_fixture):
+    """
+    Tests detail and type endpoints never dereference the parent row
+    """
+    child = Transactions.objects.filter(parent_id=transaction_tree_fixture).first()
+    with django_assert_num_queries(1):
+        resp = client.get(reverse('transaction-detail', kwargs={'pk': child.id}))
+    assert resp.json()["parent_id"] == str(transaction_tree_fixture.id)
+    with django_assert_num_queries(1):
+        resp = client.get(reverse('transaction-type', kwargs={'type': "fuel"}))
+    assert len(resp.json()) == 11
+
+@pytest.mark.django_db
+def test_read_endpoints_served_from_cache(client, django_assert_num_queries, transaction_tree_fixture):
+    """
+    Tests repeated detail, type and sum reads do not touch the database
+    """
+    uris = [
+        reverse('transaction-detail', kwargs={'pk': transaction_tree_fixture.id}),
+        reverse('transaction-type', kwargs={'type': "fuel"}),
+        reverse('transaction-sum', kwargs={'pk': transaction_tree_fixture.id}),
+    ]
+    first = [client.get(uri).json() for uri in uris]
+    with django_assert_num_queries(0):
+        assert [client.get(uri).json() for uri in uris] == first
+
+@pytest.mark.django_db
+def test_batch_sums_chunked(client, django_assert_num_queries, transaction_tree_fixture, monkeypatch):
+    """
+    Tests large id lists are read in chunks that fit the parameter limit
+    """
+    monkeypatch.setattr(connection.features, "max_query_params", 4)
+    ids = [str(pk) for pk in Transactions.objects.values_list("id", flat=True)]
+    with django_assert_num_queries(3):
+        resp = client.post(reverse('transaction-sum-batch'), data={"ids": ids}, content_type='application/json')
+    sums = resp.json()["sums"]
+    assert len(sums) == 11
+    assert sums[str(transaction_tree_fixture.id)] == 245
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("batch_size", [1, 50])
+def test_bulk_create_fixed_query_count(client, django_assert_num_queries, transaction_tree_fixture, batch_size):
+    """
+    Tests a bulk insert runs the same queries whatever the batch size
+    """
+    req_data = [
+        {"parent_id": str(transaction_tree_fixture.id), "type": "fuel", "amount": 1}
+        for i in range(batch_size)
+    ]
+    # ancestor walk and lock of the parents, parent lookup, insert, ancestor
+    # walk, ancestor lock, aggregate update, rollup upsert and the savepoints
+    # around the batch and the insert
+    with django_assert_num_queries(12):
+        resp = client.post(reverse('transaction-bulk'), data=req_data, content_type='application/json')
+    assert resp.status_code == 201
+    transaction_tree_fixture.refresh_from_db()
+    assert transaction_tree_fixture.subtree_count == 11 + batch_size
+
+@pytest.mark.django_db
+def test_bulk_create_locks_parents(client, transaction_tree_fixture):
+    """
+    Tests the parents of a batch and their ancestors are locked in the inserting transaction before they are read
+    """
+    req_data = [{"parent_id": str(transaction_tree_fixture.id), "type": "fuel", "amount": 1}]
+    with CaptureQueriesContext(connection) as queries:
+        resp = client.post(reverse('transaction-bulk'), data=req_data, content_type='application/json')
+    assert resp.status_code == 201
+    statements = [query['sql'].lower() for query in queries]
+    lookup = next(index for index, sql in enumerate(statements) if '"depth"' in sql and sql.startswith('select'))
+    walk = next(index for index, sql in enumerate(statements) if 'recursive' in sql)
+    assert statements.index(next(sql for sql in statements if sql.startswith('savepoint'))) < walk < lookup
+    if connection.vendor != 'sqlite':
+        assert any('for update' in sql for sql in statements[walk:lookup])
+
+@pytest.mark.django_db
+def test_bulk_create_concurrent_duplicate(client, transaction_tree_fixture, monkeypatch):
+    """
+    Tests an id inserted by another batch after validation is reported as a duplicate
+    """
+    pk = str(Transactions().id)
+    validate = BulkIngestion.validate
+    calls = []
+
+    def racing(self, items):
+        validated = validate(self, items)
+        if not calls:
+            Transactions.objects.create(id=pk, type=TransactionType.fuel, amount=3)
+        calls.append(items)
+        return validated
+
+    monkeypatch.setattr(BulkIngestion, 'validate', racing)
+    req_data = [{"id": pk, "parent_id": str(transaction_tree_fixture.id), "type": "fuel", "amount": 1}]
+    resp = client.post(reverse('transaction-bulk'), data=req_data, content_type='application/json')
+    assert resp.status_code == 400
+    assert resp.json() == {
+        "created": 0, "results": [{"errors": {"id": [f'Transaction with id "{pk}" already exists.']}}],
+    }
+    assert len(calls) == 2
+    transaction_tree_fixture.refresh_from_db()
+    assert transaction_tree_fixture.subtree_count == 11
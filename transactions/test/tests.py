@@ -2,6 +2,7 @@ from django.test import TestCase
 from django.test import TransactionTestCase, Client, RequestFactory
 from django.core import management
 import pytest
+from transactions import cache
 
 class BaseTestCase(TransactionTestCase):
     # fixtures = ["data/fixtures/test_dummy_data.json"]
@@ -15,6 +16,7 @@ class BaseTestCase(TransactionTestCase):
 
     def setUp(self) -> None:
         super(BaseTestCase, self).setUp()
+        cache.clear()
         self.factory = RequestFactory()
         self.client = Client()
 
@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from transactions import cache
+from transactions.models import TransactionRollup, Transactions, chunked
+from transactions.serializers import TransactionBulkUpdateItemSerializer, does_not_exist_message
+
+
+class Rollback(Exception):
+    """aborts the transaction of a batch with invalid items"""
+
+
+class BulkUpdate:
+    """
+    Update many transactions in one database transaction, all or nothing.
+
+    Changes of type and amount are written with ``bulk_update``, one
+    set-based ``CASE`` UPDATE per batch, and their deltas reach the
+    ancestors and the rollups in one pass. Items giving another parent are
+    then moved one by one in request order through ``save()``, so a move
+    creating a cycle with an earlier one of the batch is caught.
+    """
+    missing_id_message = 'Transaction "{pk}" does not exist.'
+    repeated_id_message = 'Transaction "{pk}" is updated more than once in this batch.'
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or getattr(settings, 'TRANSACTIONS_BULK_UPDATE_BATCH_SIZE', 1000)
+
+    def validate(self, items):
+        """one ``(data, errors)`` pair per item"""
+        item_serializer = TransactionBulkUpdateItemSerializer()
+        validated, seen = [], set()
+        for item in items:
+            try:
+                data = item_serializer.run_validation(item)
+            except ValidationError as exc:
+                validated.append((None, exc.detail))
+                continue
+            if data['id'] in seen:
+                validated.append((None, {'id': [self.repeated_id_message.format(pk=data['id'])]}))
+                continue
+            seen.add(data['id'])
+            validated.append((data, None))
+        return validated
+
+    def apply(self, items):
+        """
+        Validate and apply ``items``. Returns the per item results, the
+        number of rows whose fields changed and the number of rows moved.
+        """
+        validated = self.validate(items)
+        try:
+            with transaction.atomic():
+                if any(errors for data, errors in validated):
+                    raise Rollback
+                updated, moved = self.write(validated)
+        except Rollback:
+            results = [{'errors': errors} if errors else {} for data, errors in validated]
+            return results, 0, 0
+        return [{'id': str(data['id'])} for data, errors in validated], updated, moved
+
+    def write(self, validated):
+        objects = Transactions.all_objects
+        size = min(self.batch_size, connection.features.max_query_params or self.batch_size)
+        ids = sorted(data['id'] for data, errors in validated)
+        previous = {}
+        # the rows, their new parents and every ancestor, before any write
+        objects.lock_ancestors(
+            [*ids, *(data.get('parent_id') for data, errors in validated)], batch_size=size,
+        )
+        for chunk in chunked(ids, size):
+            for row in objects.filter(pk__in=chunk, is_deleted=False).values('id', *Transactions.previous_fields):
+                previous[row['id']] = row
+        parents = {
+            data['parent_id'] for data, errors in validated
+            if data.get('parent_id') is not None and data['parent_id'] not in previous
+        }
+        live_parents = set()
+        for chunk in chunked(parents, size):
+            live_parents.update(Transactions.objects.filter(pk__in=chunk).values_list('id', flat=True))
+        for index, (data, errors) in enumerate(validated):
+            if data['id'] not in previous:
+                validated[index] = (data, {'id': [self.missing_id_message.format(pk=data['id'])]})
+            elif data.get('parent_id') is not None and data['parent_id'] not in previous \
+                    and data['parent_id'] not in live_parents:
+                validated[index] = (data, {'parent_id': [does_not_exist_message(data['parent_id'])]})
+        if any(errors for data, errors in validated):
+            raise Rollback
+
+        changed = []
+        for data, errors in validated:
+            row = previous[data['id']]
+            values = (data.get('type', row['type']), data.get('amount', row['amount']))
+            if values != (row['type'], row['amount']):
+                changed.append(Transactions(id=data['id'], type=values[0], amount=values[1]))
+        objects.bulk_update(changed, ['type', 'amount'], batch_size=size)
+        changed_sums = objects.add_to_subtrees_many(
+            {obj.pk: (obj.amount - previous[obj.pk]['amount'], 0) for obj in changed}, batch_size=size,
+        )
+        TransactionRollup.objects.add(
+            change for obj in changed for change in (
+                (previous[obj.pk]['created_on'], previous[obj.pk]['type'], -previous[obj.pk]['amount'], -1),
+                (previous[obj.pk]['created_on'], obj.type, obj.amount, 1),
+            )
+        )
+        cache.invalidate(
+            details=[obj.pk for obj in changed],
+            types={obj.type for obj in changed} | {previous[obj.pk]['type'] for obj in changed},
+            sums=changed_sums,
+        )
+
+        moved = 0
+        for index, (data, errors) in enumerate(validated):
+            if 'parent_id' not in data or data['parent_id'] == objects.to_id(previous[data['id']]['parent_id']):
+                continue
+            transaction_object = objects.get(pk=data['id'])
+            transaction_object.parent_id_id = data['parent_id']
+            try:
+                transaction_object.save()
+            except DjangoValidationError as error:
+                validated[index] = (data, error.message_dict)
+                raise Rollback
+            moved += 1
+        return len(changed), moved
@@ -1,12 +1,29 @@
 from django.urls import path
 from rest_framework.urlpatterns import format_suffix_patterns
-from transactions import views
+from transactions import async_views, views
 
 urlpatterns = [
     path('transaction/', views.TransactionList.as_view(), name='transaction-list-post'),
+    path('transaction/bulk/', views.TransactionBulkCreate.as_view(), name='transaction-bulk'),
+    path('transaction/bulk/update/', views.TransactionBulkUpdate.as_view(), name='transaction-bulk-update'),
+    path('transaction/queue/<str:pk>/', views.TransactionQueueStatus.as_view(), name='transaction-queue-status'),
     path('transaction/<str:pk>/', views.TransactionDetail.as_view(), name='transaction-detail'),
+    path('transaction/<str:pk>/ancestors/', views.TransactionAncestors.as_view(), name='transaction-ancestors'),
+    path('transaction/<str:pk>/descendants/', views.TransactionDescendants.as_view(), name='transaction-descendants'),
+    path('transaction/<str:pk>/subtree/', views.TransactionSubtreeUpdate.as_view(), name='transaction-subtree'),
+    path('transaction/<str:pk>/stats/', views.TransactionStats.as_view(), name='transaction-stats'),
     path('types/<str:type>/', views.TransactionTypeView.as_view(), name='transaction-type'),
+    path('sum/', views.TransactionSumBatch.as_view(), name='transaction-sum-batch'),
     path('sum/<str:pk>/', views.TransactionSum.as_view(), name='transaction-sum'),
+    path('changes/', views.TransactionChanges.as_view(), name='transaction-changes'),
+    path('analytics/', views.TransactionAnalytics.as_view(), name='transaction-analytics'),
+    path('cache/stats/', views.CacheStats.as_view(), name='cache-stats'),
+    path('db/stats/', views.DatabaseStats.as_view(), name='database-stats'),
+    # async read endpoints for ASGI deployments
+    path('async/transaction/', async_views.AsyncTransactionList.as_view(), name='async-transaction-list'),
+    path('async/transaction/<str:pk>/', async_views.AsyncTransactionDetail.as_view(), name='async-transaction-detail'),
+    path('async/types/<str:type>/', async_views.AsyncTransactionTypeView.as_view(), name='async-transaction-type'),
+    path('async/sum/<str:pk>/', async_views.AsyncTransactionSum.as_view(), name='async-transaction-sum'),
 ]
 
 urlpatterns = format_suffix_patterns(urlpatterns)
\ No newline at end of file
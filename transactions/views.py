@@ -1,81 +1,578 @@
+from datetime import timedelta
 from urllib import response
+from django.conf import settings
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views import View
-from django.db import connection
-from transactions.models import Transactions
-from transactions.serializers import TransactionGetSerializer, TransactionRequestSerializer, TransactionTypeRequestSerializer, TransactionTypeResponseSerializer
+from django.db import connections, transaction
+from django.db.models import Max
+from transactions.models import TransactionArchive, TransactionRollup, Transactions, uuid7
+from transactions.serializers import TransactionAnalyticsRequestSerializer, TransactionAnalyticsSerializer, TransactionBulkItemSerializer, TransactionChangesRequestSerializer, TransactionGetSerializer, TransactionListRequestSerializer, TransactionRequestSerializer, TransactionStatsSerializer, TransactionSubtreeUpdateSerializer, TransactionSumBatchRequestSerializer, TransactionTypeRequestSerializer, TransactionUpdateSerializer, does_not_exist_message
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.http import Http404
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+from transactions import cache, conditional, journal, metrics
+from transactions.idempotency import IdempotentMixin
+from transactions.ingest import BulkIngestion
+from transactions.updates import BulkUpdate
+from transactions.pagination import ChangesPagination, HierarchyPagination, KeysetPagination
+from transactions.parsers import NDJSONParser
+from transactions.renderers import TransactionChangeRows, TransactionIdRows, TransactionRows
+from transactions.routers import replica_aliases, replica_reads
+from rest_framework.parsers import JSONParser
 
-class TransactionList(APIView):
+def cache_key(pk):
+    """normalized transaction id, or None when ``pk`` is not a valid id"""
+    try:
+        return Transactions.objects.to_id(pk)
+    except DjangoValidationError:
+        return None
+
+# columns needed to render a transaction; created_on backs the list cursor
+TRANSACTION_READ_FIELDS = ('id', 'parent_id', 'type', 'amount', 'created_on')
+
+def stream_transactions(queryset, export_format, rows_class=TransactionRows, columns=TRANSACTION_READ_FIELDS):
+    """
+    Yield the serialized queryset chunk by chunk as NDJSON or as one JSON
+    array, so memory stays flat regardless of the number of rows.
+    """
+    chunk_size = getattr(settings, 'TRANSACTIONS_EXPORT_CHUNK_SIZE', 2000)
+    encoder = JSONEncoder(separators=(',', ':'))
+    rows = rows_class(
+        queryset.values_list(*columns).iterator(chunk_size=chunk_size)
+    ).encode_rows(encoder.encode)
+    if export_format == 'ndjson':
+        for row in rows:
+            yield row + '\n'
+        return
+    separator = '['
+    for row in rows:
+        yield separator + row
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+class TransactionListQuery:
     """
-    List all transactions, or create a new Transaction.
+    Rows, order and columns of a list request, from its filter, ``sort``
+    and ``fields`` query parameters.
     """
+    def __init__(self, query_params):
+        serializer = TransactionListRequestSerializer(data=query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        # deleted rows only ever leave the table through the archive
+        self.archived = data['deleted'] != 'false'
+        if data['deleted'] == 'false':
+            self.base = Transactions.objects.all()
+        elif data['deleted'] == 'true':
+            self.base = Transactions.all_objects.filter(is_deleted=True)
+        else:
+            self.base = Transactions.all_objects.all()
+        # the id breaks ties in the direction of the sort key, so both
+        # columns are read from one index scan
+        sort = data['sort']
+        self.ordering = (sort, '-id' if sort.startswith('-') else 'id')
+        self.queryset = self.base.search(
+            types=data.get('type'), amount_min=data.get('amount_min'), amount_max=data.get('amount_max'),
+            created_after=data.get('created_after'), created_before=data.get('created_before'),
+            modified_after=data.get('modified_after'), modified_before=data.get('modified_before'),
+            parent_id=data.get('parent_id'), root=data.get('root', False),
+        ).order_by(*self.ordering)
+        field_names = data.get('fields')
+        self.rows_class = TransactionRows.only(field_names) if field_names else TransactionRows
+        # selected fields first, then the sort columns the cursor is made of
+        names = [field.field_name for field in self.rows_class.get_fields()]
+        self.columns = tuple(names + [name.lstrip('-') for name in self.ordering if name.lstrip('-') not in names])
+
+    def validators(self):
+        """
+        latest modification of the rows the filters apply to, read from
+        the end of the modified_on index; lists showing deleted rows also
+        change when some are archived
+        """
+        modified_on = self.base.aggregate(modified_on=Max('modified_on'))['modified_on']
+        if self.archived:
+            archived_on = TransactionArchive.objects.aggregate(archived_on=Max('archived_on'))['archived_on']
+            modified_on = max(filter(None, (modified_on, archived_on)), default=None)
+        return {'modified_on': modified_on}
+
+    async def avalidators(self):
+        modified_on = (await self.base.aaggregate(modified_on=Max('modified_on')))['modified_on']
+        if self.archived:
+            archived_on = (await TransactionArchive.objects.aaggregate(archived_on=Max('archived_on')))['archived_on']
+            modified_on = max(filter(None, (modified_on, archived_on)), default=None)
+        return {'modified_on': modified_on}
+
+
+class TransactionList(IdempotentMixin, APIView):
+    """
+    List transactions, filtered and sorted by the query parameters of
+    ``TransactionListRequestSerializer``, or create a new Transaction.
+    """
+    pagination_class = KeysetPagination
+    export_content_types = {
+        'ndjson': 'application/x-ndjson',
+        'json': 'application/json',
+    }
+
+    @replica_reads
     def get(self, request, format=None):
-        """List all transactions"""
-        transaction_objects = Transactions.objects.all()
-        response = TransactionGetSerializer(
-            transaction_objects, many=True
-        ).data
-        return Response(response)
+        """List transactions one page at a time, or stream a full export"""
+        export_format = request.query_params.get('export')
+        if export_format is not None and export_format not in self.export_content_types:
+            return Response(
+                {"export": [f'"{export_format}" is not a valid choice.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        query = TransactionListQuery(request.query_params)
+        transaction_objects = query.queryset
+        # any insert, save or soft delete moves the latest modified_on
+        validators = query.validators()
+        etag = conditional.entity_tag(request, request.get_full_path(), validators['modified_on'])
+        not_modified = conditional.evaluate(request, etag, validators['modified_on'])
+        if not_modified is not None:
+            return not_modified
+        if export_format is not None:
+            # the export is read after the view returns, so pin its database now
+            response = StreamingHttpResponse(
+                stream_transactions(
+                    transaction_objects.using(transaction_objects.db), export_format, query.rows_class, query.columns
+                ),
+                content_type=self.export_content_types[export_format],
+            )
+        else:
+            paginator = self.pagination_class()
+            paginator.ordering = query.ordering
+            page = paginator.paginate_queryset(
+                transaction_objects.values_list(*query.columns, named=True), request, view=self
+            )
+            response = paginator.get_paginated_response(query.rows_class(page))
+        return conditional.set_validators(response, etag, validators['modified_on'])
 
     def post(self, request):
-        """Create a new Transaction"""
+        """Create a new Transaction, or queue it for the journal worker"""
+        if journal.write_behind(request):
+            return self.enqueue(request)
         serializer = TransactionRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
         Transactions.objects.create(**data)
         return Response("New transaction is created", status=status.HTTP_201_CREATED)
 
+    def enqueue(self, request):
+        """
+        Journal the transaction with its id and answer 202; the parent is
+        checked when the worker inserts it
+        """
+        serializer = TransactionBulkItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        item = dict(serializer.data, id=str(serializer.validated_data.get('id') or uuid7()))
+        try:
+            journal.get_journal().append(item)
+        except journal.DuplicateEntry:
+            raise ValidationError({'id': [BulkIngestion.duplicate_id_message.format(pk=item['id'])]})
+        return Response(
+            {"id": item['id'], "status": journal.QUEUED},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': reverse('transaction-queue-status', kwargs={'pk': item['id']})},
+        )
+
+
+class TransactionQueueStatus(APIView):
+    """
+    State of a transaction queued by the write-behind path.
+    """
+
+    def get(self, request, pk):
+        queue = journal.get_journal()
+        entry = queue and queue.status(pk)
+        if entry is None:
+            # pruned from the journal once committed
+            if cache_key(pk) is None or not Transactions.all_objects.filter(pk=pk).exists():
+                raise Http404
+            entry = {'state': journal.COMMITTED, 'errors': None}
+        data = {"id": pk, "status": entry['state']}
+        if entry['errors']:
+            data["errors"] = entry['errors']
+        return Response(data)
+
+
+class TransactionBulkCreate(IdempotentMixin, APIView):
+    """
+    Create many transactions from a JSON array or an NDJSON stream.
+
+    By default the batch is all-or-nothing; with ``?atomic=false`` the valid
+    items are created and the invalid ones reported.
+    """
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request, format=None):
+        """Create a batch of transactions"""
+        if not isinstance(request.data, list):
+            raise ValidationError({"non_field_errors": ["Expected a list of items."]})
+        atomic = request.query_params.get('atomic', 'true').lower() not in ('false', '0', 'no')
+        results, created = BulkIngestion().ingest(request.data, atomic=atomic)
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({"created": created, "results": results}, status=response_status)
+
 
-class TransactionDetail(APIView):
+class TransactionBulkUpdate(IdempotentMixin, APIView):
+    """
+    Update many transactions from a JSON array of partial items carrying
+    their ``id``, all or nothing.
+    """
+    def patch(self, request, format=None):
+        """Update a batch of transactions"""
+        if not isinstance(request.data, list):
+            raise ValidationError({"non_field_errors": ["Expected a list of items."]})
+        results, updated, moved = BulkUpdate().apply(request.data)
+        response_status = status.HTTP_400_BAD_REQUEST if any('errors' in result for result in results) \
+            else status.HTTP_200_OK
+        return Response({"updated": updated, "moved": moved, "results": results}, status=response_status)
+
+
+class TransactionDetail(IdempotentMixin, APIView):
     """
     Retrieve or update Transaction instance.
     """
     def get_object(self, pk):
         try:
-            return Transactions.objects.get(pk=pk)
+            return Transactions.objects.with_id(pk).only(*TRANSACTION_READ_FIELDS, 'modified_on').get()
         except :
             raise Http404
 
+    def load(self, pk):
+        try:
+            transaction_object = self.get_object(pk)
+        except Http404:
+            return None
+        return dict(TransactionGetSerializer(transaction_object).data), transaction_object.modified_on
+
     def get(self, request, pk, format=None):
         """Get details of input transaction"""
-        transaction_object = self.get_object(pk)
-        response = TransactionGetSerializer(
-            transaction_object
-        ).data
-        return Response(response)
+        key = cache_key(pk)
+        entry = key and cache.get_or_load('detail', key, lambda: self.load(key))
+        if entry is None:
+            raise Http404
+        response, modified_on = entry
+        etag = conditional.entity_tag(request, key, modified_on)
+        not_modified = conditional.evaluate(request, etag, modified_on)
+        if not_modified is not None:
+            return not_modified
+        return conditional.set_validators(Response(response), etag, modified_on)
 
     def put(self, request, pk, format=None):
         """ update details of input transaction"""
-        serializer = TransactionRequestSerializer(data=request.data)
+        return self.update(request, pk)
+
+    def patch(self, request, pk, format=None):
+        """update the fields of input transaction given in the body"""
+        return self.update(request, pk, partial=True)
+
+    def update(self, request, pk, partial=False):
+        """
+        Write the transaction with one ``UPDATE ... RETURNING``, which also
+        checks a new parent, and respond with its new representation
+        """
+        serializer = TransactionUpdateSerializer(data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        data = dict(serializer.validated_data)
+        key = cache_key(pk)
+        # the row stays locked from the If-Match check to the derived writes
+        with transaction.atomic():
+            if key is not None:
+                Transactions.all_objects.lock_ancestors([key, data.get('parent_id')])
+            previous = key and Transactions.objects.filter(pk=key).values(
+                *Transactions.previous_fields, 'modified_on'
+            ).first()
+            modified_on = previous and previous['modified_on']
+            etag = previous and conditional.entity_tag(request, key, modified_on)
+            failed = conditional.evaluate(request, etag, modified_on)
+            if failed is not None:
+                return failed
+            if previous is None:
+                raise Http404
+            # an unchanged parent is not checked again, it may be archived
+            if data.get('parent_id', None) == Transactions.objects.to_id(previous['parent_id']):
+                data.pop('parent_id', None)
+            transaction_object = Transactions.all_objects.update_returning(key, **data)
+            if transaction_object is None:
+                parent_id = data['parent_id']
+                if Transactions.objects.to_id(key) in Transactions.all_objects.ancestor_ids(parent_id):
+                    raise ValidationError({'parent_id': [Transactions.cycle_message]})
+                raise ValidationError({'parent_id': [does_not_exist_message(parent_id)]})
+            transaction_object.propagate(previous)
+        modified_on = transaction_object.modified_on
+        return conditional.set_validators(
+            Response(TransactionGetSerializer(transaction_object).data),
+            conditional.entity_tag(request, key, modified_on), modified_on,
+        )
+
+    def delete(self, request, pk, format=None):
+        """archive input transaction, or with ``?cascade=true`` its whole subtree"""
+        cascade = request.query_params.get('cascade', 'false').lower() in ('true', '1', 'yes')
+        with transaction.atomic():
+            if cache_key(pk) is not None:
+                Transactions.all_objects.lock_ancestors([cache_key(pk)])
+            transaction_object = Transactions.objects.with_id(pk).first()
+            if transaction_object is None:
+                raise Http404
+            modified_on = transaction_object.modified_on
+            etag = conditional.entity_tag(request, cache_key(pk), modified_on)
+            failed = conditional.evaluate(request, etag, modified_on)
+            if failed is not None:
+                return failed
+            if cascade:
+                archived = Transactions.all_objects.archive_subtree(transaction_object.pk)
+            else:
+                transaction_object.delete()
+                archived = 1
+        return Response({"archived": archived})
+
+class TransactionHierarchyView(APIView):
+    """
+    Base view paginating the transactions related to an input transaction;
+    ``relation`` names the ``TransactionQuerySet`` method returning them.
+    """
+    pagination_class = HierarchyPagination
+    relation = None
+
+    def get(self, request, pk, format=None):
+        if not Transactions.objects.with_id(pk).exists():
+            raise Http404
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(
+            getattr(Transactions.objects, self.relation)(pk).values_list(*TRANSACTION_READ_FIELDS, 'depth', named=True), request, view=self
+        )
+        return paginator.get_paginated_response(TransactionRows(page))
+
+class TransactionSubtreeUpdate(IdempotentMixin, APIView):
+    """
+    Apply an update to a transaction and every live row below it.
+    """
+    def patch(self, request, pk, format=None):
+        serializer = TransactionSubtreeUpdateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
-        num_updates=Transactions.objects.filter(pk = pk).update(**data)
-        return Response(f"{num_updates} Transaction details updated")
+        key = cache_key(pk)
+        if key is None:
+            raise Http404
+        try:
+            updated = Transactions.all_objects.update_subtree(
+                key, data['type'], from_type=data.get('from_type'),
+                batch_size=getattr(settings, 'TRANSACTIONS_BULK_UPDATE_BATCH_SIZE', 1000),
+            )
+        except Transactions.DoesNotExist:
+            raise Http404
+        except DjangoValidationError as error:
+            raise ValidationError(error.message_dict)
+        return Response({"updated": updated})
+
+
+class TransactionAncestors(TransactionHierarchyView):
+    """
+    List the ancestors of input transaction, from its root downwards.
+    """
+    relation = 'ancestors'
+
+class TransactionDescendants(TransactionHierarchyView):
+    """
+    List the descendants of input transaction, level by level.
+    """
+    relation = 'descendants'
+
+class TransactionStats(APIView):
+    """
+    Retrieve the hierarchy position and subtree statistics of a transaction.
+    """
+    def get(self, request, pk, format=None):
+        try:
+            transaction_object = Transactions.objects.with_id(pk).only(
+                'id', 'root_id', 'depth', 'subtree_count', 'subtree_amount'
+            ).get()
+        except Transactions.DoesNotExist:
+            raise Http404
+        response = TransactionStatsSerializer(
+            transaction_object
+        ).data
+        return Response(response)
 
 class TransactionTypeView(APIView):
+    @replica_reads
     def get(self, request, type, format=None):
         serializer = TransactionTypeRequestSerializer(data={"type":type})
         serializer.is_valid(raise_exception=True)
         serializer.validated_data
-        types = Transactions.objects.filter(type = type)
-        response = TransactionTypeResponseSerializer(
-            types, many=True
-        ).data
-        return Response(response)
+        response, modified_on = cache.get_or_load('type', type, lambda: self.load(type))
+        # rows leaving the type do not move the latest modified_on of the
+        # ones left, so the tag covers the ids themselves
+        etag = conditional.entity_tag(request, type, modified_on, *(row[0] for row in response.rows))
+        not_modified = conditional.evaluate(request, etag, modified_on)
+        if not_modified is not None:
+            return not_modified
+        return conditional.set_validators(Response(response), etag, modified_on)
+
+    def load(self, type):
+        types = list(Transactions.objects.filter(type = type).values_list('id', 'modified_on'))
+        modified_on = max((row[1] for row in types), default=None)
+        return TransactionIdRows(types), modified_on
 
 class TransactionSum(APIView):
     def get_transaction_amount(self, pk):
-        with connection.cursor() as cursor:
-            cursor.execute("with recursive cte as (select id as input_id, id, amount from transactions_transactions t where id = %s union all select cte.input_id, tc.id, tc.amount from cte join transactions_transactions tc on tc.parent_id_id = cte.id) select sum(amount) from cte group by input_id",[pk])
-            row = cursor.fetchone()
-            return row[0] if row else 0
-        
+        # materialized on write, so this is a single primary key lookup
+        key = cache_key(pk)
+        amount = key and cache.get_or_load(
+            'sum', key,
+            lambda: Transactions.objects.filter(pk=key).values_list('subtree_amount', flat=True).first(),
+        )
+        return amount if amount is not None else 0
+
+    @replica_reads
     def get(self, request, pk, format=None):
         transaction_amt = self.get_transaction_amount(pk)
         total_sum = {"sum":transaction_amt}
         return Response(total_sum)
+
+class TransactionSumBatch(APIView):
+    """
+    Retrieve the subtree totals of many transactions at once.
+    """
+    @replica_reads
+    def post(self, request, format=None):
+        serializer = TransactionSumBatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        keys = {pk: cache_key(pk) for pk in serializer.validated_data['ids']}
+        amounts = Transactions.objects.subtree_amounts({key for key in keys.values() if key is not None})
+        sums, unknown = {}, []
+        for pk, key in keys.items():
+            if key in amounts:
+                sums[pk] = amounts[key]
+            else:
+                unknown.append(pk)
+        return Response({"sums": sums, "unknown": unknown})
+
+
+# columns of a changes feed row, in the order of TransactionChangeSerializer
+TRANSACTION_CHANGE_FIELDS = ('id', 'parent_id', 'type', 'amount', 'created_on', 'modified_on', 'is_deleted')
+
+def stream_changes(queryset, paginator):
+    """
+    Yield the changes of ``queryset`` as NDJSON, followed by a last line
+    holding the cursor to resume from.
+    """
+    chunk_size = getattr(settings, 'TRANSACTIONS_EXPORT_CHUNK_SIZE', 2000)
+    encoder = JSONEncoder(separators=(',', ':'))
+    last = None
+    def rows():
+        nonlocal last
+        for last in queryset.values_list(*TRANSACTION_CHANGE_FIELDS, named=True).iterator(chunk_size=chunk_size):
+            yield last
+    for row in TransactionChangeRows(rows()).encode_rows(encoder.encode):
+        yield row + '\n'
+    cursor = paginator.request.query_params.get(paginator.cursor_query_param) or None
+    if last is not None:
+        cursor = paginator.encode_cursor([paginator.get_value(last, name) for name, _ in paginator.fields])
+    yield encoder.encode({"cursor": cursor}) + '\n'
+
+class TransactionChanges(APIView):
+    """
+    Transactions modified after a watermark, in ``(modified_on, id)``
+    order, soft-deleted ones included as tombstones. Pages carry the
+    cursor to resume from; ``?export=ndjson`` streams the whole catch-up.
+
+    Rows modified in the last ``TRANSACTIONS_CHANGES_SETTLE_SECONDS`` are
+    held back, so that a transaction committing after a later one cannot
+    fall behind a cursor already handed out. The feed reads from the
+    primary for the same reason.
+    """
+    pagination_class = ChangesPagination
+
+    def get(self, request, format=None):
+        serializer = TransactionChangesRequestSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        settle = getattr(settings, 'TRANSACTIONS_CHANGES_SETTLE_SECONDS', 5)
+        queryset = Transactions.all_objects.filter(modified_on__lte=timezone.now() - timedelta(seconds=settle))
+        if 'since' in data:
+            queryset = queryset.filter(modified_on__gt=data['since'])
+        paginator = self.pagination_class()
+        if 'export' in data:
+            paginator.request = request
+            position = paginator.decode_cursor(request, Transactions)
+            if position is not None:
+                queryset = queryset.filter(paginator.seek_filter(position))
+            return StreamingHttpResponse(
+                stream_changes(queryset.order_by(*paginator.ordering), paginator),
+                content_type='application/x-ndjson',
+            )
+        page = paginator.paginate_queryset(
+            queryset.values_list(*TRANSACTION_CHANGE_FIELDS, named=True), request, view=self
+        )
+        return paginator.get_paginated_response(TransactionChangeRows(page))
+
+
+class TransactionAnalytics(APIView):
+    """
+    Totals, counts and averages of live transactions per type and hour,
+    day or month of creation, read from the pre-aggregated rollups.
+    """
+    def get(self, request, format=None):
+        serializer = TransactionAnalyticsRequestSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        rows = TransactionRollup.objects.series(
+            data['bucket'], types=data.get('type'), start=data.get('start'), end=data.get('end'),
+        )
+        response = TransactionAnalyticsSerializer(
+            [dict(row, average=row['total'] / row['count']) for row in rows], many=True
+        ).data
+        return Response(response)
+
+
+class CacheStats(APIView):
+    """
+    Hit and miss counters of the read-through cache in this process.
+    """
+    def get(self, request, format=None):
+        return Response(cache.stats())
+
+
+class DatabaseStats(APIView):
+    """
+    Connection settings of every database alias and the state of the
+    connection pool of this process, where one is configured.
+    """
+    def get(self, request, format=None):
+        replicas = replica_aliases()
+        response = {}
+        for alias in connections:
+            db = connections[alias]
+            pool_stats = getattr(db, 'pool_stats', None)
+            response[alias] = {
+                "vendor": db.vendor,
+                "replica": alias in replicas,
+                "conn_max_age": db.settings_dict['CONN_MAX_AGE'],
+                "conn_health_checks": db.settings_dict['CONN_HEALTH_CHECKS'],
+                "connected": db.connection is not None,
+                "pool": pool_stats() if pool_stats else None,
+            }
+        return Response(response)
+
+
+class Metrics(View):
+    """
+    Request metrics of this process in the Prometheus text format.
+    """
+    def get(self, request):
+        return HttpResponse(metrics.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')